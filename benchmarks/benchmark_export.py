@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import pathlib
+import tempfile
+from typing import ClassVar
+
+from napari_arboretum.graph import build_graph_index, build_subgraph
+from napari_arboretum.io.forest import export_forest
+from napari_arboretum.io.png import export_png
+from napari_arboretum.io.svg import export_svg
+from napari_arboretum.parallel import layout_forest_parallel
+from napari_arboretum.tree import layout_tree
+from napari_arboretum.visualisation.raster import rasterize
+
+from .utils import SIZES, TIMEOUT, binary_tree_layer, forest_data
+
+
+class ExportSuite:
+    """Exporting lineages to files."""
+
+    params = SIZES
+    param_names: ClassVar[list[str]] = ["n_nodes"]
+    timeout = TIMEOUT
+
+    def setup(self, n_nodes):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.out = pathlib.Path(self.tmp_dir.name)
+
+        self.edges, self.annotations = layout_tree(
+            build_subgraph(binary_tree_layer(n_nodes), 0)
+        )
+        data, _, graph = forest_data(n_nodes)
+        self.index = build_graph_index(data, graph)
+
+    def teardown(self, n_nodes):
+        self.tmp_dir.cleanup()
+
+    def time_export_svg(self, n_nodes):
+        export_svg(self.out / "tree.svg", self.edges, self.annotations)
+
+    def time_export_png(self, n_nodes):
+        export_png(self.out / "tree.png", rasterize(self.edges).image)
+
+    def time_export_newick(self, n_nodes):
+        export_forest(self.out / "forest.nwk", self.index, fmt="newick")
+
+    def peakmem_export_graphml(self, n_nodes):
+        export_forest(self.out / "forest.graphml", self.index, fmt="graphml")
+
+
+class ParallelLayoutSuite:
+    """Laying out whole forests in worker processes."""
+
+    params: ClassVar[tuple[list[int], ...]] = (SIZES, [1, 2, 4])
+    param_names: ClassVar[list[str]] = ["n_nodes", "workers"]
+    timeout = TIMEOUT
+
+    def setup(self, n_nodes, workers):
+        data, _, graph = forest_data(n_nodes)
+        self.index = build_graph_index(data, graph)
+
+    def time_layout_forest_parallel(self, n_nodes, workers):
+        layout_forest_parallel(self.index, workers=workers)
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from typing import ClassVar
+
+from napari_arboretum.graph import build_graph_index, build_subgraph
+
+from .utils import SIZES, TIMEOUT, binary_tree_layer
+
+
+class GraphSuite:
+    """Building the graph index and the subgraph of a lineage."""
+
+    params = SIZES
+    param_names: ClassVar[list[str]] = ["n_nodes"]
+    timeout = TIMEOUT
+
+    def setup(self, n_nodes):
+        self.layer = binary_tree_layer(n_nodes)
+        # search from a leaf, so the whole tree has to be found
+        self.search_node = int(self.layer.data[-1, 0])
+
+    def time_build_graph_index(self, n_nodes):
+        build_graph_index(self.layer.data, self.layer.graph)
+
+    # the graph index of the layer is built by the first call and reused, so
+    # this mostly times the traversal of the lineage
+    def time_build_subgraph(self, n_nodes):
+        build_subgraph(self.layer, self.search_node)
+
+    def peakmem_build_subgraph(self, n_nodes):
+        build_subgraph(self.layer, self.search_node)
@@ -0,0 +1,22 @@
+class ImportSuite:
+    """Import time of the plugin, measured in a fresh interpreter."""
+
+    def timeraw_import_plugin(self):
+        return "import napari_arboretum._hookimpls"
+
+    def timeraw_import_cli(self):
+        return "import napari_arboretum.cli"
+
+    def timeraw_create_widget(self):
+        return (
+            """
+            from napari_arboretum.plugin import Arboretum
+            Arboretum(viewer)
+            """,
+            """
+            import os
+            os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+            import napari
+            viewer = napari.Viewer(show=False)
+            """,
+        )
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from typing import ClassVar
+
+from napari_arboretum.graph import build_subgraph
+from napari_arboretum.tree import layout_dag, layout_tree
+from napari_arboretum.visualisation.vispy_plotter import TreeVisual
+
+from .utils import (
+    SIZES,
+    TIMEOUT,
+    NullPlotter,
+    binary_tree_layer,
+    merge_dense_lineage,
+)
+
+
+class LayoutSuite:
+    """Laying out a lineage tree."""
+
+    params = SIZES
+    param_names: ClassVar[list[str]] = ["n_nodes"]
+    timeout = TIMEOUT
+
+    def setup(self, n_nodes):
+        self.nodes = build_subgraph(binary_tree_layer(n_nodes), 0)
+
+    def time_layout_tree(self, n_nodes):
+        layout_tree(self.nodes)
+
+    def peakmem_layout_tree(self, n_nodes):
+        layout_tree(self.nodes)
+
+
+class MergeLayoutSuite:
+    """Laying out a lineage with many merges."""
+
+    params: ClassVar[list[int]] = [10, 100, 1_000, 10_000, 100_000]
+    param_names: ClassVar[list[str]] = ["n_nodes"]
+    timeout = TIMEOUT
+
+    def setup(self, n_nodes):
+        self.nodes = merge_dense_lineage(n_nodes)
+
+    def time_layout_tree(self, n_nodes):
+        layout_tree(self.nodes)
+
+    def time_layout_dag(self, n_nodes):
+        layout_dag(self.nodes)
+
+
+class ColorSuite:
+    """Colouring the edges of a laid out tree from the track colours."""
+
+    params = SIZES
+    param_names: ClassVar[list[str]] = ["n_nodes"]
+    timeout = TIMEOUT
+
+    def setup(self, n_nodes):
+        layer = binary_tree_layer(n_nodes)
+        self.plotter = NullPlotter()
+        self.plotter.tracks = layer
+        self.plotter.tree_layers = [layer]
+        self.plotter.edges, _ = layout_tree(build_subgraph(layer, 0))
+
+    def time_update_edge_colors(self, n_nodes):
+        self.plotter.update_edge_colors(update_live=False)
+
+
+class RenderSuite:
+    """Building the vertex buffers of the VisPy tree visual."""
+
+    params = SIZES
+    param_names: ClassVar[list[str]] = ["n_nodes"]
+    timeout = TIMEOUT
+
+    def setup(self, n_nodes):
+        layer = binary_tree_layer(n_nodes)
+        plotter = NullPlotter()
+        plotter.tracks = layer
+        plotter.tree_layers = [layer]
+        plotter.edges, self.annotations = layout_tree(build_subgraph(layer, 0))
+        plotter.update_edge_colors(update_live=False)
+        self.edges = plotter.edges
+
+    def _draw(self):
+        tree = TreeVisual(parent=None)
+        for e in self.edges:
+            tree.add_track(e)
+        for a in self.annotations:
+            tree.add_annotation(a.x, a.y, a.label, a.color)
+        tree.draw_tree()
+        return tree
+
+    def time_draw_tree(self, n_nodes):
+        self._draw()
+
+    def peakmem_draw_tree(self, n_nodes):
+        self._draw()
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from typing import ClassVar
+
+from napari_arboretum.query import build_lineage_table
+
+from .utils import TIMEOUT, forest_data
+
+
+class QuerySuite:
+    """Building the lineage attribute table and querying it."""
+
+    params: ClassVar[list[int]] = [1_000, 10_000, 100_000]
+    param_names: ClassVar[list[str]] = ["n_lineages"]
+    timeout = TIMEOUT
+
+    def setup(self, n_lineages):
+        self.data, _, self.graph = forest_data(30 * n_lineages, p_merge=0.1)
+        self.table = build_lineage_table(self.data, self.graph)
+
+    def time_build_lineage_table(self, n_lineages):
+        build_lineage_table(self.data, self.graph)
+
+    def time_select(self, n_lineages):
+        self.table.select("depth > 3 and n_merges > 0 and any(length < 5)")
@@ -0,0 +1,74 @@
+"""
+Shared helpers for the arboretum benchmarks.
+
+All benchmarks use synthetic data, and none of them need a display or GPU.
+"""
+from __future__ import annotations
+
+import numpy as np
+from napari.layers import Tracks
+
+from napari_arboretum.graph import TreeNode, build_graph_index
+from napari_arboretum.sample.synthetic import make_binary_tree, make_forest
+from napari_arboretum.visualisation.base_plotter import TreePlotterBase
+
+# approximate number of tree nodes (tracks) to benchmark with
+SIZES = [10, 100, 1_000, 10_000, 100_000, 1_000_000]
+
+# allow for the largest sizes, which can be slow
+TIMEOUT = 600
+
+
+def binary_tree_layer(n_nodes: int) -> Tracks:
+    """A Tracks layer containing a binary tree with at least ``n_nodes``
+    nodes."""
+    max_depth = max(int(np.ceil(np.log2(n_nodes + 1))), 1)
+    data, properties, graph = make_binary_tree(max_depth)
+    return Tracks(data, properties=properties, graph=graph)
+
+
+def forest_data(n_nodes: int, *, p_merge: float = 0.0):
+    """Data, properties and graph of a forest of lineages with about
+    ``n_nodes`` tracks in total."""
+    n_roots = max(n_nodes // 30, 1)
+    return make_forest(n_roots, 100, p_merge=p_merge, seed=0)
+
+
+class NullPlotter(TreePlotterBase):
+    """A tree plotter that does not draw anything, for benchmarking the
+    backend independent parts of plotting."""
+
+    def update_colors(self):
+        pass
+
+    def clear(self):
+        pass
+
+    def add_branch(self, e):
+        pass
+
+    def add_annotation(self, a):
+        pass
+
+    def draw_current_time_line(self, time):
+        pass
+
+    def draw_tree_visual(self):
+        pass
+
+
+def merge_dense_lineage(n_nodes: int) -> list[TreeNode]:
+    """Nodes of a single lineage with about ``n_nodes`` tracks, where most
+    tracks that do not divide merge with another track."""
+    # each generation is about 1.6 times larger than the previous one
+    n_generations = max(int(np.log(n_nodes) / np.log(1.6)), 1)
+    data, _, graph = make_forest(
+        1,
+        2 * n_generations,
+        p_divide=0.75,
+        p_merge=0.8,
+        cycle_length_mean=2,
+        cycle_length_std=0,
+        seed=1,
+    )
+    return build_graph_index(data, graph).subgraph(0)
@@ -3,38 +3,22 @@ Show a large tree in arboretum
 ==============================
 """
 import logging
-from copy import copy
 
 import napari
-import numpy as np
 
-from napari_arboretum.graph import TreeNode
+from napari_arboretum.sample.synthetic import make_binary_tree
 
-
-def generate_binary_tree(max_depth: int):
-    track_id = 0
-    t = np.array([0, 1])
-    nodes = [TreeNode(track_id, t=t, generation=1)]
-    for depth in range(1, max_depth):
-        for node in copy(nodes):
-            if node.generation == depth:
-                for _ in range(2):
-                    # Add two children
-                    track_id += 1
-                    new_node = node.add_child(track_id, t_end=node.t[-1] + 1)
-                    nodes.append(new_node)
-    return nodes
-
-
-nodes = generate_binary_tree(8)
-logging.info(f"{len(nodes)} total nodes")
+data, properties, graph = make_binary_tree(8)
+logging.info(f"{len(graph) + 1} total nodes")
 
 
 viewer = napari.Viewer()
+tracks = viewer.add_tracks(data, properties=properties, graph=graph)
 _, widget = viewer.window.add_plugin_dock_widget(
     plugin_name="napari-arboretum", widget_name="Arboretum"
 )
-widget.plotter.draw_from_nodes(nodes)
+widget.tracks = tracks
+widget.track_id = 0
 
 if __name__ == "__main__":
     # The napari event loop needs to be run under here to allow the window
@@ -0,0 +1,34 @@
+"""
+Browse lineages from a lineage store
+====================================
+This example:
+- converts the sample data to a lineage store, sorted by lineage
+- opens the store, which only reads the lineage index into memory
+- loads a single lineage as a napari Tracks layer and shows its tree
+"""
+import tempfile
+
+import napari
+
+from napari_arboretum.io.lineage_store import LineageStore, write_lineage_store
+from napari_arboretum.sample.sample_data import load_sample_data
+
+tracks, _ = load_sample_data()
+store_path = tempfile.mkdtemp(suffix=".tracks")
+write_lineage_store(store_path, tracks.data, tracks.properties, tracks.graph)
+
+store = LineageStore(store_path)
+root = int(store.roots[0])
+
+viewer = napari.Viewer()
+layer = viewer.add_layer(store.tracks_layer(root))
+_, widget = viewer.window.add_plugin_dock_widget(
+    plugin_name="napari-arboretum", widget_name="Arboretum"
+)
+widget.tracks = layer
+widget.track_id = root
+
+if __name__ == "__main__":
+    # The napari event loop needs to be run under here to allow the window
+    # to be spawned from a Python script
+    napari.run()
@@ -0,0 +1,259 @@
+"""
+Command line tools for using arboretum without napari.
+
+``arboretum-export`` lays out every lineage tree of a tracking experiment and
+writes each one to an SVG file, or draws it as a PNG thumbnail (see
+`napari_arboretum.visualisation.raster`). The graph index is built once and shared
+with a pool of worker processes (see `napari_arboretum.parallel`), which lay
+out and export the trees. Nothing here
+creates a Qt or OpenGL context, so it can run on headless machines.
+
+Lineages can also be exported to a single Newick, GraphML or PhyloXML file
+(see `napari_arboretum.io.forest`).
+
+``arboretum-convert`` converts tracks stored as CSV and JSON files to a
+memory-mappable tracks directory (see `napari_arboretum.io.npy`).
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import pathlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+
+import numpy as np
+
+from napari_arboretum.graph import GraphIndex, build_graph_index
+from napari_arboretum.io import forest
+from napari_arboretum.io.npy import convert_csv, is_tracks_dir, read_tracks
+from napari_arboretum.io.png import export_png
+from napari_arboretum.io.svg import export_svg
+from napari_arboretum.io.tables import read_tracks_csv
+from napari_arboretum.parallel import attach_graph_index, share_graph_index
+from napari_arboretum.tree import LAYOUTS
+from napari_arboretum.visualisation.raster import RASTER_SHAPE, rasterize
+
+logger = logging.getLogger(__name__)
+
+# number of lineages sent to a worker process at a time
+DEFAULT_CHUNKSIZE = 16
+
+# file extensions used for forest formats
+FOREST_EXTENSIONS = {"newick": "nwk", "graphml": "graphml", "phyloxml": "xml"}
+
+# the graph index shared by all lineages exported by a worker process
+_WORKER_INDEX: GraphIndex | None = None
+
+
+@dataclass
+class ExportStats:
+    n_trees: int
+    n_edges: int
+    elapsed: float
+
+    @property
+    def trees_per_second(self) -> float:
+        return self.n_trees / self.elapsed if self.elapsed > 0 else float("inf")
+
+    def __str__(self) -> str:
+        return (
+            f"Exported {self.n_trees} trees ({self.n_edges} edges) in "
+            f"{self.elapsed:.2f}s ({self.trees_per_second:.1f} trees/s)"
+        )
+
+
+def _init_worker(specs: dict[str, tuple]) -> None:
+    global _WORKER_INDEX  # noqa: PLW0603
+    _WORKER_INDEX = attach_graph_index(specs)
+
+
+def _export_lineage(
+    root: int,
+    out_dir: pathlib.Path,
+    fmt: str = "svg",
+    shape: tuple[int, int] = RASTER_SHAPE,
+    layout: str = "auto",
+) -> int:
+    """Lay out and export a single lineage, returning the number of edges."""
+    if _WORKER_INDEX is None:
+        raise RuntimeError("Worker process has not been initialised.")
+    edges, annotations = LAYOUTS[layout](_WORKER_INDEX.subgraph(root))
+    if fmt == "png":
+        export_png(out_dir / f"tree_{root}.png", rasterize(edges, shape).image)
+    else:
+        export_svg(out_dir / f"tree_{root}.svg", edges, annotations)
+    return len(edges)
+
+
+def export_forest(  # noqa: PLR0913
+    data: np.ndarray,
+    graph: dict,
+    out_dir: os.PathLike,
+    *,
+    roots: list[int] | None = None,
+    workers: int | None = None,
+    fmt: str = "svg",
+    shape: tuple[int, int] = RASTER_SHAPE,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    layout: str = "auto",
+) -> ExportStats:
+    """Export every lineage tree in a tracks dataset as an SVG or PNG file.
+
+    Parameters
+    ----------
+    data :
+        Tracks data, in the napari format (ID, T, (Z), Y, X).
+    graph :
+        A dictionary encoding the graph, as used by the napari.Tracks layer.
+    out_dir :
+        Directory to write the files to. One file, ``tree_{root}.svg`` or
+        ``tree_{root}.png``, is written for each lineage.
+    roots :
+        The root IDs of the lineages to export. Defaults to all lineages.
+    workers :
+        Number of worker processes. Defaults to the number of CPUs.
+    fmt :
+        ``"svg"``, or ``"png"`` for thumbnails drawn with
+        `napari_arboretum.visualisation.raster.rasterize`.
+    shape :
+        ``(height, width)`` of PNG thumbnails, in pixels.
+    chunksize :
+        Number of lineages sent to a worker process at a time.
+    layout :
+        The layout of each tree, one of `napari_arboretum.tree.LAYOUTS`.
+
+    Returns
+    -------
+    stats :
+        The number of trees and edges exported, and the time taken.
+    """
+    start = time.perf_counter()
+    out_dir = pathlib.Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    index = build_graph_index(data, graph)
+    roots = index.roots if roots is None else roots
+    logger.info(f"Built graph index with {len(index.roots)} lineages")
+
+    with share_graph_index(index) as specs, ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(specs,)
+    ) as pool:
+        n_edges = sum(
+            pool.map(
+                partial(
+                    _export_lineage,
+                    out_dir=out_dir,
+                    fmt=fmt,
+                    shape=shape,
+                    layout=layout,
+                ),
+                roots,
+                chunksize=chunksize,
+            )
+        )
+
+    return ExportStats(
+        n_trees=len(roots), n_edges=n_edges, elapsed=time.perf_counter() - start
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Entry point for ``arboretum-export``."""
+    parser = argparse.ArgumentParser(
+        prog="arboretum-export",
+        description="Export every lineage tree of a tracking experiment.",
+    )
+    parser.add_argument(
+        "tracks", type=pathlib.Path, help="tracks CSV file or tracks directory"
+    )
+    parser.add_argument("graph", type=pathlib.Path, nargs="?", help="graph JSON file")
+    parser.add_argument(
+        "--out", type=pathlib.Path, default=pathlib.Path(), help="output directory"
+    )
+    parser.add_argument(
+        "--roots", type=int, nargs="+", help="only export these lineage roots"
+    )
+    parser.add_argument("-j", "--workers", type=int, help="number of worker processes")
+    parser.add_argument(
+        "--format",
+        choices=["svg", "png", *forest.WRITERS],
+        default="svg",
+        help="one SVG file or PNG thumbnail per lineage, or a single forest file",
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        nargs=2,
+        default=RASTER_SHAPE,
+        metavar=("HEIGHT", "WIDTH"),
+        help="size of PNG thumbnails, in pixels",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=list(LAYOUTS),
+        default="auto",
+        help="layout of SVG and PNG trees; 'dag' handles merges, and 'auto' "
+        "uses it for lineages with merges",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if is_tracks_dir(args.tracks):
+        data, _, graph = read_tracks(args.tracks)
+    else:
+        data, _, graph = read_tracks_csv(args.tracks, args.graph)
+
+    if args.format in ("svg", "png"):
+        stats = export_forest(
+            data,
+            graph,
+            args.out,
+            roots=args.roots,
+            workers=args.workers,
+            fmt=args.format,
+            shape=tuple(args.size),
+            layout=args.layout,
+        )
+    else:
+        start = time.perf_counter()
+        index = build_graph_index(data, graph)
+        roots = index.roots if args.roots is None else args.roots
+        args.out.mkdir(parents=True, exist_ok=True)
+        forest.export_forest(
+            args.out / f"forest.{FOREST_EXTENSIONS[args.format]}",
+            index,
+            fmt=args.format,
+            roots=roots,
+        )
+        stats = ExportStats(
+            n_trees=len(roots),
+            n_edges=sum(len(parents) for parents in graph.values()),
+            elapsed=time.perf_counter() - start,
+        )
+    logger.info(stats)
+    return 0
+
+
+def convert_main(argv: list[str] | None = None) -> int:
+    """Entry point for ``arboretum-convert``."""
+    parser = argparse.ArgumentParser(
+        prog="arboretum-convert",
+        description="Convert CSV/JSON tracks to a memory-mapped tracks directory.",
+    )
+    parser.add_argument("tracks", type=pathlib.Path, help="tracks CSV file")
+    parser.add_argument("out", type=pathlib.Path, help="output tracks directory")
+    parser.add_argument("--graph", type=pathlib.Path, help="graph JSON file")
+    parser.add_argument("--properties", type=pathlib.Path, help="properties CSV file")
+    args = parser.parse_args(argv)
+
+    convert_csv(args.tracks, args.out, graph=args.graph, properties=args.properties)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,272 @@
+"""
+Find the lineages that changed between two tracking runs.
+
+Every track is given a Merkle hash of the subtree below it: a hash of the
+track's own branch combined with the sorted hashes of its children. Two
+subtrees with the same hash have the same topology (and, optionally, the same
+branch times) whatever their track IDs. The hashes are computed bottom-up in
+a single pass over each graph. The two runs are then paired top-down, and any
+subtree whose hash is found in the other run is matched as a whole without
+descending into it, so comparing two runs takes O(n) time.
+"""
+from __future__ import annotations
+
+import hashlib
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterable
+
+import numpy as np
+
+from napari_arboretum.graph import GraphIndex, build_graph_index
+
+if TYPE_CHECKING:
+    import napari
+
+HASH_SIZE = 16
+
+
+@dataclass
+class LineageHashes:
+    """
+    Structural hashes of every track of a tracking run.
+
+    Attributes
+    ----------
+    branch : dict[int, bytes]
+        Hash of the branch of each track on its own, from its (binned) start
+        and end times. All branches have the same hash if times are ignored.
+    subtree : dict[int, bytes]
+        Merkle hash of the subtree starting at each track.
+    t_start : dict[int, float]
+        Start time of each track, used to pair tracks with different hashes.
+    """
+
+    branch: dict[int, bytes]
+    subtree: dict[int, bytes]
+    t_start: dict[int, float]
+
+
+def lineage_hashes(
+    index: GraphIndex, *, time_tolerance: int | None = None
+) -> LineageHashes:
+    """Compute the structural hashes of every track reachable from a root.
+
+    Parameters
+    ----------
+    index :
+        The graph index of the tracks.
+    time_tolerance :
+        If `None`, only the topology of the lineages is hashed. Otherwise,
+        the start and end times of each branch are hashed after binning
+        them to multiples of ``time_tolerance`` frames, so ``1`` compares
+        times exactly.
+    """
+    track_ids = index.track_ids.tolist()
+    t_start, t_end = index.t_start, index.t_end
+
+    if time_tolerance is None:
+        times = np.zeros((len(track_ids), 2), dtype=np.int64)
+    else:
+        times = np.column_stack([t_start, t_end]) // time_tolerance
+        times = times.astype(np.int64)
+    # view each row as a single bytes object
+    rows = np.ascontiguousarray(times).view(f"V{times.itemsize * 2}").ravel()
+    branch = dict(zip(track_ids, rows.tolist()))
+    # tracks that are in the graph, but have no data
+    missing = b"missing"
+
+    reverse_graph = index.reverse_graph
+    subtree: dict[int, bytes] = {}
+    seen: set[int] = set()
+    for root in index.roots:
+        stack = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            children = reverse_graph.get(node)
+            h = hashlib.blake2b(branch.get(node, missing), digest_size=HASH_SIZE)
+            if not children:
+                subtree[node] = h.digest()
+            elif expanded:
+                # sort the children so that the hash does not depend on their
+                # order; children on a cycle have no hash, and are skipped
+                for child_hash in sorted([subtree.get(c, b"") for c in children]):
+                    h.update(child_hash)
+                subtree[node] = h.digest()
+            elif node not in seen:
+                seen.add(node)
+                stack.append((node, True))
+                stack += [(c, False) for c in children if c not in seen]
+
+    return LineageHashes(
+        branch=branch, subtree=subtree, t_start=dict(zip(track_ids, t_start.tolist()))
+    )
+
+
+@dataclass
+class LineageDiff:
+    """
+    Differences between the lineages of two tracking runs, A and B.
+
+    Attributes
+    ----------
+    identical : dict[int, int]
+        Maps the first track of each largest subtree of A that is found
+        unchanged in B to the first track of its counterpart in B.
+    matched : dict[int, int]
+        Maps every other track of A that was paired with a track of B to
+        that track.
+    changed : list[tuple[int, int]]
+        ``(a, b)`` pairs of matched tracks whose branches differ.
+    added : list[int]
+        Tracks of B with no counterpart in A.
+    removed : list[int]
+        Tracks of A with no counterpart in B.
+    """
+
+    identical: dict[int, int] = field(default_factory=dict)
+    matched: dict[int, int] = field(default_factory=dict)
+    changed: list[tuple[int, int]] = field(default_factory=list)
+    added: list[int] = field(default_factory=list)
+    removed: list[int] = field(default_factory=list)
+
+    @property
+    def changed_tracks(self) -> list[int]:
+        """Tracks of B that were added or changed."""
+        return [b for _, b in self.changed] + self.added
+
+    @property
+    def is_identical(self) -> bool:
+        """``True`` if the two runs have the same lineages."""
+        return not (self.matched or self.added or self.removed)
+
+
+def _pair(
+    nodes_a: Iterable[int],
+    nodes_b: Iterable[int],
+    hashes_a: LineageHashes,
+    hashes_b: LineageHashes,
+) -> tuple[list[tuple[int | None, int | None]], list[tuple[int, int]]]:
+    """Pair two sets of sibling tracks (or roots).
+
+    Tracks are paired by subtree hash first, then by branch hash, then in
+    order of start time. Returns the pairs, including unpaired tracks paired
+    with `None`, and the pairs with identical subtrees.
+    """
+    pairs: list[tuple[int | None, int | None]] = []
+    identical: list[tuple[int, int]] = []
+    remaining_a = sorted(nodes_a, key=lambda a: (hashes_a.t_start.get(a, 0), a))
+    remaining_b = sorted(nodes_b, key=lambda b: (hashes_b.t_start.get(b, 0), b))
+
+    for key_a, key_b, out in (
+        (hashes_a.subtree, hashes_b.subtree, identical),
+        (hashes_a.branch, hashes_b.branch, pairs),
+    ):
+        candidates = defaultdict(list)
+        for b in reversed(remaining_b):
+            candidates[key_b.get(b)].append(b)
+        unpaired = []
+        for a in remaining_a:
+            matches = candidates.get(key_a.get(a))
+            if matches:
+                out.append((a, matches.pop()))
+            else:
+                unpaired.append(a)
+        remaining_a = unpaired
+        paired_b = {b for _, b in out}
+        remaining_b = [b for b in remaining_b if b not in paired_b]
+
+    n_paired = min(len(remaining_a), len(remaining_b))
+    pairs += zip(remaining_a[:n_paired], remaining_b[:n_paired])
+    pairs += [(a, None) for a in remaining_a[n_paired:]]
+    pairs += [(None, b) for b in remaining_b[n_paired:]]
+    return pairs, identical
+
+
+def _descendants(index: GraphIndex, track_id: int, visited: set[int]) -> list[int]:
+    """A track and its descendants that have not been visited yet. The tracks
+    are marked as visited."""
+    out = []
+    stack = [track_id]
+    while stack:
+        node = stack.pop()
+        if node in visited:
+            continue
+        visited.add(node)
+        out.append(node)
+        stack.extend(index.reverse_graph.get(node, []))
+    return out
+
+
+def diff_lineages(
+    index_a: GraphIndex, index_b: GraphIndex, *, time_tolerance: int | None = None
+) -> LineageDiff:
+    """Compare the lineages of two tracking runs.
+
+    Parameters
+    ----------
+    index_a, index_b :
+        Graph indexes of the two runs.
+    time_tolerance :
+        Compare branch times binned to multiples of this many frames, or
+        only compare topology if `None`. See `lineage_hashes`.
+
+    Returns
+    -------
+    diff : LineageDiff
+    """
+    hashes_a = lineage_hashes(index_a, time_tolerance=time_tolerance)
+    hashes_b = lineage_hashes(index_b, time_tolerance=time_tolerance)
+    diff = LineageDiff()
+    visited_a: set[int] = set()
+    visited_b: set[int] = set()
+
+    stack = [(index_a.roots, index_b.roots)]
+    while stack:
+        nodes_a, nodes_b = stack.pop()
+        # children of merges may have been reached from another parent
+        pairs, identical = _pair(
+            [a for a in nodes_a if a not in visited_a],
+            [b for b in nodes_b if b not in visited_b],
+            hashes_a,
+            hashes_b,
+        )
+        # the whole subtree matches, so there is no need to descend
+        diff.identical.update(identical)
+
+        for a, b in pairs:
+            if a is not None and b is not None:
+                visited_a.add(a)
+                visited_b.add(b)
+                diff.matched[a] = b
+                if hashes_a.branch.get(a) != hashes_b.branch.get(b):
+                    diff.changed.append((a, b))
+                stack.append(
+                    (
+                        index_a.reverse_graph.get(a, []),
+                        index_b.reverse_graph.get(b, []),
+                    )
+                )
+            elif a is not None:
+                diff.removed += _descendants(index_a, a, visited_a)
+            elif b is not None:
+                diff.added += _descendants(index_b, b, visited_b)
+
+    return diff
+
+
+def diff_layers(
+    layer_a: napari.layers.Tracks,
+    layer_b: napari.layers.Tracks,
+    *,
+    time_tolerance: int | None = None,
+) -> LineageDiff:
+    """Compare the lineages of two napari Tracks layers.
+
+    See `diff_lineages` for details.
+    """
+    return diff_lineages(
+        build_graph_index(layer_a.data, layer_a.graph),
+        build_graph_index(layer_b.data, layer_b.graph),
+        time_tolerance=time_tolerance,
+    )
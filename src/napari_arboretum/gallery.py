@@ -0,0 +1,398 @@
+"""
+A gallery of thumbnails of every lineage of a tracks layer.
+
+Drawing a live VisPy tree for each of thousands of lineages is far too slow,
+so the gallery shows small images drawn by
+`napari_arboretum.visualisation.raster_plotter.RasterPlotter`. The grid is a
+Qt list view, which only asks for the thumbnails of the tiles that are on
+screen. Missing thumbnails are drawn in a background thread, most recently
+requested first, and the least recently used are evicted once
+`THUMBNAIL_CACHE_SIZE` are stored.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from operator import attrgetter
+from typing import TYPE_CHECKING, Any
+
+import napari
+import numpy as np
+from napari.layers import Tracks
+from qtpy.QtCore import (
+    QAbstractListModel,
+    QModelIndex,
+    QObject,
+    QSignalBlocker,
+    QSize,
+    Qt,
+    Signal,
+)
+from qtpy.QtGui import QImage, QPixmap
+from qtpy.QtWidgets import QComboBox, QListView, QVBoxLayout, QWidget
+
+from napari_arboretum.graph import GraphIndex, build_graph_index
+from napari_arboretum.visualisation.raster_plotter import RasterPlotter
+
+if TYPE_CHECKING:
+    from napari_arboretum.plugin import Arboretum
+
+logger = logging.getLogger(__name__)
+
+PLUGIN_NAME = "napari-arboretum"
+ARBORETUM_WIDGET_NAME = "Arboretum"
+
+# (time, position) size of each thumbnail, in pixels
+THUMBNAIL_SHAPE = (96, 72)
+# the least recently shown thumbnails are evicted above this number
+THUMBNAIL_CACHE_SIZE = 1024
+# space around each thumbnail in the grid, and for its label, in pixels
+TILE_PADDING = 8
+LABEL_HEIGHT = 16
+
+# item data role of the root ID of each lineage
+ROOT_ROLE = Qt.UserRole
+
+
+@dataclass(frozen=True)
+class _LayerSnapshot:
+    """The parts of a tracks layer that thumbnails are drawn from. They are
+    copied when the layer is set, so the background thread never reads a
+    layer while the UI changes it."""
+
+    index: GraphIndex
+    track_colors: np.ndarray
+
+
+def _stop_thread(condition: threading.Condition, stopped: threading.Event) -> None:
+    with condition:
+        stopped.set()
+        condition.notify()
+
+
+def _render_thumbnails(
+    ref: weakref.ref[ThumbnailRenderer],
+    condition: threading.Condition,
+    stopped: threading.Event,
+) -> None:
+    """Draw the thumbnails requested from a renderer until it is stopped.
+
+    The renderer is not referenced while waiting for requests, so that it can
+    be deleted, which stops the thread.
+    """
+    while True:
+        with condition:
+            while True:
+                renderer = None if stopped.is_set() else ref()
+                if renderer is None:
+                    return
+                request = renderer._next_request()
+                if request is not None:
+                    break
+                del renderer
+                condition.wait()
+        renderer._render(*request)
+        del renderer
+
+
+class ThumbnailRenderer(QObject):
+    """
+    Draws lineage thumbnails in a background thread.
+
+    Requests are drawn most recent first, since they are for the tiles that
+    were shown last. Changing the layer, or calling `cancel`, drops the
+    requests that have not been drawn yet. The thread is stopped by `stop`,
+    or when the renderer is deleted.
+
+    Parameters
+    ----------
+    shape :
+        ``(time, position)`` size of the thumbnails, in pixels.
+    """
+
+    # emitted with (generation, root ID, RGBA image) for each thumbnail
+    rendered = Signal(int, int, object)
+
+    def __init__(self, shape: tuple[int, int] = THUMBNAIL_SHAPE, parent=None):
+        super().__init__(parent=parent)
+        # only used by the background thread, which draws layer snapshots
+        self._plotter = RasterPlotter(shape, graph_index=attrgetter("index"))
+        # incremented each time the layer changes, to discard thumbnails of
+        # the previous layer
+        self.generation = 0
+        self._snapshot: _LayerSnapshot | None = None
+        self._pending: OrderedDict[int, None] = OrderedDict()
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=_render_thumbnails,
+            args=(weakref.ref(self), self._condition, self._stopped),
+            name="arboretum-thumbnails",
+            daemon=True,
+        )
+        self._thread.start()
+        # e.g. when the gallery is deleted after its dock widget is removed
+        weakref.finalize(self, _stop_thread, self._condition, self._stopped)
+
+    def set_layer(self, layer: Tracks | None, index: GraphIndex | None) -> None:
+        """Draw thumbnails of the lineages of a layer, given its graph index."""
+        snapshot = None
+        if layer is not None and index is not None:
+            snapshot = _LayerSnapshot(index, np.array(layer.track_colors))
+        with self._condition:
+            self.generation += 1
+            self._snapshot = snapshot
+            self._pending.clear()
+
+    def request(self, root: int) -> None:
+        """Ask for the thumbnail of a lineage to be drawn."""
+        with self._condition:
+            self._pending[root] = None
+            self._pending.move_to_end(root)
+            self._condition.notify()
+
+    def cancel(self) -> None:
+        """Drop the requests that have not been drawn yet."""
+        with self._condition:
+            self._pending.clear()
+
+    def stop(self) -> None:
+        """Stop the background thread."""
+        _stop_thread(self._condition, self._stopped)
+        self._thread.join()
+
+    def _next_request(self) -> tuple[int, _LayerSnapshot, int] | None:
+        """Take the most recent request, with the layer snapshot and
+        generation it is for. Called with the condition held."""
+        while self._pending:
+            root, _ = self._pending.popitem()
+            if self._snapshot is not None:
+                return root, self._snapshot, self.generation
+        return None
+
+    def _render(self, root: int, snapshot: _LayerSnapshot, generation: int) -> None:
+        """Draw a thumbnail, in the background thread."""
+        try:
+            self._plotter.draw_trees([(snapshot, root)])
+        except Exception:
+            logger.exception(f"Could not draw the thumbnail of lineage {root}")
+            return
+        with self._condition:
+            # the renderer may have been stopped while drawing
+            if not self._stopped.is_set():
+                self.rendered.emit(generation, root, self._plotter.image.copy())
+
+
+class ThumbnailModel(QAbstractListModel):
+    """
+    The lineages of a layer, with their thumbnails as decorations.
+
+    Thumbnails are requested from a `ThumbnailRenderer` when a view first
+    asks for them, and stored in a least recently used cache.
+
+    Parameters
+    ----------
+    renderer :
+        Draws the thumbnails.
+    cache_size :
+        Maximum number of thumbnails stored. This should be more than the
+        number of tiles that fit in a view, or visible thumbnails are evicted
+        and drawn again.
+    """
+
+    def __init__(
+        self,
+        renderer: ThumbnailRenderer,
+        cache_size: int = THUMBNAIL_CACHE_SIZE,
+        parent=None,
+    ):
+        super().__init__(parent=parent)
+        self.renderer = renderer
+        self.cache_size = cache_size
+        self.roots = np.array([], dtype=np.int64)
+        # thumbnails by root ID, from least to most recently shown
+        self.cache: OrderedDict[int, QPixmap] = OrderedDict()
+        self._requested: set[int] = set()
+        renderer.rendered.connect(self.on_rendered)
+
+    def set_lineages(self, layer: Tracks | None, index: GraphIndex | None) -> None:
+        """Show the lineages of a layer, given its graph index."""
+        self.beginResetModel()
+        self.renderer.set_layer(layer, index)
+        self.roots = np.array([] if index is None else index.roots, dtype=np.int64)
+        self.cache.clear()
+        self._requested.clear()
+        self.endResetModel()
+
+    def cancel_requests(self) -> None:
+        """Drop the thumbnails that have been requested but not drawn, e.g.
+        because their tiles have been scrolled out of view."""
+        self.renderer.cancel()
+        self._requested.clear()
+
+    def rowCount(  # noqa: N802
+        self, parent: QModelIndex = QModelIndex()  # noqa: B008
+    ) -> int:
+        return 0 if parent.isValid() else self.roots.size
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        root = int(self.roots[index.row()])
+        if role == Qt.DisplayRole:
+            return f"#{root}"
+        if role == ROOT_ROLE:
+            return root
+        if role == Qt.DecorationRole:
+            pixmap = self.cache.get(root)
+            if pixmap is not None:
+                self.cache.move_to_end(root)
+            elif root not in self._requested:
+                self._requested.add(root)
+                self.renderer.request(root)
+            return pixmap
+        return None
+
+    def on_rendered(self, generation: int, root: int, image: np.ndarray) -> None:
+        """Store a thumbnail drawn by the renderer, and show it."""
+        if generation != self.renderer.generation:
+            return
+        self._requested.discard(root)
+        height, width, _ = image.shape
+        qimage = QImage(image.data, width, height, 4 * width, QImage.Format_RGBA8888)
+        # copy, since the image does not own the array's memory
+        self.cache[root] = QPixmap.fromImage(qimage.copy())
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        row = int(np.searchsorted(self.roots, root))
+        if row < self.roots.size and self.roots[row] == root:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+
+class LineageGallery(QWidget):
+    """
+    Gallery of thumbnails of every lineage of a tracks layer. Clicking a
+    thumbnail shows its lineage in the Arboretum widget.
+
+    Parameters
+    ----------
+    viewer :
+        The napari viewer.
+    arboretum :
+        The Arboretum widget that clicked lineages are shown in. Defaults to
+        the one docked in the viewer, which is added if needed.
+    """
+
+    # emitted with the root ID of a clicked lineage
+    lineage_selected = Signal(int)
+
+    def __init__(
+        self,
+        viewer: napari.Viewer = None,
+        arboretum: Arboretum | None = None,
+        parent=None,
+    ):
+        super().__init__(parent=parent)
+        self.viewer = napari.current_viewer() if viewer is None else viewer
+        self._arboretum = arboretum
+        self.layer: Tracks | None = None
+
+        self.layer_choice = QComboBox()
+        self.layer_choice.setToolTip("Tracks layer to show the lineages of.")
+        self.renderer = ThumbnailRenderer(parent=self)
+        self.model = ThumbnailModel(self.renderer, parent=self)
+        self.view = QListView()
+        self.view.setViewMode(QListView.IconMode)
+        self.view.setResizeMode(QListView.Adjust)
+        self.view.setMovement(QListView.Static)
+        self.view.setUniformItemSizes(True)
+        height, width = THUMBNAIL_SHAPE
+        self.view.setIconSize(QSize(width, height))
+        self.view.setGridSize(
+            QSize(width + TILE_PADDING, height + TILE_PADDING + LABEL_HEIGHT)
+        )
+        self.view.setModel(self.model)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.layer_choice)
+        layout.addWidget(self.view)
+        self.setLayout(layout)
+
+        # Keep the layer choice up to date with the tracks layers
+        self.viewer.layers.events.inserted.connect(self.update_layer_choice)
+        self.viewer.layers.events.removed.connect(self.update_layer_choice)
+        self.layer_choice.currentIndexChanged.connect(self.on_layer_chosen)
+        # Only draw the thumbnails of tiles that are still in view
+        self.view.verticalScrollBar().valueChanged.connect(
+            lambda _: self.model.cancel_requests()
+        )
+        self.view.clicked.connect(self.on_clicked)
+        self.update_layer_choice()
+
+    @property
+    def arboretum(self) -> Arboretum:
+        """The Arboretum widget that clicked lineages are shown in."""
+        if self._arboretum is None:
+            _, self._arboretum = self.viewer.window.add_plugin_dock_widget(
+                PLUGIN_NAME, ARBORETUM_WIDGET_NAME
+            )
+        return self._arboretum
+
+    def update_layer_choice(self, event=None) -> None:
+        """List the tracks layers in the viewer, keeping the chosen layer if
+        it is still there."""
+        layers = [layer for layer in self.viewer.layers if isinstance(layer, Tracks)]
+        with QSignalBlocker(self.layer_choice):
+            self.layer_choice.clear()
+            for layer in layers:
+                self.layer_choice.addItem(layer.name, layer)
+            if self.layer in layers:
+                self.layer_choice.setCurrentIndex(layers.index(self.layer))
+        self.on_layer_chosen()
+
+    def on_layer_chosen(self, event=None) -> None:
+        """Show the lineages of the chosen layer."""
+        layer = self.layer_choice.currentData()
+        if layer is self.layer:
+            return
+        if self.layer is not None:
+            for emitter in self._redraw_events(self.layer):
+                emitter.disconnect(self.refresh)
+        self.layer = layer
+        if layer is not None:
+            for emitter in self._redraw_events(layer):
+                emitter.connect(self.refresh)
+        self.refresh()
+
+    def refresh(self, event=None) -> None:
+        """Re-draw every thumbnail, e.g. after the layer colours change."""
+        layer = self.layer
+        index = None
+        if layer is not None:
+            index = (
+                self._arboretum.graph_index(layer)
+                if self._arboretum is not None
+                else build_graph_index(layer.data, layer.graph)
+            )
+        self.model.set_lineages(layer, index)
+
+    def on_clicked(self, index: QModelIndex) -> None:
+        """Show the clicked lineage in the Arboretum widget."""
+        root = self.model.data(index, ROOT_ROLE)
+        arboretum = self.arboretum
+        arboretum.tracks = self.layer
+        arboretum.track_id = root
+        arboretum.draw_current_time_line()
+        self.lineage_selected.emit(root)
+
+    def closeEvent(self, event) -> None:  # noqa: N802
+        self.renderer.stop()
+        super().closeEvent(event)
+
+    @staticmethod
+    def _redraw_events(layer: Tracks) -> list:
+        return [layer.events.data, layer.events.color_by, layer.events.colormap]
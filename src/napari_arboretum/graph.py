@@ -6,11 +6,24 @@ visualisation. Code for this is kept in `tree.py`.
 """
 from __future__ import annotations
 
+import logging
+from collections import deque
 from dataclasses import dataclass, field
+from functools import cached_property, lru_cache
+from typing import TYPE_CHECKING, Iterable
 
-import napari
 import numpy as np
 
+if TYPE_CHECKING:
+    import napari
+
+    from napari_arboretum.registry import LayerRegistry
+
+logger = logging.getLogger(__name__)
+
+# maximum number of track IDs listed for each kind of problem in a report
+MAX_REPORTED_IDS = 10
+
 
 @dataclass
 class TreeNode:
@@ -75,6 +88,43 @@ def build_reverse_graph(graph: dict) -> tuple[list | set, dict[int, list[int]]]:
     return sorted_roots, reverse_graph
 
 
+def edges_from_graph(graph: dict) -> np.ndarray:
+    """Convert a graph dictionary to an edge list.
+
+    Parameters
+    ----------
+    graph : dict
+        A dictionary encoding the graph, taken from the napari.Tracks layer.
+
+    Returns
+    -------
+    edges : np.ndarray
+        An (E, 2) integer array, where each row is a (child, parent) pair.
+    """
+    edges = [(node, parent) for node, parents in graph.items() for parent in parents]
+    return np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+
+
+def graph_from_edges(edges: np.ndarray) -> dict[int, list[int]]:
+    """Convert an edge list to a graph dictionary.
+
+    Parameters
+    ----------
+    edges : np.ndarray
+        An (E, 2) integer array, where each row is a (child, parent) pair.
+
+    Returns
+    -------
+    graph : dict
+        A dictionary mapping each child ID to a list of parent IDs.
+    """
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    order = np.argsort(edges[:, 0], kind="stable")
+    children, starts = np.unique(edges[order, 0], return_index=True)
+    parents = np.split(edges[order, 1], starts[1:])
+    return {c: p.tolist() for c, p in zip(children.tolist(), parents)}
+
+
 def linearise_tree(graph: dict, root: int) -> list:
     """Linearise a tree, i.e. return a list of track objects in the tree, but
     discard the heirarchy.
@@ -92,16 +142,516 @@ def linearise_tree(graph: dict, root: int) -> list:
     linear : list
         A linearised tree, with only the node ID of each node of the tree.
     """
-    queue = [root]
+    queue = deque([root])
     linear = []
+    # a cycle in the graph would otherwise be followed forever
+    visited = {root}
     while queue:
-        node = queue.pop(0)
+        node = queue.popleft()
         linear.append(node)
-        if node in graph:
-            queue.extend(iter(graph[node]))
+        for child in graph.get(node, []):
+            if child not in visited:
+                visited.add(child)
+                queue.append(child)
     return linear
 
 
+@dataclass
+class GraphProblems:
+    """Links of a tracks graph that can not be drawn as lineage trees.
+
+    Attributes
+    ----------
+    self_links : np.ndarray
+        Sorted IDs of tracks that are their own parent.
+    dangling : np.ndarray
+        Sorted IDs in the graph with no rows in the tracks data.
+    cycles : np.ndarray
+        Sorted IDs of tracks on a cycle of parent links, i.e. tracks that are
+        their own ancestor, ignoring self-links.
+    time_inconsistent : np.ndarray
+        Sorted IDs of tracks that start before one of their parents ends.
+    """
+
+    self_links: np.ndarray
+    dangling: np.ndarray
+    cycles: np.ndarray
+    time_inconsistent: np.ndarray
+
+    def __bool__(self) -> bool:
+        return any(ids.size for ids in vars(self).values())
+
+    def __str__(self) -> str:
+        lines = []
+        for name, ids in vars(self).items():
+            if ids.size:
+                listed = ", ".join(str(i) for i in ids[:MAX_REPORTED_IDS].tolist())
+                more = ", ..." if ids.size > MAX_REPORTED_IDS else ""
+                lines.append(f"{ids.size} {name.replace('_', ' ')}: {listed}{more}")
+        return "\n".join(lines) or "No problems"
+
+
+def _peel(source: np.ndarray, target: np.ndarray, n_nodes: int) -> np.ndarray:
+    """Repeatedly remove the nodes without incoming links, and their outgoing
+    links. Returns a mask of the nodes left, which are on a cycle or
+    downstream of one.
+
+    Each node and link is removed once, in vectorized steps of all the nodes
+    that have no incoming links left.
+    """
+    order = np.argsort(source, kind="stable")
+    source, target = source[order], target[order]
+    starts = np.searchsorted(source, np.arange(n_nodes + 1))
+    in_degree = np.bincount(target, minlength=n_nodes)
+    left = np.ones(n_nodes, dtype=bool)
+    frontier = np.flatnonzero(in_degree == 0)
+    while frontier.size:
+        left[frontier] = False
+        lengths = starts[frontier + 1] - starts[frontier]
+        within = np.arange(lengths.sum()) - np.repeat(
+            np.cumsum(lengths) - lengths, lengths
+        )
+        targets = target[np.repeat(starts[frontier], lengths) + within]
+        np.subtract.at(in_degree, targets, 1)
+        frontier = np.unique(targets[in_degree[targets] == 0])
+    return left
+
+
+def _cycle_nodes(
+    source: np.ndarray, target: np.ndarray, nodes: np.ndarray, n_nodes: int
+) -> np.ndarray:
+    """Return a mask of the nodes in a strongly connected component of more
+    than one node, i.e. the nodes on a cycle of links.
+
+    Components are found with an iterative version of Tarjan's algorithm,
+    started from each of ``nodes``. Only links between ``nodes`` are
+    followed, so this only visits the nodes left by `_peel`.
+    """
+    order = np.argsort(source, kind="stable")
+    targets = target[order].tolist()
+    starts = np.searchsorted(source[order], np.arange(n_nodes + 1)).tolist()
+    number = [-1] * n_nodes
+    low = [0] * n_nodes
+    on_stack = [False] * n_nodes
+    stack: list[int] = []
+    on_cycle = np.zeros(n_nodes, dtype=bool)
+    count = 0
+    for start in nodes.tolist():
+        if number[start] >= 0:
+            continue
+        number[start] = low[start] = count
+        count += 1
+        stack.append(start)
+        on_stack[start] = True
+        # the nodes being visited, and the next of their links to follow
+        path = [[start, starts[start]]]
+        while path:
+            step = path[-1]
+            node, link = step
+            if link < starts[node + 1]:
+                step[1] += 1
+                nxt = targets[link]
+                if number[nxt] < 0:
+                    number[nxt] = low[nxt] = count
+                    count += 1
+                    stack.append(nxt)
+                    on_stack[nxt] = True
+                    path.append([nxt, starts[nxt]])
+                elif on_stack[nxt]:
+                    low[node] = min(low[node], number[nxt])
+                continue
+            path.pop()
+            if path:
+                parent = path[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == number[node]:
+                # the node is the first visited of a component, which is the
+                # top of the stack down to the node
+                component = []
+                member = None
+                while member != node:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                if len(component) > 1:
+                    on_cycle[component] = True
+    return on_cycle
+
+
+def validate_graph(
+    track_ids: np.ndarray,
+    t_start: np.ndarray,
+    t_end: np.ndarray,
+    edges: np.ndarray,
+) -> GraphProblems:
+    """Find the links of a tracks graph that can not be drawn as trees.
+
+    Every check is done with array operations, in time linear in the number
+    of tracks and links (apart from sorting), so this can run on every graph
+    before it is traversed.
+
+    Parameters
+    ----------
+    track_ids :
+        Sorted unique IDs of the tracks in the data.
+    t_start, t_end :
+        The first and last time point of each of ``track_ids``.
+    edges :
+        An (E, 2) integer array of (child, parent) links, see
+        `edges_from_graph`.
+    """
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    self_link = edges[:, 0] == edges[:, 1]
+    links = edges[~self_link]
+
+    ids, positions = np.unique(links, return_inverse=True)
+    positions = positions.reshape(-1, 2)
+    child, parent = positions[:, 0], positions[:, 1]
+    # remove the tracks without children, then those without parents, leaving
+    # the tracks on cycles or on paths between them, which are told apart by
+    # finding the strongly connected tracks
+    left = _peel(child, parent, ids.size)
+    on_path = left[child] & left[parent]
+    left &= _peel(parent[on_path], child[on_path], ids.size)
+    on_path = left[child] & left[parent]
+    cycles = _cycle_nodes(
+        child[on_path], parent[on_path], np.flatnonzero(left), ids.size
+    )
+
+    # compare the times of links between tracks that have data
+    pos = np.searchsorted(track_ids, links)
+    has_data = np.zeros(links.shape, dtype=bool)
+    in_range = pos < track_ids.size
+    has_data[in_range] = track_ids[pos[in_range]] == links[in_range]
+    both = has_data.all(axis=1)
+    early = t_start[pos[both, 0]] < t_end[pos[both, 1]]
+
+    return GraphProblems(
+        self_links=np.unique(edges[self_link, 0]),
+        dangling=np.setdiff1d(edges, track_ids),
+        cycles=ids[cycles],
+        time_inconsistent=np.unique(links[both, 0][early]),
+    )
+
+
+@dataclass
+class TimeIndex:
+    """Interval index of the start and end times of every track.
+
+    Tracks are sorted by start time. A track overlapping a time window must
+    start after the window start minus the length of the longest track, so
+    an overlap query only checks the tracks starting in that range, found by
+    binary search.
+
+    Attributes
+    ----------
+    track_ids : np.ndarray
+        Track IDs, sorted by start time.
+    t_start, t_end : np.ndarray
+        Start and end time of each of ``track_ids``.
+    max_length : float
+        Length of the longest track.
+    """
+
+    track_ids: np.ndarray
+    t_start: np.ndarray
+    t_end: np.ndarray
+    max_length: float
+
+    def overlapping(self, t_min: float, t_max: float) -> np.ndarray:
+        """Return the IDs of the tracks that overlap the window
+        ``[t_min, t_max]``."""
+        lo = np.searchsorted(self.t_start, t_min - self.max_length, side="left")
+        hi = np.searchsorted(self.t_start, t_max, side="right")
+        return self.track_ids[lo:hi][self.t_end[lo:hi] >= t_min]
+
+
+@dataclass
+class GraphIndex:
+    """Lookup tables for every lineage of a tracks layer.
+
+    The index sorts the rows of the tracks data by track ID once, so that the
+    rows of any track, and the root of any lineage, can be found without
+    scanning the whole dataset.
+
+    Attributes
+    ----------
+    roots : list[int]
+        Sorted IDs of every track without a parent.
+    reverse_graph : dict
+        A reversed graph representing children of each parent node.
+    track_ids : np.ndarray
+        Sorted unique track IDs found in the data.
+    track_roots : np.ndarray
+        The root ID of the lineage containing each of ``track_ids``.
+    order : np.ndarray
+        Indices of the data rows, sorted (stably) by track ID.
+    offsets : np.ndarray
+        The rows of ``track_ids[i]`` are ``order[offsets[i]:offsets[i + 1]]``.
+    t : np.ndarray
+        The time column of the data.
+    t_start, t_end : np.ndarray
+        The first and last time point of each of ``track_ids``.
+    problems : GraphProblems | None
+        Problems found in the graph when the index was built, see
+        `validate_graph`.
+    """
+
+    roots: list[int]
+    reverse_graph: dict[int, list[int]]
+    track_ids: np.ndarray
+    track_roots: np.ndarray
+    order: np.ndarray
+    offsets: np.ndarray
+    t: np.ndarray
+    t_start: np.ndarray
+    t_end: np.ndarray
+    problems: GraphProblems | None = None
+
+    def _position(self, track_id: int) -> int | None:
+        pos = int(np.searchsorted(self.track_ids, track_id))
+        if pos < self.track_ids.size and self.track_ids[pos] == track_id:
+            return pos
+        return None
+
+    def rows(self, track_id: int) -> np.ndarray:
+        """Return the indices of the data rows belonging to a track."""
+        pos = self._position(track_id)
+        if pos is None:
+            return self.order[:0]
+        return self.order[self.offsets[pos] : self.offsets[pos + 1]]
+
+    def rows_of(self, track_ids: Iterable[int]) -> np.ndarray:
+        """Return the indices of the data rows belonging to several tracks.
+
+        The rows are gathered from the slice of each track in ``order``,
+        so this takes time proportional to the number of rows returned,
+        not to the size of the data.
+        """
+        ids = np.fromiter(track_ids, dtype=np.int64)
+        pos = np.searchsorted(self.track_ids, ids)
+        found = pos < self.track_ids.size
+        found[found] = self.track_ids[pos[found]] == ids[found]
+        pos = pos[found]
+        starts = self.offsets[pos]
+        lengths = self.offsets[pos + 1] - starts
+        # the index of each row within the slice of its track
+        within = np.arange(lengths.sum()) - np.repeat(
+            np.cumsum(lengths) - lengths, lengths
+        )
+        return self.order[np.repeat(starts, lengths) + within]
+
+    def times(self, track_id: int) -> np.ndarray:
+        """Return the timepoints of a track."""
+        return self.t[self.rows(track_id)]
+
+    def root_id(self, track_id: int) -> int:
+        """Return the root ID of the lineage containing a track."""
+        pos = self._position(track_id)
+        if pos is None:
+            return track_id
+        return int(self.track_roots[pos])
+
+    def subgraph(self, root: int) -> list[TreeNode]:
+        """Build the nodes of the lineage tree starting at ``root``.
+
+        Nodes are returned in breadth first order, starting with the root.
+        """
+        nodes = [self._node(root, generation=1)]
+        marked = {root}
+        queue = deque(nodes)
+
+        while queue:
+            node = queue.popleft()
+            for child in node.children:
+                if child not in marked:
+                    marked.add(child)
+                    child_node = self._node(child, generation=node.generation + 1)
+                    queue.append(child_node)
+                    nodes.append(child_node)
+
+        return nodes
+
+    @cached_property
+    def time_index(self) -> TimeIndex:
+        """Interval index of the start and end times of every track, built
+        the first time it is used."""
+        t_start, t_end = self.t_start, self.t_end
+        by_start = np.argsort(t_start, kind="stable")
+        return TimeIndex(
+            track_ids=self.track_ids[by_start],
+            t_start=t_start[by_start],
+            t_end=t_end[by_start],
+            max_length=float(np.max(t_end - t_start, initial=0)),
+        )
+
+    def window_subgraphs(
+        self, root: int, t_min: float, t_max: float
+    ) -> list[list[TreeNode]]:
+        """Build the nodes of the part of a lineage inside a time window.
+
+        Only the tracks that overlap the window are built, found with
+        `time_index`, and their times are clipped to the window. Tracks
+        whose parents end before the window become roots, so the window of
+        a lineage can contain several trees.
+
+        Parameters
+        ----------
+        root :
+            The root ID of the lineage.
+        t_min, t_max :
+            The time window.
+
+        Returns
+        -------
+        trees :
+            The nodes of each tree in the window, in breadth first order,
+            sorted by the start time of their root.
+        """
+        visible = self.time_index.overlapping(t_min, t_max)
+        pos = np.searchsorted(self.track_ids, visible)
+        in_lineage = visible[self.track_roots[pos] == root].tolist()
+        visible_set = set(visible.tolist())
+
+        children = {
+            i: [c for c in self.reverse_graph.get(i, []) if c in visible_set]
+            for i in in_lineage
+        }
+        has_parent = {c for cs in children.values() for c in cs}
+        window_roots = [i for i in in_lineage if i not in has_parent]
+
+        trees = []
+        marked = set(window_roots)
+        for window_root in window_roots:
+            nodes = [self._window_node(window_root, 1, t_min, t_max, visible_set)]
+            queue = deque(nodes)
+            while queue:
+                node = queue.popleft()
+                for child in node.children:
+                    if child not in marked:
+                        marked.add(child)
+                        child_node = self._window_node(
+                            child, node.generation + 1, t_min, t_max, visible_set
+                        )
+                        queue.append(child_node)
+                        nodes.append(child_node)
+            trees.append(nodes)
+        return trees
+
+    def _window_node(
+        self,
+        track_id: int,
+        generation: int,
+        t_min: float,
+        t_max: float,
+        visible: set[int],
+    ) -> TreeNode:
+        return TreeNode(
+            ID=track_id,
+            # times outside the window are moved to its edges
+            t=np.unique(np.clip(self.times(track_id), t_min, t_max)),
+            generation=generation,
+            children=[c for c in self.reverse_graph.get(track_id, []) if c in visible],
+        )
+
+    def _node(self, track_id: int, *, generation: int) -> TreeNode:
+        return TreeNode(
+            ID=track_id,
+            t=self.times(track_id),
+            generation=generation,
+            children=list(self.reverse_graph.get(track_id, [])),
+        )
+
+
+def build_graph_index(data: np.ndarray, graph: dict) -> GraphIndex:
+    """Build a :class:`GraphIndex` from tracks data and its graph.
+
+    The graph is checked with `validate_graph`, and any problems are logged
+    and stored in the index.
+
+    Parameters
+    ----------
+    data : np.ndarray
+        Tracks data, in the napari format (ID, T, (Z), Y, X).
+    graph : dict
+        A dictionary encoding the graph, taken from the napari.Tracks layer.
+
+    Returns
+    -------
+    index : GraphIndex
+    """
+    data = np.asarray(data)
+    ids = data[:, 0].astype(np.int64)
+    order = np.argsort(ids, kind="stable")
+    track_ids, starts = np.unique(ids[order], return_index=True)
+    offsets = np.append(starts, ids.size)
+
+    _, reverse_graph = build_reverse_graph(graph)
+    roots = sorted(
+        (set(track_ids.tolist()) | set(reverse_graph.keys())) - set(graph.keys())
+    )
+
+    # walk each lineage once to label every track with its root
+    root_of: dict[int, int] = {}
+    for root in roots:
+        queue = deque([root])
+        root_of[root] = root
+        while queue:
+            node = queue.popleft()
+            for child in reverse_graph.get(node, []):
+                if child not in root_of:
+                    root_of[child] = root
+                    queue.append(child)
+
+    track_roots = np.fromiter(
+        (root_of.get(i, i) for i in track_ids.tolist()),
+        dtype=np.int64,
+        count=track_ids.size,
+    )
+
+    t = data[:, 1]
+    t_start = t_end = np.array([], dtype=t.dtype)
+    if track_ids.size:
+        t_start = np.minimum.reduceat(t[order], starts)
+        t_end = np.maximum.reduceat(t[order], starts)
+    problems = validate_graph(track_ids, t_start, t_end, edges_from_graph(graph))
+    if problems:
+        logger.warning(f"Problems found in the tracks graph:\n{problems}")
+
+    return GraphIndex(
+        roots=roots,
+        reverse_graph=reverse_graph,
+        track_ids=track_ids,
+        track_roots=track_roots,
+        order=order,
+        offsets=offsets,
+        t=t,
+        t_start=t_start,
+        t_end=t_end,
+        problems=problems,
+    )
+
+
+@lru_cache(maxsize=None)
+def _registry() -> LayerRegistry:
+    """The registry of the graph indexes built by `layer_graph_index`."""
+    # only loaded once a layer is indexed, not when napari discovers the plugin
+    from napari_arboretum.registry import LayerRegistry  # noqa: PLC0415
+
+    return LayerRegistry()
+
+
+def layer_graph_index(layer: napari.layers.Tracks) -> GraphIndex:
+    """Return the graph index of a tracks layer.
+
+    The index is built, and its graph validated, the first time it is used,
+    and rebuilt if the data or graph of the layer is replaced.
+    """
+    return _registry().get(
+        layer, "graph_index", lambda: build_graph_index(layer.data, layer.graph)
+    )
+
+
 def get_root_id(layer: napari.layers.Tracks, search_node: int) -> int:
     """
     Get the root node of a given track ID.
@@ -118,15 +668,7 @@ def get_root_id(layer: napari.layers.Tracks, search_node: int) -> int:
     root_id :
         The root node ID of the tree which contains the node.
     """
-    roots, reverse_graph = build_reverse_graph(layer.graph)
-    linear_trees = [linearise_tree(reverse_graph, root) for root in roots]
-
-    root_id = search_node
-    for root, tree in zip(roots, linear_trees):
-        if search_node in tree:
-            root_id = root
-
-    return root_id
+    return layer_graph_index(layer).root_id(search_node)
 
 
 def build_subgraph(layer: napari.layers.Tracks, search_node: int) -> list[TreeNode]:
@@ -149,35 +691,5 @@ def build_subgraph(layer: napari.layers.Tracks, search_node: int) -> list[TreeNo
     nodes :
         The nodes of the subtree that contain the search node.
     """
-    _, reverse_graph = build_reverse_graph(layer.graph)
-    root_id = get_root_id(layer, search_node)
-
-    def _node_from_graph(_id):
-        idx = layer.data[:, 0] == _id
-        # t = (np.min(layer.data[idx, 1]), np.max(layer.data[idx, 1]))
-        t = layer.data[idx, 1]
-        node = TreeNode(ID=_id, t=t, generation=1)
-
-        if _id in reverse_graph:
-            node.children = reverse_graph[_id]
-
-        return node
-
-    # now build the treenode objects
-    nodes = [_node_from_graph(root_id)]
-    marked = [root_id]
-
-    queue = [nodes[0]]
-
-    # breadth first search
-    while queue:
-        node = queue.pop(0)
-        for child in node.children:
-            if child not in marked:
-                marked.append(child)
-                child_node = _node_from_graph(child)
-                child_node.generation = node.generation + 1
-                queue.append(child_node)
-                nodes.append(child_node)
-
-    return nodes
+    index = layer_graph_index(layer)
+    return index.subgraph(index.root_id(search_node))
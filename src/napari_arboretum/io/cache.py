@@ -0,0 +1,154 @@
+"""
+Cache parsed tracks and images as memory-mapped NumPy arrays.
+
+Parsing CSV, JSON and TIFF files is slow, so the parsed arrays are stored in
+a cache directory next to the pooch download cache, keyed by a hash of the
+source files. Later loads of the same files memory-map the cached arrays
+instead of parsing the source files again.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import pathlib
+import shutil
+import tempfile
+from typing import Callable
+
+import numpy as np
+import pooch
+
+from napari_arboretum.io.npy import is_tracks_dir, read_tracks, write_tracks
+from napari_arboretum.io.tables import read_tracks_csv
+
+# bump this if the layout of the cached files changes
+CACHE_VERSION = 1
+
+CACHE_DIR = pathlib.Path(pooch.os_cache("arboretum")) / "parsed"
+
+IMAGE_FILE = "image.npy"
+
+
+def cache_key(*files: os.PathLike | None, hashes: list[str] | None = None) -> str:
+    """Return the cache key of a set of source files.
+
+    Parameters
+    ----------
+    files :
+        The source files. ``None`` entries (e.g. missing optional files) are
+        allowed, and are part of the key.
+    hashes :
+        Known SHA256 hashes of ``files``, e.g. from a pooch registry. If not
+        given, the hashes are computed from the files.
+    """
+    if hashes is None:
+        hashes = [
+            "none" if f is None else pooch.file_hash(str(f), alg="sha256")
+            for f in files
+        ]
+    key = "|".join([f"v{CACHE_VERSION}", *hashes])
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _cached_dir(
+    key: str, write: Callable[[pathlib.Path], None], cache_dir: os.PathLike | None
+) -> pathlib.Path:
+    """Return the cache directory for ``key``, calling ``write`` to fill it if
+    it does not exist yet."""
+    path = pathlib.Path(CACHE_DIR if cache_dir is None else cache_dir) / key
+    if path.exists():
+        return path
+
+    # write to a temporary directory first, so that an interrupted write is
+    # never mistaken for a complete cache entry
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = pathlib.Path(tempfile.mkdtemp(dir=path.parent, prefix=f".{key}-"))
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except OSError:
+        # another process finished writing the same entry first
+        if not path.exists():
+            raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return path
+
+
+def load_tracks_cached(
+    tracks: os.PathLike | Callable[[], os.PathLike],
+    graph: os.PathLike | Callable[[], os.PathLike] | None = None,
+    properties: os.PathLike | Callable[[], os.PathLike] | None = None,
+    *,
+    hashes: list[str] | None = None,
+    cache_dir: os.PathLike | None = None,
+) -> tuple[np.ndarray, dict[str, np.ndarray], dict[int, list[int]]]:
+    """Load tracks from CSV and JSON files, using the parsed-data cache.
+
+    Parameters
+    ----------
+    tracks, graph, properties :
+        The source files, as accepted by
+        `napari_arboretum.io.tables.read_tracks_csv`. Each can also be a
+        callable returning the file name, which is only called if the files
+        need parsing (e.g. to download them).
+    hashes :
+        Known SHA256 hashes of the source files. Required if any of the
+        source files are given as callables.
+    cache_dir :
+        Cache directory. Defaults to `CACHE_DIR`.
+
+    Returns
+    -------
+    data, properties, graph :
+        Memory-mapped tracks data and properties, and the tracks graph.
+    """
+    sources = [tracks, graph, properties]
+    key = cache_key(*sources, hashes=hashes)
+
+    def write(path: pathlib.Path) -> None:
+        files = [f() if callable(f) else f for f in sources]
+        write_tracks(path, *read_tracks_csv(*files))
+
+    path = _cached_dir(key, write, cache_dir)
+    if not is_tracks_dir(path):
+        msg = f"Corrupt cache entry {path}, delete it and try again."
+        raise OSError(msg)
+    return read_tracks(path)
+
+
+def load_image_cached(
+    filename: os.PathLike | Callable[[], os.PathLike],
+    *,
+    hashes: list[str] | None = None,
+    cache_dir: os.PathLike | None = None,
+) -> np.ndarray:
+    """Load an image with `skimage.io.imread`, using the parsed-data cache.
+
+    Parameters
+    ----------
+    filename :
+        The image file, or a callable returning the file name, which is only
+        called if the image needs decoding.
+    hashes :
+        Known SHA256 hash of the image file, as a single item list. Required
+        if ``filename`` is a callable.
+    cache_dir :
+        Cache directory. Defaults to `CACHE_DIR`.
+
+    Returns
+    -------
+    image :
+        The memory-mapped image.
+    """
+
+    def write(path: pathlib.Path) -> None:
+        # skimage is slow to import, so it is only loaded to read an image
+        from skimage.io import imread  # noqa: PLC0415
+
+        np.save(
+            path / IMAGE_FILE, imread(filename() if callable(filename) else filename)
+        )
+
+    path = _cached_dir(cache_key(filename, hashes=hashes), write, cache_dir)
+    return np.load(path / IMAGE_FILE, mmap_mode="r")
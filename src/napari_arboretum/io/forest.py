@@ -0,0 +1,194 @@
+"""
+Streaming exporters for whole forests of lineage trees.
+
+Each exporter walks the graph index iteratively (so deep lineages do not hit
+the Python recursion limit) and writes one lineage at a time straight to the
+output file. Branch lengths are the track durations, in frames.
+
+Newick and PhyloXML can only describe trees, so a track with several parents
+(a merge) is written once, under the first parent that reaches it. GraphML
+describes general graphs and keeps every merge edge.
+"""
+from __future__ import annotations
+
+import os
+from typing import Iterable, Iterator, TextIO
+
+from napari_arboretum.graph import GraphIndex
+
+GRAPHML_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+    '<key id="t_start" for="node" attr.name="t_start" attr.type="double"/>\n'
+    '<key id="t_end" for="node" attr.name="t_end" attr.type="double"/>\n'
+    '<key id="root" for="node" attr.name="root" attr.type="long"/>\n'
+    '<key id="length" for="edge" attr.name="length" attr.type="double"/>\n'
+    '<graph id="forest" edgedefault="directed">\n'
+)
+GRAPHML_FOOTER = "</graph>\n</graphml>\n"
+
+PHYLOXML_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<phyloxml xmlns="http://www.phyloxml.org">\n'
+)
+PHYLOXML_FOOTER = "</phyloxml>\n"
+
+
+def _branch_length(index: GraphIndex, track_id: int) -> float:
+    t = index.times(track_id)
+    return float(t.max() - t.min()) if t.size else 0.0
+
+
+def _lineage_children(
+    index: GraphIndex, node: int, root: int, visited: set[int]
+) -> list[int]:
+    """Children of ``node`` that belong to the lineage of ``root`` and have not
+    been visited yet. The children are marked as visited."""
+    children = [
+        c
+        for c in index.reverse_graph.get(node, [])
+        if c not in visited and index.root_id(c) == root
+    ]
+    visited.update(children)
+    return children
+
+
+# events yielded when walking a lineage as a nested tree
+OPEN, CLOSE, LEAF, SEPARATOR = range(4)
+
+
+def _walk_nested(index: GraphIndex, root: int) -> Iterator[tuple[int, int]]:
+    """Iteratively walk a lineage depth first, yielding ``(event, track_id)``
+    pairs that describe its nested (tree) representation."""
+    visited = {root}
+    stack = [(LEAF, root)]
+    while stack:
+        event, node = stack.pop()
+        if event != LEAF:
+            yield event, node
+            continue
+        children = _lineage_children(index, node, root, visited)
+        if not children:
+            yield LEAF, node
+            continue
+        yield OPEN, node
+        stack.append((CLOSE, node))
+        for i, child in enumerate(reversed(children)):
+            if i:
+                stack.append((SEPARATOR, node))
+            stack.append((LEAF, child))
+
+
+def write_newick(f: TextIO, index: GraphIndex, roots: Iterable[int]) -> None:
+    """Write lineages to an open file in Newick format, one tree per line."""
+
+    def label(node: int) -> str:
+        return f"{node}:{_branch_length(index, node):g}"
+
+    tokens = {
+        OPEN: lambda _: "(",
+        CLOSE: lambda node: ")" + label(node),
+        LEAF: label,
+        SEPARATOR: lambda _: ",",
+    }
+    for root in roots:
+        f.writelines(tokens[event](node) for event, node in _walk_nested(index, root))
+        f.write(";\n")
+
+
+def write_phyloxml(f: TextIO, index: GraphIndex, roots: Iterable[int]) -> None:
+    """Write lineages to an open file in PhyloXML format, one phylogeny per
+    lineage."""
+
+    def clade(node: int) -> str:
+        return (
+            f"<clade><name>{node}</name>"
+            f"<branch_length>{_branch_length(index, node):g}</branch_length>"
+        )
+
+    tokens = {
+        OPEN: clade,
+        CLOSE: lambda _: "</clade>",
+        LEAF: lambda node: clade(node) + "</clade>",
+        SEPARATOR: lambda _: "",
+    }
+    f.write(PHYLOXML_HEADER)
+    for root in roots:
+        f.write(f'<phylogeny rooted="true">\n<name>{root}</name>\n')
+        f.writelines(tokens[event](node) for event, node in _walk_nested(index, root))
+        f.write("\n</phylogeny>\n")
+    f.write(PHYLOXML_FOOTER)
+
+
+def write_graphml(f: TextIO, index: GraphIndex, roots: Iterable[int]) -> None:
+    """Write lineages to an open file in GraphML format, as a single directed
+    graph. Every parent-child link between the written lineages, including
+    merges, is written as an edge.
+    """
+    roots = list(roots)
+    selected = set(roots)
+    f.write(GRAPHML_HEADER)
+    for root in roots:
+        queue = [root]
+        visited = {root}
+        while queue:
+            node = queue.pop()
+            t = index.times(node)
+            f.write(f'<node id="n{node}">')
+            if t.size:
+                f.write(
+                    f'<data key="t_start">{t.min():g}</data>'
+                    f'<data key="t_end">{t.max():g}</data>'
+                )
+            f.write(f'<data key="root">{root}</data></node>\n')
+
+            for child in index.reverse_graph.get(node, []):
+                child_root = index.root_id(child)
+                # skip links to tracks that are not written as nodes
+                if child_root not in selected:
+                    continue
+                f.write(
+                    f'<edge source="n{node}" target="n{child}">'
+                    f'<data key="length">{_branch_length(index, child):g}</data>'
+                    "</edge>\n"
+                )
+                # tracks are only expanded from the lineage that they belong
+                # to, so each track and edge is only written once
+                if child not in visited and child_root == root:
+                    visited.add(child)
+                    queue.append(child)
+    f.write(GRAPHML_FOOTER)
+
+
+WRITERS = {
+    "newick": write_newick,
+    "graphml": write_graphml,
+    "phyloxml": write_phyloxml,
+}
+
+
+def export_forest(
+    filename: os.PathLike,
+    index: GraphIndex,
+    *,
+    fmt: str = "newick",
+    roots: Iterable[int] | None = None,
+) -> None:
+    """Export lineage trees to a Newick, GraphML or PhyloXML file.
+
+    Parameters
+    ----------
+    filename :
+        The file to write to.
+    index :
+        The graph index of the tracks.
+    fmt :
+        One of ``"newick"``, ``"graphml"`` or ``"phyloxml"``.
+    roots :
+        The root IDs of the lineages to export. Defaults to all lineages.
+    """
+    if fmt not in WRITERS:
+        msg = f"Unknown forest format {fmt!r}, use one of {list(WRITERS)}"
+        raise ValueError(msg)
+    with open(filename, "w") as f:
+        WRITERS[fmt](f, index, index.roots if roots is None else roots)
@@ -0,0 +1,251 @@
+"""
+Cache graph indexes and tree layouts on disk, across napari sessions.
+
+Building the graph index of a large tracks layer, and laying out its biggest
+lineages, can take seconds. `LayoutCache` stores the index arrays, and the
+layout of every lineage that is drawn, in a cache directory keyed by a hash
+of the tracks data and graph::
+
+    <key>/
+        track_ids.npy, track_roots.npy, order.npy, offsets.npy, roots.npy
+        problems.npz                        problems found in the graph
+        layouts/
+            <layout>-<root>.npy             (E, 5) array of edges
+            <layout>-<root>-labels.npy      (A, 3) array of annotations
+
+Cached arrays are memory-mapped when a known dataset is opened again. The
+least recently used entries are deleted when the cache grows larger than
+`MAX_CACHE_SIZE`.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import pathlib
+import shutil
+import tempfile
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pooch
+
+from napari_arboretum.graph import (
+    GraphIndex,
+    GraphProblems,
+    TreeNode,
+    build_graph_index,
+    build_reverse_graph,
+    edges_from_graph,
+)
+from napari_arboretum.io.cache import _cached_dir
+from napari_arboretum.tree import (
+    LAYOUTS,
+    Annotation,
+    Edge,
+    layout_from_arrays,
+    layout_to_arrays,
+)
+
+if TYPE_CHECKING:
+    import napari
+
+# bump this if the layout of the cached files, or the layouts, change
+CACHE_VERSION = 3
+
+CACHE_DIR = pathlib.Path(pooch.os_cache("arboretum")) / "layouts"
+
+# the least recently used entries are deleted above this size, in bytes
+MAX_CACHE_SIZE = 2 * 1024**3
+
+INDEX_FILES = (
+    "track_ids",
+    "track_roots",
+    "order",
+    "offsets",
+    "t_start",
+    "t_end",
+    "roots",
+)
+PROBLEMS_FILE = "problems.npz"
+LAYOUTS_DIR = "layouts"
+
+
+def content_key(data: np.ndarray, graph: dict) -> str:
+    """Return the cache key of some tracks, a hash of their data and graph."""
+    h = hashlib.blake2b(f"v{CACHE_VERSION}".encode(), digest_size=20)
+    data = np.ascontiguousarray(data)
+    h.update(str((data.dtype.str, data.shape)).encode())
+    h.update(memoryview(data).cast("B"))
+    h.update(edges_from_graph(graph).tobytes())
+    return h.hexdigest()
+
+
+def evict(
+    cache_dir: os.PathLike | None = None,
+    *,
+    max_size: int = MAX_CACHE_SIZE,
+    keep: str | None = None,
+) -> list[pathlib.Path]:
+    """Delete the least recently used cache entries, until the cache is no
+    larger than ``max_size`` bytes.
+
+    Parameters
+    ----------
+    cache_dir :
+        Cache directory. Defaults to `CACHE_DIR`.
+    max_size :
+        Maximum size of the cache, in bytes.
+    keep :
+        Key of an entry that is never deleted, e.g. the one in use.
+
+    Returns
+    -------
+    deleted :
+        The deleted entries.
+    """
+    root = pathlib.Path(CACHE_DIR if cache_dir is None else cache_dir)
+    if not root.is_dir():
+        return []
+    # temporary directories of unfinished writes start with a dot
+    entries = [p for p in root.iterdir() if p.is_dir() and not p.name.startswith(".")]
+    sizes = {
+        p: sum(f.stat().st_size for f in p.rglob("*") if f.is_file()) for p in entries
+    }
+    total = sum(sizes.values())
+
+    deleted = []
+    for entry in sorted(entries, key=lambda p: p.stat().st_mtime):
+        if total <= max_size:
+            break
+        if entry.name == keep:
+            continue
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= sizes[entry]
+        deleted.append(entry)
+    return deleted
+
+
+def _save(filename: pathlib.Path, values: np.ndarray) -> None:
+    """Save an array, so that it is never read while partly written."""
+    fd, tmp = tempfile.mkstemp(dir=filename.parent, prefix=".", suffix=".npy")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, values)
+        os.replace(tmp, filename)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class LayoutCache:
+    """
+    On-disk cache of the graph index and tree layouts of a set of tracks.
+
+    Parameters
+    ----------
+    data :
+        Tracks data, in the napari format (ID, T, (Z), Y, X).
+    graph :
+        A dictionary mapping track IDs to a list of parent IDs.
+    cache_dir :
+        Cache directory. Defaults to `CACHE_DIR`.
+    max_size :
+        Maximum size of the cache, in bytes, see `evict`.
+
+    Attributes
+    ----------
+    key : str
+        The cache key of the tracks, see `content_key`.
+    path : pathlib.Path
+        The cache entry of the tracks.
+    """
+
+    def __init__(
+        self,
+        data: np.ndarray,
+        graph: dict,
+        *,
+        cache_dir: os.PathLike | None = None,
+        max_size: int = MAX_CACHE_SIZE,
+    ):
+        self._data = data
+        self._graph = graph
+        self._index: GraphIndex | None = None
+        self.key = content_key(data, graph)
+
+        def write(path: pathlib.Path) -> None:
+            self._index = build_graph_index(data, graph)
+            for name in INDEX_FILES:
+                np.save(path / f"{name}.npy", np.asarray(getattr(self._index, name)))
+            np.savez(path / PROBLEMS_FILE, **vars(self._index.problems))
+
+        cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+        self.path = _cached_dir(self.key, write, cache_dir)
+        (self.path / LAYOUTS_DIR).mkdir(exist_ok=True)
+        # mark the entry as recently used
+        os.utime(self.path)
+        evict(cache_dir, max_size=max_size, keep=self.key)
+
+    @property
+    def graph_index(self) -> GraphIndex:
+        """The graph index of the tracks, with memory-mapped arrays if it was
+        read from the cache."""
+        if self._index is None:
+            arrays = {
+                name: np.load(self.path / f"{name}.npy", mmap_mode="r")
+                for name in INDEX_FILES
+            }
+            with np.load(self.path / PROBLEMS_FILE) as problems:
+                arrays["problems"] = GraphProblems(**problems)
+            _, reverse_graph = build_reverse_graph(self._graph)
+            self._index = GraphIndex(
+                roots=arrays.pop("roots").tolist(),
+                reverse_graph=reverse_graph,
+                t=np.asarray(self._data)[:, 1],
+                **arrays,
+            )
+        return self._index
+
+    def layout(
+        self, nodes: list[TreeNode], *, layout: str = "auto"
+    ) -> tuple[list[Edge], list[Annotation]]:
+        """Layout a lineage, reading the layout from the cache if it has been
+        laid out before.
+
+        Parameters
+        ----------
+        nodes :
+            A list of graph.TreeNode objects encoding a single lineage, as
+            built by ``graph_index.subgraph``.
+        layout :
+            The layout, one of `napari_arboretum.tree.LAYOUTS`.
+
+        Returns
+        -------
+        edges :
+            A list of edges to be drawn.
+        annotations :
+            A list of annotations to be added to the graph.
+        """
+        edges_file = self.path / LAYOUTS_DIR / f"{layout}-{nodes[0].ID}.npy"
+        labels_file = edges_file.with_name(f"{edges_file.stem}-labels.npy")
+
+        if not (edges_file.exists() and labels_file.exists()):
+            edges, annotations = LAYOUTS[layout](nodes)
+            edges_array, labels_array = layout_to_arrays(edges, annotations)
+            _save(edges_file, edges_array)
+            _save(labels_file, labels_array)
+            return edges, annotations
+
+        return layout_from_arrays(
+            np.load(edges_file, mmap_mode="r"),
+            np.load(labels_file, mmap_mode="r"),
+            nodes,
+        )
+
+
+def layout_cache(
+    layer: napari.layers.Tracks, *, cache_dir: os.PathLike | None = None
+) -> LayoutCache:
+    """Open the layout cache of a napari Tracks layer."""
+    return LayoutCache(layer.data, layer.graph, cache_dir=cache_dir)
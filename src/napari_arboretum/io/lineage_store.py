@@ -0,0 +1,255 @@
+"""
+Load the tracks of one lineage at a time from a tracks directory.
+
+A lineage store is a tracks directory (see `napari_arboretum.io.npy`) whose
+rows are sorted by the root ID of the lineage they belong to, and then by
+track ID, with three extra index files::
+
+    experiment/
+        lineages.npy            (L, 3) int64 array of (root, start, stop) rows
+        tracks.npy              (T, 4) int64 array of (track ID, root, start,
+                                stop) rows
+        children.npy            (E, 2) int64 array of (parent, child) edges
+
+The edges in ``graph.npy`` are sorted by child, and those in ``children.npy``
+by parent. Both are stored column-major, so the parents or children of any
+track can be found with a binary search of the memory-mapped file.
+
+Only the lineage and track indices are held in memory. The rows of a lineage,
+or of a track, are a contiguous slice of the memory-mapped columns, so they
+can be read on demand, and datasets much larger than RAM can be browsed one
+lineage at a time.
+"""
+from __future__ import annotations
+
+import os
+import pathlib
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from napari_arboretum.graph import (
+    TreeNode,
+    build_graph_index,
+    edges_from_graph,
+    graph_from_edges,
+)
+from napari_arboretum.io.npy import DATA_FILE, GRAPH_FILE, PROPERTIES_DIR
+
+if TYPE_CHECKING:
+    import napari
+
+LINEAGES_FILE = "lineages.npy"
+TRACKS_FILE = "tracks.npy"
+CHILDREN_FILE = "children.npy"
+
+# number of rows copied at a time when writing a lineage store
+WRITE_CHUNK_SIZE = 1_000_000
+
+
+def _write_sorted(filename: os.PathLike, values: np.ndarray, order: np.ndarray) -> None:
+    """Write ``values[order]`` to a .npy file, a chunk of rows at a time."""
+    values = np.asanyarray(values)
+    if values.dtype == object:
+        values = values.astype(str)
+    out = np.lib.format.open_memmap(
+        filename, mode="w+", dtype=values.dtype, shape=values.shape
+    )
+    for start in range(0, order.size, WRITE_CHUNK_SIZE):
+        chunk = order[start : start + WRITE_CHUNK_SIZE]
+        out[start : start + chunk.size] = values[chunk]
+    out.flush()
+
+
+def _save_edges(filename: os.PathLike, edges: np.ndarray) -> None:
+    """Save edges sorted by their first column, column-major, so that the
+    first column can be searched without reading the second."""
+    order = np.argsort(edges[:, 0], kind="stable")
+    np.save(filename, np.asfortranarray(edges[order]))
+
+
+def _ranges(starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    """The concatenation of ``range(start, stop)`` for every start and stop."""
+    counts = stops - starts
+    return np.arange(counts.sum()) + np.repeat(
+        starts - np.cumsum(counts) + counts, counts
+    )
+
+
+def _links(edges: np.ndarray, track_ids: np.ndarray) -> np.ndarray:
+    """Read the rows of ``edges``, sorted by their first column, whose first
+    column is one of ``track_ids``."""
+    rows = _ranges(
+        np.searchsorted(edges[:, 0], track_ids, side="left"),
+        np.searchsorted(edges[:, 0], track_ids, side="right"),
+    )
+    return np.asarray(edges[rows]).reshape(-1, 2)
+
+
+def write_lineage_store(
+    path: os.PathLike,
+    data: np.ndarray,
+    properties: dict[str, np.ndarray] | None = None,
+    graph: dict | None = None,
+) -> None:
+    """Write tracks to a lineage store.
+
+    Parameters
+    ----------
+    path :
+        Directory to write to. It is created if it does not exist.
+    data :
+        Tracks data, in the napari format (ID, T, (Z), Y, X). This can be a
+        memory-mapped array, as rows are copied to the store in chunks.
+    properties :
+        A dictionary of per-vertex property arrays.
+    graph :
+        A dictionary mapping track IDs to a list of parent IDs.
+    """
+    path = pathlib.Path(path)
+    (path / PROPERTIES_DIR).mkdir(parents=True, exist_ok=True)
+    graph = {} if graph is None else graph
+
+    index = build_graph_index(data, graph)
+    ids = np.asarray(data[:, 0]).astype(np.int64)
+    row_roots = index.track_roots[np.searchsorted(index.track_ids, ids)]
+    order = np.lexsort((ids, row_roots))
+
+    _write_sorted(path / DATA_FILE, data, order)
+    for name, values in ({} if properties is None else properties).items():
+        _write_sorted(path / PROPERTIES_DIR / f"{name}.npy", values, order)
+
+    edges = edges_from_graph(graph)
+    _save_edges(path / GRAPH_FILE, edges)
+    _save_edges(path / CHILDREN_FILE, edges[:, ::-1])
+
+    roots, starts = np.unique(row_roots[order], return_index=True)
+    stops = np.append(starts[1:], order.size)
+    np.save(path / LINEAGES_FILE, np.column_stack([roots, starts, stops]))
+
+    # every track belongs to one lineage, so its rows are contiguous
+    sorted_ids = ids[order]
+    starts = np.flatnonzero(np.diff(sorted_ids, prepend=sorted_ids[:1] - 1))
+    stops = np.append(starts[1:], order.size)
+    tracks = np.column_stack(
+        [sorted_ids[starts], row_roots[order][starts], starts, stops]
+    )
+    np.save(path / TRACKS_FILE, tracks[np.argsort(tracks[:, 0])])
+
+
+class LineageStore:
+    """
+    Read the tracks of single lineages from a lineage store.
+
+    Attributes
+    ----------
+    roots : np.ndarray
+        Sorted root IDs of every lineage in the store.
+    edges : np.memmap
+        Memory-mapped (child, parent) edges of the whole graph, sorted by
+        child.
+    data : np.memmap
+        Memory-mapped tracks data of the whole store.
+    properties : dict[str, np.memmap]
+        Memory-mapped per-vertex properties of the whole store.
+    """
+
+    def __init__(self, path: os.PathLike):
+        path = pathlib.Path(path)
+        self.data = np.load(path / DATA_FILE, mmap_mode="r")
+        self.properties = {
+            f.stem: np.load(f, mmap_mode="r")
+            for f in sorted((path / PROPERTIES_DIR).glob("*.npy"))
+        }
+        self.edges = np.load(path / GRAPH_FILE, mmap_mode="r")
+        self._children = np.load(path / CHILDREN_FILE, mmap_mode="r")
+
+        lineages = np.load(path / LINEAGES_FILE)
+        self.roots = lineages[:, 0]
+        self._starts = lineages[:, 1]
+        self._stops = lineages[:, 2]
+
+        tracks = np.load(path / TRACKS_FILE)
+        self._track_ids = tracks[:, 0]
+        self._track_roots = tracks[:, 1]
+        self._track_starts = tracks[:, 2]
+        self._track_stops = tracks[:, 3]
+
+    def __len__(self) -> int:
+        return self.roots.size
+
+    def root_id(self, track_id: int) -> int:
+        """Return the root ID of the lineage containing a track."""
+        pos = int(np.searchsorted(self._track_ids, track_id))
+        if pos < self._track_ids.size and self._track_ids[pos] == track_id:
+            return int(self._track_roots[pos])
+        return track_id
+
+    def _slice(self, root: int) -> slice:
+        pos = int(np.searchsorted(self.roots, root))
+        if pos == self.roots.size or self.roots[pos] != root:
+            msg = f"No lineage with root ID {root}."
+            raise KeyError(msg)
+        return slice(int(self._starts[pos]), int(self._stops[pos]))
+
+    def lineage(
+        self, root: int
+    ) -> tuple[np.ndarray, dict[str, np.ndarray], dict[int, list[int]]]:
+        """Read the data, properties and graph of a single lineage.
+
+        Parameters
+        ----------
+        root :
+            The root ID of the lineage.
+
+        Returns
+        -------
+        data :
+            Tracks data of the lineage.
+        properties :
+            A dictionary of per-vertex property arrays of the lineage.
+        graph :
+            The part of the graph that contains the lineage tracks.
+        """
+        rows = self._slice(root)
+        data = np.array(self.data[rows])
+        properties = {k: np.array(v[rows]) for k, v in self.properties.items()}
+        track_ids = np.unique(data[:, 0]).astype(np.int64)
+        return data, properties, graph_from_edges(_links(self.edges, track_ids))
+
+    def _descendants(self, root: int) -> np.ndarray:
+        """Sorted IDs of every track reached from ``root`` by following the
+        links from parents to children, including ``root`` itself."""
+        reached = frontier = np.array([root], dtype=np.int64)
+        while frontier.size:
+            children = _links(self._children, frontier)[:, 1]
+            frontier = np.setdiff1d(children, reached)
+            reached = np.union1d(reached, frontier)
+        return reached
+
+    def build_subgraph(self, search_node: int) -> list[TreeNode]:
+        """Build the lineage tree containing ``search_node``.
+
+        This is equivalent to `napari_arboretum.graph.build_subgraph`, and
+        keeps the tracks of other lineages that are reached through merges,
+        but only reads the rows of the tracks in the tree.
+        """
+        root = self.root_id(search_node)
+        track_ids = self._descendants(root)
+        # tracks without any rows are not in the track index
+        found = np.isin(track_ids, self._track_ids)
+        pos = np.searchsorted(self._track_ids, track_ids[found])
+        rows = _ranges(self._track_starts[pos], self._track_stops[pos])
+        edges = _links(self.edges, track_ids)
+        edges = edges[np.isin(edges[:, 1], track_ids)]
+        return build_graph_index(
+            np.asarray(self.data[rows]), graph_from_edges(edges)
+        ).subgraph(root)
+
+    def tracks_layer(self, root: int) -> napari.layers.Tracks:
+        """Create a napari Tracks layer containing a single lineage."""
+        # the command line tools run without napari
+        from napari.layers import Tracks  # noqa: PLC0415
+
+        data, properties, graph = self.lineage(root)
+        return Tracks(data, properties=properties, graph=graph, name=f"lineage_{root}")
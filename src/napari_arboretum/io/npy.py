@@ -0,0 +1,153 @@
+"""
+Read and write tracks as a directory of memory-mappable NumPy arrays.
+
+The layout of a tracks directory is::
+
+    experiment/
+        data.npy                tracks data, (N, D) array of (ID, T, (Z), Y, X)
+        graph.npy               (E, 2) int64 array of (child, parent) edges
+        graph_keys.npy          (K,) int64 array of graph keys with no parents
+        properties/
+            {name}.npy          (N,) array of per-vertex property values
+
+Each column is a plain ``.npy`` file rather than a member of an ``.npz``
+archive, because archive members cannot be memory-mapped. Reading a tracks
+directory therefore only touches the pages of data that are actually used,
+and those pages are shared with the OS file cache.
+"""
+from __future__ import annotations
+
+import os
+import pathlib
+from typing import Any, Callable
+
+import numpy as np
+
+from napari_arboretum.graph import edges_from_graph, graph_from_edges
+from napari_arboretum.io.tables import read_tracks_csv
+
+DATA_FILE = "data.npy"
+GRAPH_FILE = "graph.npy"
+# keys of the graph with an empty list of parents, which have no edges
+GRAPH_KEYS_FILE = "graph_keys.npy"
+PROPERTIES_DIR = "properties"
+
+
+def is_tracks_dir(path: os.PathLike) -> bool:
+    """Return ``True`` if ``path`` is a tracks directory."""
+    path = pathlib.Path(path)
+    return (path / DATA_FILE).is_file() and (path / GRAPH_FILE).is_file()
+
+
+def write_tracks(
+    path: os.PathLike,
+    data: np.ndarray,
+    properties: dict[str, np.ndarray] | None = None,
+    graph: dict | None = None,
+) -> None:
+    """Write tracks to a tracks directory.
+
+    Parameters
+    ----------
+    path :
+        Directory to write to. It is created if it does not exist.
+    data :
+        Tracks data, in the napari format (ID, T, (Z), Y, X).
+    properties :
+        A dictionary of per-vertex property arrays.
+    graph :
+        A dictionary mapping track IDs to a list of parent IDs.
+    """
+    path = pathlib.Path(path)
+    (path / PROPERTIES_DIR).mkdir(parents=True, exist_ok=True)
+
+    graph = {} if graph is None else graph
+    np.save(path / DATA_FILE, np.asarray(data))
+    np.save(path / GRAPH_FILE, edges_from_graph(graph))
+    np.save(
+        path / GRAPH_KEYS_FILE,
+        np.array([k for k, parents in graph.items() if not parents], dtype=np.int64),
+    )
+
+    for name, prop in ({} if properties is None else properties).items():
+        values = np.asarray(prop)
+        # object arrays cannot be memory-mapped, so store them as strings
+        if values.dtype == object:
+            values = values.astype(str)
+        np.save(path / PROPERTIES_DIR / f"{name}.npy", values)
+
+
+def read_tracks(
+    path: os.PathLike, *, mmap_mode: str | None = "r"
+) -> tuple[np.ndarray, dict[str, np.ndarray], dict[int, list[int]]]:
+    """Read tracks from a tracks directory.
+
+    Parameters
+    ----------
+    path :
+        Tracks directory to read from.
+    mmap_mode :
+        Memory-map mode passed to `numpy.load`. Use ``None`` to read the
+        arrays into memory.
+
+    Returns
+    -------
+    data :
+        Tracks data, in the napari format (ID, T, (Z), Y, X).
+    properties :
+        A dictionary of per-vertex property arrays.
+    graph :
+        A dictionary mapping track IDs to a list of parent IDs.
+    """
+    path = pathlib.Path(path)
+    data = np.load(path / DATA_FILE, mmap_mode=mmap_mode)
+    properties = {
+        f.stem: np.load(f, mmap_mode=mmap_mode)
+        for f in sorted((path / PROPERTIES_DIR).glob("*.npy"))
+    }
+    graph = graph_from_edges(np.load(path / GRAPH_FILE))
+    # directories written before graph keys were stored do not have the file
+    if (path / GRAPH_KEYS_FILE).is_file():
+        graph.update((k, []) for k in np.load(path / GRAPH_KEYS_FILE).tolist())
+    return data, properties, graph
+
+
+def convert_csv(
+    tracks: os.PathLike,
+    out: os.PathLike,
+    *,
+    graph: os.PathLike | None = None,
+    properties: os.PathLike | None = None,
+) -> None:
+    """Convert tracks stored as CSV and JSON files to a tracks directory.
+
+    Parameters
+    ----------
+    tracks :
+        CSV file containing the tracks data.
+    out :
+        Tracks directory to write to.
+    graph :
+        Optional JSON file containing the tracks graph.
+    properties :
+        Optional CSV file containing the track properties.
+    """
+    write_tracks(out, *read_tracks_csv(tracks, graph, properties))
+
+
+def napari_get_reader(path: str | list[str]) -> Callable | None:
+    """napari reader hook for tracks directories."""
+    if isinstance(path, list):
+        return None
+    return reader_function if is_tracks_dir(path) else None
+
+
+def reader_function(path: str) -> list[tuple[Any, dict, str]]:
+    """Read a tracks directory as a napari Tracks layer."""
+    data, properties, graph = read_tracks(path)
+    kwargs = {
+        "properties": properties,
+        "graph": graph,
+        "name": pathlib.Path(path).stem,
+    }
+    return [(data, kwargs, "tracks")]
@@ -0,0 +1,60 @@
+"""
+Write images as PNG files, using only the standard library.
+"""
+from __future__ import annotations
+
+import os
+import struct
+import zlib
+
+import numpy as np
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# images are (H, W, channels) arrays
+IMAGE_NDIM = 3
+# PNG colour types of images with 3 and 4 channels
+COLOR_TYPES = {3: 2, 4: 6}
+
+# zlib compression level, a trade-off between file size and speed
+COMPRESSION_LEVEL = 6
+
+
+def _chunk(tag: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(data))
+        + tag
+        + data
+        + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+    )
+
+
+def encode_png(image: np.ndarray) -> bytes:
+    """Encode an (H, W, 3) RGB or (H, W, 4) RGBA uint8 image as a PNG."""
+    image = np.asarray(image)
+    if (
+        image.dtype != np.uint8
+        or image.ndim != IMAGE_NDIM
+        or image.shape[2] not in COLOR_TYPES
+    ):
+        msg = f"Expected an (H, W, 3) or (H, W, 4) uint8 image, got {image.shape}."
+        raise ValueError(msg)
+    height, width, channels = image.shape
+    header = struct.pack(">IIBBBBB", width, height, 8, COLOR_TYPES[channels], 0, 0, 0)
+    # each row starts with a filter type byte, 0 for no filter
+    rows = np.zeros((height, 1 + width * channels), dtype=np.uint8)
+    rows[:, 1:] = image.reshape(height, -1)
+    return b"".join(
+        [
+            PNG_SIGNATURE,
+            _chunk(b"IHDR", header),
+            _chunk(b"IDAT", zlib.compress(rows.tobytes(), COMPRESSION_LEVEL)),
+            _chunk(b"IEND", b""),
+        ]
+    )
+
+
+def export_png(filename: os.PathLike, image: np.ndarray) -> None:
+    """Export an RGB or RGBA uint8 image as a PNG file."""
+    with open(filename, "wb") as png_file:
+        png_file.write(encode_png(image))
@@ -0,0 +1,59 @@
+"""
+Functions to read tracks stored as CSV tables with a JSON graph.
+
+This is the layout used by the sample data: a ``tracks.csv`` file with the
+columns (ID, T, (Z), Y, X), an optional ``properties.csv`` file with one row
+per track vertex, and a ``graph.json`` file mapping each track ID to a list of
+parent IDs.
+"""
+from __future__ import annotations
+
+import json
+import os
+
+import numpy as np
+
+
+def read_graph_json(filename: os.PathLike) -> dict[int, list[int]]:
+    """Read a graph stored as JSON."""
+    with open(filename) as f:
+        graph = json.load(f)
+    # For some reason json reads keys as str, not int, so convert
+    return {int(k): v for k, v in graph.items()}
+
+
+def read_tracks_csv(
+    tracks: os.PathLike,
+    graph: os.PathLike | None = None,
+    properties: os.PathLike | None = None,
+) -> tuple[np.ndarray, dict[str, np.ndarray], dict[int, list[int]]]:
+    """Read tracks data, properties and graph from CSV and JSON files.
+
+    Parameters
+    ----------
+    tracks :
+        CSV file containing the tracks data.
+    graph :
+        Optional JSON file containing the tracks graph.
+    properties :
+        Optional CSV file containing the track properties.
+
+    Returns
+    -------
+    data :
+        Tracks data, in the napari format (ID, T, (Z), Y, X).
+    properties :
+        A dictionary of per-vertex property arrays.
+    graph :
+        A dictionary mapping track IDs to a list of parent IDs.
+    """
+    # pandas is slow to import, so it is only loaded to parse a CSV
+    import pandas as pd  # noqa: PLC0415
+
+    data = pd.read_csv(tracks).to_numpy()
+    props = (
+        {}
+        if properties is None
+        else {k: v.to_numpy() for k, v in pd.read_csv(properties).items()}
+    )
+    return data, props, {} if graph is None else read_graph_json(graph)
@@ -0,0 +1,296 @@
+"""
+Lay out whole forests of lineage trees in parallel.
+
+Lineages are laid out independently, so a forest can be split by root across
+a pool of worker processes. The arrays of the graph index are copied once
+into shared memory, and every worker reads them in place, instead of
+receiving its own pickled copy of the index. The children of each track are
+looked up in a shared array of links sorted by parent, rather than in the
+``reverse_graph`` dictionary.
+
+Each task lays out a chunk of lineages, and writes their layout arrays (see
+`napari_arboretum.tree.layout_to_arrays`) to a new shared memory block. Only
+the name of the block is sent back to the parent process, which copies the
+arrays into a single `ForestLayout` and frees the block.
+"""
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import partial
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterator
+
+import numpy as np
+
+from napari_arboretum.graph import GraphIndex
+from napari_arboretum.tree import LAYOUTS, layout_to_arrays
+
+# number of lineages laid out by each task
+CHUNKSIZE = 64
+
+# the shared graph index of a worker process, and the shared memory blocks
+# that its arrays are stored in
+_WORKER_INDEX: GraphIndex | None = None
+_WORKER_MEMORY: list[SharedMemory] = []
+
+
+class _SharedChildren:
+    """
+    The children of each track, looked up in arrays of (parent, child) links
+    sorted by parent. This can stand in for `GraphIndex.reverse_graph`.
+    """
+
+    def __init__(self, parents: np.ndarray, children: np.ndarray):
+        self._parents = parents
+        self._children = children
+
+    def get(self, track_id: int, default: list[int] | None = None) -> list[int] | None:
+        lo, hi = np.searchsorted(self._parents, [track_id, track_id + 1])
+        if lo == hi:
+            return default
+        return self._children[lo:hi].tolist()
+
+
+def _share(values: np.ndarray) -> tuple[SharedMemory, tuple]:
+    """Copy an array to a new shared memory block, returning the block and
+    a ``(name, dtype, shape)`` description of the array."""
+    values = np.ascontiguousarray(values)
+    shm = SharedMemory(create=True, size=max(values.nbytes, 1))
+    np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[...] = values
+    return shm, (shm.name, values.dtype.str, values.shape)
+
+
+def _attach(spec: tuple) -> tuple[SharedMemory, np.ndarray]:
+    """Attach to an array shared with `_share`."""
+    name, dtype, shape = spec
+    shm = SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+@contextmanager
+def share_graph_index(index: GraphIndex) -> Iterator[dict[str, tuple]]:
+    """Copy the arrays of a graph index to shared memory.
+
+    The shared memory is freed when the ``with`` block exits.
+
+    Yields
+    ------
+    specs :
+        A small, picklable description of the shared arrays, which can be
+        passed to worker processes and given to `attach_graph_index`.
+    """
+    reverse_graph = index.reverse_graph
+    parents = np.fromiter(
+        (p for p, children in reverse_graph.items() for _ in children), dtype=np.int64
+    )
+    children = np.fromiter(
+        (c for children in reverse_graph.values() for c in children), dtype=np.int64
+    )
+    # a stable sort keeps the children of each track in their original order
+    by_parent = np.argsort(parents, kind="stable")
+    arrays = {
+        "track_ids": index.track_ids,
+        "track_roots": index.track_roots,
+        "order": index.order,
+        "offsets": index.offsets,
+        "t": index.t,
+        "t_start": index.t_start,
+        "t_end": index.t_end,
+        "link_parents": parents[by_parent],
+        "link_children": children[by_parent],
+    }
+    blocks = []
+    specs = {}
+    try:
+        for name, values in arrays.items():
+            shm, specs[name] = _share(values)
+            blocks.append(shm)
+        yield specs
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+
+def attach_graph_index(specs: dict[str, tuple]) -> GraphIndex:
+    """Attach to a graph index shared with `share_graph_index`.
+
+    The index reads the shared arrays in place. Its ``roots`` are empty, and
+    its ``reverse_graph`` only supports ``get``.
+    """
+    arrays = {}
+    for name, spec in specs.items():
+        shm, arrays[name] = _attach(spec)
+        # keep the blocks open for as long as the process uses the index
+        _WORKER_MEMORY.append(shm)
+    return GraphIndex(
+        roots=[],
+        reverse_graph=_SharedChildren(
+            arrays.pop("link_parents"), arrays.pop("link_children")
+        ),
+        **arrays,
+    )
+
+
+@dataclass
+class ForestLayout:
+    """
+    The layout arrays of many lineages.
+
+    Attributes
+    ----------
+    roots : np.ndarray
+        Root ID of each lineage.
+    edges : np.ndarray
+        The edge arrays of every lineage, concatenated, see
+        `napari_arboretum.tree.layout_to_arrays`.
+    edge_offsets : np.ndarray
+        The edges of ``roots[i]`` are
+        ``edges[edge_offsets[i]:edge_offsets[i + 1]]``.
+    labels : np.ndarray
+        The annotation arrays of every lineage, concatenated.
+    label_offsets : np.ndarray
+        The annotations of ``roots[i]`` are
+        ``labels[label_offsets[i]:label_offsets[i + 1]]``.
+    """
+
+    roots: np.ndarray
+    edges: np.ndarray
+    edge_offsets: np.ndarray
+    labels: np.ndarray
+    label_offsets: np.ndarray
+
+    def __len__(self) -> int:
+        return self.roots.size
+
+    def lineage(self, root: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return the edge and annotation arrays of a lineage.
+
+        Use `napari_arboretum.tree.layout_from_arrays` to turn them back into
+        edges and annotations.
+        """
+        (positions,) = np.nonzero(self.roots == root)
+        if not positions.size:
+            msg = f"No lineage with root ID {root}."
+            raise KeyError(msg)
+        i = positions[0]
+        return (
+            self.edges[self.edge_offsets[i] : self.edge_offsets[i + 1]],
+            self.labels[self.label_offsets[i] : self.label_offsets[i + 1]],
+        )
+
+
+def _layout_lineages(
+    index: GraphIndex, roots: list[int], layout: str
+) -> tuple[np.ndarray, np.ndarray, list[int], list[int]]:
+    """Lay out some lineages, returning their concatenated layout arrays, and
+    the number of edges and annotations of each lineage."""
+    edges = []
+    labels = []
+    for root in roots:
+        edges_array, labels_array = layout_to_arrays(
+            *LAYOUTS[layout](index.subgraph(root))
+        )
+        edges.append(edges_array)
+        labels.append(labels_array)
+    return (
+        np.concatenate(edges) if edges else np.empty((0, 5)),
+        np.concatenate(labels) if labels else np.empty((0, 3)),
+        [len(e) for e in edges],
+        [len(a) for a in labels],
+    )
+
+
+def _init_worker(specs: dict[str, tuple]) -> None:
+    global _WORKER_INDEX  # noqa: PLW0603
+    _WORKER_INDEX = attach_graph_index(specs)
+
+
+def _layout_chunk(
+    roots: list[int], layout: str
+) -> tuple[tuple, tuple, list[int], list[int]]:
+    """Lay out a chunk of lineages in a worker process, and write the layout
+    arrays to new shared memory blocks, which the caller must free."""
+    if _WORKER_INDEX is None:
+        raise RuntimeError("Worker process has not been initialised.")
+    edges, labels, n_edges, n_labels = _layout_lineages(_WORKER_INDEX, roots, layout)
+    specs = []
+    for values in (edges, labels):
+        shm, spec = _share(values)
+        # the block outlives this handle, until the parent process unlinks it
+        shm.close()
+        specs.append(spec)
+    return specs[0], specs[1], n_edges, n_labels
+
+
+def _collect(spec: tuple) -> np.ndarray:
+    """Copy an array out of a shared memory block written by a worker, and
+    free the block."""
+    shm, values = _attach(spec)
+    try:
+        return values.copy()
+    finally:
+        del values
+        shm.close()
+        shm.unlink()
+
+
+def layout_forest_parallel(
+    index: GraphIndex,
+    roots: list[int] | None = None,
+    *,
+    layout: str = "auto",
+    workers: int | None = None,
+    chunksize: int = CHUNKSIZE,
+) -> ForestLayout:
+    """Lay out many lineages in a pool of worker processes.
+
+    Parameters
+    ----------
+    index :
+        The graph index of the tracks.
+    roots :
+        The root IDs of the lineages to lay out. Defaults to all lineages.
+    layout :
+        The layout of each lineage, one of `napari_arboretum.tree.LAYOUTS`.
+    workers :
+        Number of worker processes. Defaults to the number of CPUs. With a
+        single worker, lineages are laid out in the calling process.
+    chunksize :
+        Number of lineages laid out by each task.
+
+    Returns
+    -------
+    layout : ForestLayout
+        The layout arrays of every lineage, in the order of ``roots``.
+    """
+    roots = list(index.roots if roots is None else roots)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers == 1:
+        results = [_layout_lineages(index, roots, layout)]
+    else:
+        chunks = [roots[i : i + chunksize] for i in range(0, len(roots), chunksize)]
+        results = []
+        with share_graph_index(index) as specs, ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(specs,)
+        ) as pool:
+            for edges_spec, labels_spec, n_edges, n_labels in pool.map(
+                partial(_layout_chunk, layout=layout), chunks
+            ):
+                results.append(
+                    (_collect(edges_spec), _collect(labels_spec), n_edges, n_labels)
+                )
+
+    edges, labels, n_edges, n_labels = zip(*results) if results else ((),) * 4
+    return ForestLayout(
+        roots=np.asarray(roots, dtype=np.int64),
+        edges=np.concatenate([np.empty((0, 5)), *edges]),
+        edge_offsets=np.cumsum([0, *(n for chunk in n_edges for n in chunk)]),
+        labels=np.concatenate([np.empty((0, 3)), *labels]),
+        label_offsets=np.cumsum([0, *(n for chunk in n_labels for n in chunk)]),
+    )
@@ -1,22 +1,121 @@
 from __future__ import annotations
 
+from typing import TYPE_CHECKING, Callable
+
 import napari
+import numpy as np
 from napari.layers import Tracks
 from napari.utils.events import Event
-from qtpy.QtCore import Qt
-from qtpy.QtWidgets import QFileDialog, QGridLayout, QLabel, QPushButton, QWidget
+from qtpy.QtCore import QSignalBlocker, Qt, Signal
+from qtpy.QtWidgets import (
+    QCheckBox,
+    QComboBox,
+    QFileDialog,
+    QGridLayout,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QPushButton,
+    QWidget,
+)
 
-from napari_arboretum.graph import get_root_id
+from napari_arboretum import timing
+from napari_arboretum.graph import GraphIndex, build_graph_index
 from napari_arboretum.io.svg import export_svg
+from napari_arboretum.tree import LAYOUTS
 from napari_arboretum.util import TrackPropertyMixin
 from napari_arboretum.visualisation.base_plotter import (
     PropertyPlotterBase,
     TreePlotterQWidgetBase,
 )
-from napari_arboretum.visualisation.matplotlib_plotter import MPLPropertyPlotter
 from napari_arboretum.visualisation.vispy_plotter import VisPyPlotter
 
+if TYPE_CHECKING:
+    from napari_arboretum.diff import LineageDiff
+    from napari_arboretum.io.layout_cache import LayoutCache
+    from napari_arboretum.query import LineageTable
+
 GUI_MAXIMUM_WIDTH = 500
+# layers with fewer rows are fast enough to index and lay out every time, so
+# their layouts are not cached on disk
+MIN_CACHED_ROWS = 100_000
+PROPERTY_PLOTTER_ROW = 3
+LINEAGE_LAYER_NAME = "Selected lineage"
+EXAMPLE_QUERY = "depth > 6 and n_merges > 0 and any(length < 5)"
+
+
+class LineageSearch(QWidget):
+    """
+    Search box to find lineages with `napari_arboretum.query`, and step
+    through the matching lineages.
+
+    Parameters
+    ----------
+    get_table :
+        Returns the table of lineages to search, or `None` if there are no
+        lineages. It is called on each search, so it should cache the table.
+    """
+
+    # emitted with the root ID of the lineage to show
+    lineage_selected = Signal(int)
+
+    def __init__(self, get_table: Callable[[], LineageTable | None], parent=None):
+        super().__init__(parent=parent)
+        self.get_table = get_table
+        self.query = QLineEdit()
+        self.query.setPlaceholderText(EXAMPLE_QUERY)
+        self.query.setToolTip(
+            "Find lineages, e.g. " + EXAMPLE_QUERY + ". Press enter to search."
+        )
+        self.previous_button = QPushButton("<")
+        self.next_button = QPushButton(">")
+        self.status = QLabel()
+
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        for widget in (
+            self.query,
+            self.previous_button,
+            self.next_button,
+            self.status,
+        ):
+            layout.addWidget(widget)
+        self.setLayout(layout)
+
+        self.results = np.array([], dtype=np.int64)
+        self.position = 0
+        self.query.returnPressed.connect(self.search)
+        self.previous_button.clicked.connect(lambda: self.step(-1))
+        self.next_button.clicked.connect(lambda: self.step(1))
+
+    def search(self) -> None:
+        """Find the lineages that match the query, and show the first one."""
+        # the query language is only loaded once a search is made
+        from napari_arboretum.query import QueryError  # noqa: PLC0415
+
+        table = self.get_table()
+        if table is None:
+            self.status.setText("No tracks")
+            return
+        try:
+            self.results = table.select(self.query.text() or EXAMPLE_QUERY)
+        except QueryError as err:
+            self.results = self.results[:0]
+            self.status.setText("Invalid query")
+            self.status.setToolTip(str(err))
+            return
+        self.status.setToolTip("")
+        self.position = 0
+        self.step(0)
+
+    def step(self, offset: int) -> None:
+        """Show the lineage ``offset`` places from the current result."""
+        if not self.results.size:
+            self.status.setText("No matches")
+            return
+        self.position = (self.position + offset) % self.results.size
+        self.status.setText(f"{self.position + 1} / {self.results.size}")
+        self.lineage_selected.emit(int(self.results[self.position]))
 
 
 class Arboretum(QWidget, TrackPropertyMixin):
@@ -29,11 +128,46 @@ class Arboretum(QWidget, TrackPropertyMixin):
         viewer = napari.current_viewer() if viewer is None else viewer
         self.viewer = viewer
         self.title = QLabel()
-        self.plotter: TreePlotterQWidgetBase = VisPyPlotter()
-        self.property_plotter: PropertyPlotterBase = MPLPropertyPlotter(viewer)
+        plotter = VisPyPlotter()
+        # Select the track and time of a branch when it is clicked
+        plotter.branch_picked_callbacks.append(self.on_branch_picked)
+        # Cache the graph index and layouts of large layers on disk
+        plotter.layout_cache = self.layout_cache
+        # Keep the graph index of each layer between draws
+        plotter.graph_index = self.graph_index
+        self.plotter: TreePlotterQWidgetBase = plotter
+        # The property plotter (and matplotlib) is only loaded when first needed
+        self._property_plotter: PropertyPlotterBase | None = None
+        # Status line showing how long drawing took, if timing is enabled
+        self.timing_label = QLabel()
+        self.timing_label.setWordWrap(True)
+        self.timing_label.setVisible(timing.is_enabled())
         self.setMaximumWidth(GUI_MAXIMUM_WIDTH)
+        self.setLayout(self._make_layout())
+        self._connect_events()
+
+        # Layer showing only the drawn lineages, the layer it was derived
+        # from, and the lineages it shows
+        self._lineage_layer: Tracks | None = None
+        self._lineage_source: Tracks | None = None
+        self._lineage_key: tuple | None = None
+        # Graph indexes, lineage tables and layout caches of each layer, kept
+        # out of the imports made when napari discovers the plugin
+        from napari_arboretum.registry import LayerRegistry  # noqa: PLC0415
+
+        self.registry = LayerRegistry()
+
+        self.tracks_layers: list[Tracks] = []
+        self.update_tracks_layers()
+        # (layer, track_id) pairs of the lineages that are drawn
+        self.lineages: list[tuple[Tracks, int]] = []
+
+    def _make_layout(self) -> QGridLayout:
+        """Create the controls of the widget, and lay them out."""
+        # superqt is only loaded once the widget is created, not when napari
+        # discovers the plugin
+        from superqt import QLabeledRangeSlider  # noqa: PLC0415
 
-        # Set plugin layout
         layout = QGridLayout()
 
         row, col = 0, 0
@@ -44,44 +178,355 @@ class Arboretum(QWidget, TrackPropertyMixin):
         # Add tree plotter
         row = 1
         layout.addWidget(self.plotter.get_qwidget(), row, col)
-        # Add export button
+        # Add export button and layout choice
         row = 2
         self.export_button = QPushButton("Export tree as SVG")
-        layout.addWidget(self.export_button, row, col)
-        # Add property plotter
-        row = 3
-        layout.addWidget(self.property_plotter.get_qwidget(), row, col)
+        self.layout_choice = QComboBox()
+        self.layout_choice.addItems(list(LAYOUTS))
+        self.layout_choice.setCurrentText(self.plotter.layout_mode)
+        self.layout_choice.setToolTip(
+            "Tree layout. 'dag' handles merges, and 'auto' uses it for "
+            "lineages with merges."
+        )
+        self.lineage_view_checkbox = QCheckBox("Only show lineage")
+        self.lineage_view_checkbox.setToolTip(
+            "Show only the tracks of the drawn lineages in the viewer."
+        )
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.export_button)
+        buttons.addWidget(self.layout_choice)
+        buttons.addWidget(self.lineage_view_checkbox)
+        layout.addLayout(buttons, row, col)
+        # The property plotter is added to row 3 when it is created
+        # Add timing status line
+        row = 4
+        layout.addWidget(self.timing_label, row, col)
+        # Add lineage search
+        row = 5
+        self.search = LineageSearch(self.lineage_table)
+        layout.addWidget(self.search, row, col)
+        # Add time window
+        row = 6
+        self.time_window_checkbox = QCheckBox("Time window")
+        self.time_window_checkbox.setToolTip(
+            "Only draw the parts of the lineages inside a time window."
+        )
+        self.time_window_slider = QLabeledRangeSlider(Qt.Horizontal)
+        # Only re-draw when the slider is released
+        self.time_window_slider.setTracking(False)
+        self.time_window_slider.setEnabled(False)
+        time_window = QHBoxLayout()
+        time_window.addWidget(self.time_window_checkbox)
+        time_window.addWidget(self.time_window_slider)
+        layout.addLayout(time_window, row, col)
         # Make the tree plot a bigger than the property plot
-        for row, stretch in zip([1, 2, 3], [4, 1, 2]):
+        for row, stretch in zip([1, 2, PROPERTY_PLOTTER_ROW], [4, 1, 2]):
             layout.setRowStretch(row, stretch)
-        self.setLayout(layout)
+        return layout
 
+    def _connect_events(self) -> None:
+        """Connect the controls of the widget, and the viewer events."""
         # Update the list of tracks layers stored in this object if the layer
         # list changes
         self.viewer.layers.events.changed.connect(self.update_tracks_layers)
+        # Free the structures derived from a layer when it is removed
+        self.viewer.layers.events.removed.connect(self.on_layer_removed)
         # Update the horizontal time line if the current z-step changes
         self.viewer.dims.events.current_step.connect(self.draw_current_time_line)
         # Save the tree as an SVG
         self.export_button.clicked.connect(self.export_tree)
+        # Re-draw the trees when the layout changes
+        self.layout_choice.currentTextChanged.connect(self.set_layout_mode)
+        # Show or hide the layer containing only the drawn lineages
+        self.lineage_view_checkbox.toggled.connect(self.update_lineage_layer)
+        # Show lineages found by the search box
+        self.search.lineage_selected.connect(self.on_lineage_found)
+        # Re-draw the trees when the time window changes
+        self.time_window_checkbox.toggled.connect(self.set_time_window)
+        self.time_window_slider.valueChanged.connect(self.set_time_window)
 
-        self.tracks_layers: list[Tracks] = []
-        self.update_tracks_layers()
+    @property
+    def property_plotter(self) -> PropertyPlotterBase:
+        """
+        The 1D property plotter, which is created the first time it is used.
+        """
+        if self._property_plotter is None:
+            # matplotlib is only loaded once properties are plotted
+            from napari_arboretum.visualisation.matplotlib_plotter import (  # noqa: PLC0415
+                MPLPropertyPlotter,
+            )
+
+            self._property_plotter = MPLPropertyPlotter(self.viewer)
+            self.layout().addWidget(
+                self._property_plotter.get_qwidget(), PROPERTY_PLOTTER_ROW, 0
+            )
+        return self._property_plotter
 
     def on_tracks_change(self):
         self.plotter.tracks = self.tracks
         self.property_plotter.tracks = self.tracks
+        # The time window slider covers the times of the layer, and starts
+        # with the whole range selected
+        t = self.tracks.data[:, 1]
+        t_range = (int(np.floor(t.min())), int(np.ceil(t.max()))) if t.size else (0, 0)
+        with QSignalBlocker(self.time_window_slider):
+            self.time_window_slider.setRange(*t_range)
+            self.time_window_slider.setValue(t_range)
+        if self.plotter.time_window is not None:
+            self.plotter.time_window = t_range
+
+    def layout_cache(self, layer: Tracks) -> LayoutCache | None:
+        """
+        Return the on-disk cache of the graph index and layouts of a layer, or
+        `None` if the layer is small enough not to need one.
+        """
+        if len(layer.data) < MIN_CACHED_ROWS:
+            return None
+
+        def open_cache() -> LayoutCache:
+            # pooch is only loaded for layers large enough to be cached
+            from napari_arboretum.io.layout_cache import LayoutCache  # noqa: PLC0415
+
+            with timing.timed("open_layout_cache"):
+                return LayoutCache(layer.data, layer.graph)
+
+        return self.registry.get(layer, "layout_cache", open_cache)
+
+    def graph_index(self, layer: Tracks | None = None) -> GraphIndex:
+        """
+        Return the graph index of a layer, by default the current tracks
+        layer. The index is built (or read from the layout cache) the first
+        time it is used, and rebuilt if the data changes.
+        """
+        layer = self.tracks if layer is None else layer
+
+        def build() -> GraphIndex:
+            cache = self.layout_cache(layer)
+            if cache is not None:
+                index = cache.graph_index
+            else:
+                index = build_graph_index(layer.data, layer.graph)
+            if index.problems:
+                napari.utils.notifications.show_warning(
+                    f"Problems found in the graph of {layer.name}:\n{index.problems}"
+                )
+            return index
+
+        return self.registry.get(layer, "graph_index", build)
+
+    def lineage_table(self) -> LineageTable | None:
+        """
+        Return the attribute table of the lineages of the current tracks layer,
+        or `None` if no layer has been selected. The table is built the first
+        time it is used, and rebuilt if the data changes.
+        """
+        if not hasattr(self, "_tracks"):
+            return None
+        from napari_arboretum.query import build_lineage_table  # noqa: PLC0415
+
+        layer = self.tracks
+        return self.registry.get(
+            layer,
+            "lineage_table",
+            lambda: build_lineage_table(
+                layer.data, layer.graph, index=self.graph_index(layer)
+            ),
+        )
+
+    def update_lineage_layer(self, event=None) -> None:
+        """
+        Show only the tracks of the drawn lineages in the viewer, if the
+        "Only show lineage" box is checked.
+
+        The tracks are shown in a separate layer, which is updated in place
+        when the drawn lineages change, while the layer they come from is
+        hidden. Only the drawn lineages of the current tracks layer are shown.
+        """
+        if not self.lineage_view_checkbox.isChecked():
+            self._remove_lineage_layer()
+            return
+        if not self.lineages:
+            return
+
+        source = self.tracks
+        key = (id(source), id(source.data), *(i for _, i in self.lineages))
+        layer = self._lineage_layer
+        if key == self._lineage_key and layer in self.viewer.layers:
+            return
+
+        track_ids = self.plotter.drawn_track_ids(source)
+        rows = self.graph_index().rows_of(track_ids)
+        data = source.data[rows]
+        properties = {k: np.asarray(v)[rows] for k, v in source.properties.items()}
+        drawn = set(track_ids)
+        graph = {}
+        for i in track_ids:
+            parents = [p for p in source.graph.get(i, []) if p in drawn]
+            if parents:
+                graph[i] = parents
+
+        if layer is None or layer not in self.viewer.layers:
+            # set before adding, so the layer is not treated as a source layer
+            self._lineage_layer = layer = Tracks(
+                data,
+                properties=properties,
+                graph=graph,
+                name=LINEAGE_LAYER_NAME,
+                color_by=source.color_by,
+                colormap=source.colormap,
+                tail_length=source.tail_length,
+                head_length=source.head_length,
+                scale=source.scale,
+                translate=source.translate,
+            )
+            self.viewer.add_layer(layer)
+        else:
+            # the graph is cleared first, so that it always refers to tracks
+            # in the data
+            layer.graph = {}
+            layer.data = data
+            layer.properties = properties
+            layer.graph = graph
+            layer.color_by = source.color_by
+            layer.colormap = source.colormap
+
+        if self._lineage_source is not source:
+            self._restore_lineage_source()
+            self._lineage_source = source
+            source.visible = False
+        self._lineage_key = key
+
+    def _restore_lineage_source(self) -> None:
+        if self._lineage_source is not None:
+            self._lineage_source.visible = True
+            self._lineage_source = None
+
+    def _remove_lineage_layer(self) -> None:
+        self._restore_lineage_source()
+        if self._lineage_layer in self.viewer.layers:
+            self.viewer.layers.remove(self._lineage_layer)
+        self._lineage_layer = None
+        self._lineage_key = None
+
+    def set_layout_mode(self, mode: str) -> None:
+        """Set how trees are laid out, and re-draw them."""
+        self.plotter.layout_mode = mode
+        if self.lineages:
+            self.plotter.draw_trees(self.lineages)
+            self.draw_current_time_line()
+
+    def set_time_window(self, event=None) -> None:
+        """
+        Draw only the parts of the lineages inside the time window of the
+        slider, if the "Time window" box is checked, and re-draw them.
+        """
+        checked = self.time_window_checkbox.isChecked()
+        self.time_window_slider.setEnabled(checked)
+        window = tuple(self.time_window_slider.value()) if checked else None
+        if window == self.plotter.time_window:
+            return
+        self.plotter.time_window = window
+        if self.lineages:
+            self.plotter.draw_trees(self.lineages)
+            self.draw_current_time_line()
+
+    def on_lineage_found(self, root_id: int) -> None:
+        """Show a lineage found by the search box."""
+        self.track_id = root_id
+        self.draw_current_time_line()
 
     def on_track_id_change(self):
-        self.plotter.track_id = self.track_id
-        self.property_plotter.track_id = self.track_id
-        root_id = get_root_id(self.tracks, self.track_id)
-        self.title.setText(f"Lineage Tree #{root_id}")
+        with timing.collect() as timings, timing.timed("on_track_id_change"):
+            if not self.plotter.is_drawn(self.tracks, self.track_id):
+                # the plotter re-draws the tree of the new track on its own
+                self.lineages = [(self.tracks, self.track_id)]
+            self.plotter.track_id = self.track_id
+            self.property_plotter.track_id = self.track_id
+            with timing.timed("root_id"):
+                root_ids = [
+                    str(self.graph_index(layer).root_id(track_id))
+                    for layer, track_id in self.lineages
+                ]
+            plural = "s" if len(root_ids) > 1 else ""
+            self.title.setText(f"Lineage Tree{plural} #{', #'.join(root_ids)}")
+            self.update_lineage_layer()
+
+        if timings:
+            self.timing_label.setText(timing.summary(timings))
+            self.timing_label.setVisible(True)
+
+    def show_lineages(self, lineages: list[tuple[Tracks, int]]) -> None:
+        """
+        Draw several lineage trees side by side, e.g. to compare sister
+        lineages, or lineages from different experiments.
+
+        Parameters
+        ----------
+        lineages :
+            ``(layer, track_id)`` pairs. The tree containing each track is
+            drawn, and the tracks can come from different layers. The last
+            track is selected.
+        """
+        self.lineages = list(lineages)
+        self.plotter.draw_trees(self.lineages)
+        self.tracks, self.track_id = self.lineages[-1]
+        self.draw_current_time_line()
+        self.update_lineage_layer()
+
+    def add_lineage(self, tracks: Tracks, track_id: int) -> None:
+        """
+        Draw the lineage tree of a track next to the trees already drawn.
+        """
+        if self.plotter.is_drawn(tracks, track_id):
+            self.tracks, self.track_id = tracks, track_id
+        else:
+            self.show_lineages([*self.lineages, (tracks, track_id)])
+
+    def highlight_changes(
+        self, reference: Tracks, *, time_tolerance: int | None = None
+    ) -> LineageDiff:
+        """
+        Highlight the branches of the current tracks layer that were added
+        or changed compared with another tracking run of the same data.
+
+        Parameters
+        ----------
+        reference :
+            The tracks layer of the other tracking run.
+        time_tolerance :
+            Compare branch times binned to multiples of this many frames, or
+            only compare topology if `None`.
+
+        Returns
+        -------
+        diff :
+            The differences between the lineages of ``reference`` and the
+            current tracks layer.
+        """
+        from napari_arboretum.diff import diff_layers  # noqa: PLC0415
+
+        diff = diff_layers(reference, self.tracks, time_tolerance=time_tolerance)
+        self.plotter.highlight_branches(self.tracks, diff.changed_tracks)
+        return diff
+
+    def on_branch_picked(self, tracks: Tracks | None, track_id: int, time: int) -> None:
+        """
+        Select a track, and move the viewer to a time, when a branch of the
+        tree is clicked.
+        """
+        self.viewer.dims.set_current_step(0, time)
+        if tracks is not None:
+            self.tracks, self.track_id = tracks, track_id
 
     def update_tracks_layers(self, event: Event | None = None) -> None:
         """
         Save a copy of all the tracks layers that are present in the viewer.
         """
-        layers = [layer for layer in self.viewer.layers if isinstance(layer, Tracks)]
+        layers = [
+            layer
+            for layer in self.viewer.layers
+            if isinstance(layer, Tracks) and layer is not self._lineage_layer
+        ]
 
         for layer in layers:
             if layer not in self.tracks_layers:
@@ -91,14 +536,23 @@ class Arboretum(QWidget, TrackPropertyMixin):
                 layer.events.color_by.connect(self.plotter.update_edge_colors)
                 layer.events.colormap.connect(self.plotter.update_edge_colors)
                 # Add callback to change 1D plotter plot when layer property changed
-                layer.events.color_by.connect(self.property_plotter.plot_property)
+                layer.events.color_by.connect(self.plot_property)
 
         self.tracks_layers = layers
 
+    def on_layer_removed(self, event: Event) -> None:
+        """
+        Free the structures derived from a layer that was removed from the
+        viewer, and update the list of tracks layers.
+        """
+        self.registry.discard(event.value)
+        self.update_tracks_layers()
+
     def append_mouse_callback(self, track_layer: Tracks) -> None:
         """
         Add a mouse callback to ``track_layer`` to draw the tree
-        when the layer is clicked.
+        when the layer is clicked. If shift is held, the tree is drawn next
+        to the trees that are already drawn.
         """
 
         @track_layer.mouse_double_click_callbacks.append
@@ -107,22 +561,32 @@ class Arboretum(QWidget, TrackPropertyMixin):
 
             cursor_position = event.position
             track_id = tracks.get_value(cursor_position, world=True)
-            if track_id is not None:
+            if track_id is None:
+                return
+            if "Shift" in event.modifiers:
+                self.add_lineage(tracks, track_id)
+            else:
                 # Setting this property automatically triggers re-drawing of the
                 # tree and property graph
                 self.track_id = track_id
                 self.draw_current_time_line()
 
+    def plot_property(self, event: Event | None = None) -> None:
+        """Re-plot the 1D property plot, if it has been created."""
+        if self._property_plotter is not None:
+            self._property_plotter.plot_property()
+
     def draw_current_time_line(self, event: Event | None = None) -> None:
         if not self.plotter.has_tracks:
             return
         z_value = self.viewer.dims.current_step[0]
         self.plotter.draw_current_time_line(z_value)
-        self.property_plotter.draw_current_time_line(z_value)
+        if self._property_plotter is not None:
+            self._property_plotter.draw_current_time_line(z_value)
 
     def export_tree(self) -> None:
         """Export the tree as an SVG."""
-        root_id = get_root_id(self.tracks, self.track_id)
+        root_id = self.graph_index().root_id(self.track_id)
         options = QFileDialog.Options()
         filename, _ = QFileDialog.getSaveFileName(
             self,
@@ -0,0 +1,214 @@
+"""
+A registry of the structures derived from each tracks layer.
+
+Graph indexes, lineage tables and layout caches are built per layer, and
+sessions can have many layers open at once, e.g. one per well of a plate.
+`LayerRegistry` holds them for each layer behind a weak reference, so they
+are freed when their layer is deleted, and evicts the least recently used
+ones once their estimated size exceeds a memory budget. Each layer has a
+version, which is incremented when its data or graph is replaced, and
+structures built from an older version are rebuilt.
+"""
+from __future__ import annotations
+
+import dataclasses
+import sys
+import weakref
+from collections import OrderedDict
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, TypeVar
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import napari
+
+T = TypeVar("T")
+
+# default memory budget of a registry, in bytes
+MEMORY_BUDGET = 2 * 1024**3
+
+# number of items of a large container that are measured to estimate its size
+SIZE_SAMPLES = 1000
+
+
+def estimate_nbytes(value: Any) -> int:
+    """Estimate the memory used by an object, in bytes.
+
+    Arrays that do not own their memory, e.g. memory-mapped arrays, or views
+    of the data of a layer, are not counted. The size of large dictionaries
+    and lists is extrapolated from a sample of `SIZE_SAMPLES` of their items.
+    Objects with an ``nbytes`` attribute report their own size.
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes if value.base is None else 0
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if dataclasses.is_dataclass(value):
+        return sum(
+            estimate_nbytes(getattr(value, f.name)) for f in dataclasses.fields(value)
+        )
+    if isinstance(value, (dict, list, tuple, set)):
+        items = list(value.items()) if isinstance(value, dict) else value
+        n_items = len(items)
+        sample = [items[i] for i in range(0, n_items, max(n_items // SIZE_SAMPLES, 1))]
+        per_item = sum(estimate_nbytes(item) for item in sample) / max(len(sample), 1)
+        return sys.getsizeof(value) + int(per_item * n_items)
+    return sys.getsizeof(value)
+
+
+@dataclasses.dataclass
+class _Entry:
+    value: Any
+    version: int
+    nbytes: int
+
+
+@dataclasses.dataclass
+class _LayerState:
+    ref: weakref.ref
+    # called by the events of the layer to increment its version
+    on_change: Callable
+    version: int = 0
+
+
+# events of a layer after which its structures are rebuilt
+CHANGE_EVENTS = ("data", "rebuild_graph")
+
+
+class LayerRegistry:
+    """
+    Structures derived from tracks layers, with a memory budget.
+
+    Each structure is stored under a layer and a name, and is rebuilt if the
+    data or graph of its layer is replaced, which is tracked through the
+    layer's events. Layers are held by weak references, and their structures
+    are freed when they are deleted, or `discard`-ed.
+
+    Parameters
+    ----------
+    max_bytes :
+        Memory budget, in bytes. When the estimated size of the stored
+        structures exceeds it, the least recently used structures are
+        evicted. The structure that was used last is always kept.
+
+    Attributes
+    ----------
+    nbytes : int
+        Estimated size of the stored structures, in bytes.
+    """
+
+    def __init__(self, max_bytes: int = MEMORY_BUDGET):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        # entries by (layer ID, name), from least to most recently used
+        self._entries: OrderedDict[tuple[int, str], _Entry] = OrderedDict()
+        self._layers: dict[int, _LayerState] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: tuple[napari.layers.Tracks, str]) -> bool:
+        layer, name = key
+        entry = self._entries.get((id(layer), name))
+        return entry is not None and entry.version == self._version(layer)
+
+    def get(
+        self,
+        layer: napari.layers.Tracks,
+        name: str,
+        build: Callable[[], T],
+        *,
+        nbytes: Callable[[T], int] = estimate_nbytes,
+    ) -> T:
+        """Return a structure derived from a layer, building it if needed.
+
+        Parameters
+        ----------
+        layer :
+            The layer the structure is derived from.
+        name :
+            Name of the structure, e.g. ``"graph_index"``.
+        build :
+            Called to build the structure if it is not stored, or if the data
+            or graph of the layer has changed.
+        nbytes :
+            Called with the structure to estimate its size, in bytes.
+        """
+        key = (id(layer), name)
+        entry = self._entries.get(key)
+        if entry is not None and entry.version == self._version(layer):
+            self._entries.move_to_end(key)
+            return entry.value
+
+        self._pop(key)
+        value = build()
+        state = self._track(layer)
+        entry = _Entry(value=value, version=state.version, nbytes=nbytes(value))
+        self._entries[key] = entry
+        self.nbytes += entry.nbytes
+        self._evict()
+        return value
+
+    def discard(self, layer: napari.layers.Tracks) -> None:
+        """Free every structure derived from a layer."""
+        self._forget(id(layer))
+
+    def clear(self) -> None:
+        """Free every structure."""
+        for layer_id in list(self._layers):
+            self._forget(layer_id)
+
+    def _version(self, layer: napari.layers.Tracks) -> int | None:
+        state = self._layers.get(id(layer))
+        return None if state is None else state.version
+
+    def _track(self, layer: napari.layers.Tracks) -> _LayerState:
+        """Start following the changes of a layer."""
+        state = self._layers.get(id(layer))
+        if state is None:
+            layer_id = id(layer)
+            state = _LayerState(
+                ref=weakref.ref(layer, partial(self._on_layer_deleted, layer_id)),
+                on_change=partial(self._on_layer_changed, layer_id),
+            )
+            # connect first, so that the version changes before other
+            # callbacks of the same events use the registry
+            for name in CHANGE_EVENTS:
+                getattr(layer.events, name).connect(state.on_change, position="first")
+            self._layers[layer_id] = state
+        return state
+
+    def _on_layer_changed(self, layer_id: int, event=None) -> None:
+        self._layers[layer_id].version += 1
+
+    def _on_layer_deleted(self, layer_id: int, ref: weakref.ref) -> None:
+        self._discard_entries(layer_id)
+        self._layers.pop(layer_id, None)
+
+    def _forget(self, layer_id: int) -> None:
+        """Free the structures of a layer, and stop following its changes."""
+        self._discard_entries(layer_id)
+        state = self._layers.pop(layer_id, None)
+        layer = None if state is None else state.ref()
+        if layer is not None:
+            for name in CHANGE_EVENTS:
+                getattr(layer.events, name).disconnect(state.on_change)
+
+    def _pop(self, key: tuple[int, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry.nbytes
+
+    def _discard_entries(self, layer_id: int) -> None:
+        for key in [k for k in self._entries if k[0] == layer_id]:
+            self._pop(key)
+
+    def _evict(self) -> None:
+        """Evict the least recently used structures, until the budget is met
+        or only the most recently used structure is left."""
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            self._pop(key)
+            if not any(k[0] == key[0] for k in self._entries):
+                self._forget(key[0])
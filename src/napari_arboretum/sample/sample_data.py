@@ -2,18 +2,20 @@
 Functions to load sample data.
 
 The sample data fetching/caching is handled by the `pooch` library. A registry
-of files and their expected hashes is stored in :file:``registry.txt``.
+of files and their expected hashes is stored in :file:``registry.txt``. The
+parsed data is cached by `napari_arboretum.io.cache`, keyed by the registry
+hashes, so after the first load the files are neither downloaded nor parsed.
 """
 
 from __future__ import annotations
 
-import json
 import pathlib
+from functools import partial
 
 import napari.layers
-import pandas as pd
 import pooch
-from skimage.io import imread
+
+from napari_arboretum.io.cache import load_image_cached, load_tracks_cached
 
 POOCH_BASE = "https://raw.githubusercontent.com/lowe-lab-ucl/btrack-examples/main/"
 POOCH = pooch.create(
@@ -24,6 +26,11 @@ registry_file = pathlib.Path(__file__).parent / "registry.txt"
 POOCH.load_registry(registry_file)
 
 
+def _fetcher(filename: str):
+    """Return a function that fetches a sample data file when called."""
+    return partial(POOCH.fetch, filename, progressbar=True)
+
+
 def load_sample_data() -> tuple[napari.layers.Tracks, napari.layers.Labels]:
     """
     Load some sample data.
@@ -34,19 +41,25 @@ def load_sample_data() -> tuple[napari.layers.Tracks, napari.layers.Labels]:
     segmentation : napari.layers.Labels
     """
     # Load track data files
-    track_data = pd.read_csv(POOCH.fetch("examples/tracks.csv", progressbar=True))
-    properties = pd.read_csv(POOCH.fetch("examples/properties.csv", progressbar=True))
-    with open(POOCH.fetch("examples/graph.json", progressbar=True)) as f:
-        graph = json.load(f)
-    # For some reason json reads keys as str, not int, so convert
-    graph = {int(k): v for k, v in graph.items()}
+    track_files = [
+        "examples/tracks.csv",
+        "examples/graph.json",
+        "examples/properties.csv",
+    ]
+    track_data, properties, graph = load_tracks_cached(
+        *[_fetcher(f) for f in track_files],
+        hashes=[POOCH.registry[f] for f in track_files],
+    )
 
     tracks = napari.layers.Tracks(
         track_data, properties=properties, graph=graph, name="btrack_sample"
     )
 
     # Load original segmentation
-    segmenation_data = imread(POOCH.fetch("examples/segmented.tif", progressbar=True))
+    segmentation_file = "examples/segmented.tif"
+    segmenation_data = load_image_cached(
+        _fetcher(segmentation_file), hashes=[POOCH.registry[segmentation_file]]
+    )
     segmentation = napari.layers.Labels(segmenation_data)
 
     return tracks, segmentation
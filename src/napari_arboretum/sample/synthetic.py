@@ -0,0 +1,235 @@
+"""
+Generate synthetic lineage forests for benchmarks and tests.
+
+Forests are grown one generation at a time, with every track of a generation
+generated at once using array operations, so forests with tens of millions of
+rows can be generated in seconds.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from napari_arboretum.graph import graph_from_edges
+
+# number of daughters of a dividing track
+N_DAUGHTERS = 2
+
+
+def _segment_index(lengths: np.ndarray) -> np.ndarray:
+    """For segments of the given lengths, return the index of each element
+    within its segment, e.g. ``[2, 3] -> [0, 1, 0, 1, 2]``."""
+    starts = np.cumsum(lengths) - lengths
+    return np.arange(lengths.sum()) - np.repeat(starts, lengths)
+
+
+@dataclass
+class _Generation:
+    """Tracks of a single generation, waiting to be grown."""
+
+    parent: np.ndarray
+    root: np.ndarray
+    t_start: np.ndarray
+    pos_start: np.ndarray
+    generation: int
+
+    @property
+    def size(self) -> int:
+        return self.parent.size
+
+
+@dataclass
+class ForestGenerator:
+    """
+    Generator of synthetic lineage forests.
+
+    Each track lives for a cell cycle length drawn from a normal distribution,
+    while its position does a random walk. At the end of its cell cycle, a
+    track either divides into two daughters, merges with another track that
+    ended in the same generation, or ends.
+
+    Attributes
+    ----------
+    n_roots : int
+        Number of lineages.
+    n_frames : int
+        Number of time frames. Tracks are cut at the last frame.
+    p_divide : float
+        Probability that a track divides at the end of its cell cycle.
+    cycle_length_mean, cycle_length_std : float
+        Mean and standard deviation of the cell cycle length, in frames.
+    p_merge : float
+        Probability that a track which does not divide merges with another.
+    p_dropout : float
+        Probability that a detection (row) is missing from the middle of a
+        track.
+    max_root_start : int
+        Roots start at a random frame between 0 and ``max_root_start``.
+    ndim : int
+        Number of spatial dimensions, 2 or 3.
+    """
+
+    n_roots: int = 10
+    n_frames: int = 100
+    p_divide: float = 0.9
+    cycle_length_mean: float = 20.0
+    cycle_length_std: float = 4.0
+    p_merge: float = 0.0
+    p_dropout: float = 0.0
+    max_root_start: int = 0
+    ndim: int = 2
+
+    def generate(
+        self, seed: int | None = None
+    ) -> tuple[np.ndarray, dict[str, np.ndarray], dict[int, list[int]]]:
+        """Generate a forest.
+
+        Parameters
+        ----------
+        seed :
+            Seed for the random number generator.
+
+        Returns
+        -------
+        data :
+            Tracks data, in the napari format (ID, T, (Z), Y, X).
+        properties :
+            Per-row ``generation``, ``root`` and ``area`` properties.
+        graph :
+            A dictionary mapping track IDs to a list of parent IDs.
+        """
+        rng = np.random.default_rng(seed)
+        gen = _Generation(
+            parent=np.full(self.n_roots, -1),
+            root=np.arange(self.n_roots),
+            t_start=rng.integers(0, self.max_root_start + 1, self.n_roots),
+            pos_start=rng.uniform(0, 1000, (self.n_roots, self.ndim)),
+            generation=1,
+        )
+
+        # start with no rows or edges, so that a forest with no roots is empty
+        chunks: list[dict[str, np.ndarray]] = [
+            {
+                "id": np.empty(0, dtype=int),
+                "t": np.empty(0, dtype=int),
+                "pos": np.empty((0, self.ndim)),
+                "generation": np.empty(0, dtype=int),
+                "root": np.empty(0, dtype=int),
+                "area": np.empty(0),
+            }
+        ]
+        edges: list[np.ndarray] = [np.empty((0, 2), dtype=int)]
+        next_id = 0
+        while gen.size:
+            ids = np.arange(next_id, next_id + gen.size)
+            next_id += gen.size
+            rows, t_end, pos_end = self._grow(rng, gen, ids)
+            chunks.append(rows)
+            edges.append(np.column_stack([ids, gen.parent])[gen.parent >= 0])
+            gen, merge_edges = self._next_generation(rng, gen, ids, t_end, pos_end)
+            edges.append(merge_edges)
+
+        rows = {k: np.concatenate([c[k] for c in chunks]) for k in chunks[0]}
+        data = np.column_stack([rows["id"], rows["t"], rows["pos"]]).astype(float)
+        properties = {k: rows[k] for k in ("generation", "root", "area")}
+        graph = graph_from_edges(np.concatenate(edges))
+        return data, properties, graph
+
+    def _grow(
+        self, rng: np.random.Generator, gen: _Generation, ids: np.ndarray
+    ) -> tuple[dict[str, np.ndarray], np.ndarray, np.ndarray]:
+        """Generate the rows of every track in a generation."""
+        cycle = rng.normal(self.cycle_length_mean, self.cycle_length_std, gen.size)
+        t_end = np.minimum(
+            gen.t_start + np.maximum(np.rint(cycle), 1).astype(int) - 1,
+            self.n_frames - 1,
+        )
+        lengths = t_end - gen.t_start + 1
+        phase = _segment_index(lengths)
+        track = np.repeat(np.arange(gen.size), lengths)
+
+        # random walk, starting from the position of the parent
+        steps = rng.normal(0, 1, (phase.size, self.ndim))
+        steps[phase == 0] = 0
+        walk = np.cumsum(steps, axis=0)
+        walk -= np.repeat(walk[np.cumsum(lengths) - lengths], lengths, axis=0)
+        pos = gen.pos_start[track] + walk
+
+        # cells grow from half to full size over the cell cycle
+        area = 100.0 * (1.0 + phase / np.repeat(lengths, lengths))
+
+        keep = (
+            (rng.random(phase.size) >= self.p_dropout)
+            | (phase == 0)
+            | (phase == np.repeat(lengths - 1, lengths))
+        )
+        rows = {
+            "id": ids[track][keep],
+            "t": (gen.t_start[track] + phase)[keep],
+            "pos": pos[keep],
+            "generation": np.full(keep.sum(), gen.generation),
+            "root": gen.root[track][keep],
+            "area": area[keep],
+        }
+        return rows, t_end, pos[np.cumsum(lengths) - 1]
+
+    def _next_generation(
+        self,
+        rng: np.random.Generator,
+        gen: _Generation,
+        ids: np.ndarray,
+        t_end: np.ndarray,
+        pos_end: np.ndarray,
+    ) -> tuple[_Generation, np.ndarray]:
+        """Divide and merge the tracks of a generation to make the next one."""
+        alive = t_end < self.n_frames - 1
+        divide = alive & (rng.random(gen.size) < self.p_divide)
+        merge = np.flatnonzero(alive & ~divide & (rng.random(gen.size) < self.p_merge))
+        merge = rng.permutation(merge)[: merge.size - merge.size % 2].reshape(-1, 2)
+
+        parents = np.repeat(np.flatnonzero(divide), N_DAUGHTERS)
+        t_start = np.concatenate([t_end[parents], t_end[merge].max(axis=1, initial=0)])
+        next_gen = _Generation(
+            parent=np.concatenate([ids[parents], ids[merge[:, 0]]]),
+            root=np.concatenate([gen.root[parents], gen.root[merge[:, 0]]]),
+            t_start=t_start + 1,
+            pos_start=np.concatenate(
+                [pos_end[parents], pos_end[merge].mean(axis=1).reshape(-1, self.ndim)]
+            ),
+            generation=gen.generation + 1,
+        )
+
+        # merged tracks have a second parent, which is not in next_gen.parent
+        merged_ids = ids[-1] + 1 + parents.size + np.arange(merge.shape[0])
+        merge_edges = np.column_stack([merged_ids, ids[merge[:, 1]]])
+        return next_gen, merge_edges
+
+
+def make_forest(
+    n_roots: int = 10,
+    n_frames: int = 100,
+    *,
+    seed: int | None = None,
+    **kwargs,
+) -> tuple[np.ndarray, dict[str, np.ndarray], dict[int, list[int]]]:
+    """Generate a synthetic forest.
+
+    This is a shortcut for ``ForestGenerator(n_roots, n_frames, **kwargs)``
+    followed by ``.generate(seed)``.
+    """
+    return ForestGenerator(n_roots, n_frames, **kwargs).generate(seed)
+
+
+def make_binary_tree(
+    max_depth: int, *, cycle_length: int = 2
+) -> tuple[np.ndarray, dict[str, np.ndarray], dict[int, list[int]]]:
+    """Generate a single perfect binary tree with ``max_depth`` generations."""
+    return make_forest(
+        1,
+        max_depth * cycle_length,
+        p_divide=1.0,
+        cycle_length_mean=cycle_length,
+        cycle_length_std=0.0,
+        seed=0,
+    )
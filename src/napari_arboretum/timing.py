@@ -0,0 +1,168 @@
+"""
+Low overhead timing of the stages of drawing a lineage tree.
+
+Stages are wrapped in ``with timed("stage name"):`` blocks. Timing is off by
+default, in which case `timed` returns a shared no-op context manager, so
+the cost of an instrumented stage is a function call and a global lookup.
+
+Timing can be turned on with `enable` (and off with `disable`), or by setting
+the ``ARBORETUM_TIMING`` environment variable. Each finished stage is then:
+
+- logged at ``DEBUG`` level to the ``napari_arboretum.timing`` logger;
+- passed to every callback registered with `add_callback`.
+
+Use `collect` to gather the timings of a block of code as a list. Stages are
+timed separately in each thread, and only those of the thread running the
+block are collected.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+_ENABLED = bool(os.environ.get("ARBORETUM_TIMING"))
+_CALLBACKS: list[Callable[[StageTiming], None]] = []
+# names of the stages that are currently running in each thread
+_LOCAL = threading.local()
+
+
+def _stack() -> list[str]:
+    if not hasattr(_LOCAL, "stack"):
+        _LOCAL.stack = []
+    return _LOCAL.stack
+
+
+@dataclass
+class StageTiming:
+    """
+    The time taken by a single stage.
+
+    Attributes
+    ----------
+    stage : str
+        Name of the stage.
+    path : str
+        Names of the enclosing stages and this stage, separated by ``/``.
+    elapsed : float
+        Time taken, in seconds.
+    thread_id : int
+        Identifier of the thread that ran the stage, see
+        `threading.get_ident`.
+    """
+
+    stage: str
+    path: str
+    elapsed: float
+    thread_id: int
+
+    def __str__(self) -> str:
+        return f"{self.stage} {1e3 * self.elapsed:.1f} ms"
+
+
+class _NullTimer:
+    def __enter__(self) -> _NullTimer:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self) -> _StageTimer:
+        stack = _stack()
+        stack.append(self.stage)
+        self.path = "/".join(stack)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter() - self.start
+        _stack().pop()
+        timing = StageTiming(
+            stage=self.stage,
+            path=self.path,
+            elapsed=elapsed,
+            thread_id=threading.get_ident(),
+        )
+        logger.debug(f"{timing.path}: {1e3 * elapsed:.2f} ms")
+        # copy, since callbacks may be added or removed by other threads
+        for callback in tuple(_CALLBACKS):
+            callback(timing)
+
+
+def timed(stage: str) -> _NullTimer | _StageTimer:
+    """Return a context manager that times a stage, if timing is enabled."""
+    return _StageTimer(stage) if _ENABLED else _NULL_TIMER
+
+
+def enable() -> None:
+    """Turn timing on."""
+    global _ENABLED  # noqa: PLW0603
+    _ENABLED = True
+
+
+def disable() -> None:
+    """Turn timing off."""
+    global _ENABLED  # noqa: PLW0603
+    _ENABLED = False
+
+
+def is_enabled() -> bool:
+    """Return ``True`` if timing is turned on."""
+    return _ENABLED
+
+
+def add_callback(callback: Callable[[StageTiming], None]) -> None:
+    """Call ``callback`` with the `StageTiming` of every finished stage, in
+    any thread."""
+    _CALLBACKS.append(callback)
+
+
+def remove_callback(callback: Callable[[StageTiming], None]) -> None:
+    """Stop calling a callback added with `add_callback`."""
+    _CALLBACKS.remove(callback)
+
+
+@contextmanager
+def collect() -> Iterator[list[StageTiming]]:
+    """Collect the timings of every stage finished inside a ``with`` block,
+    by the thread that runs the block. Stages finished by other threads in the
+    meantime, e.g. drawing thumbnails in the background, are left out.
+
+    If timing is turned off the list stays empty.
+    """
+    timings: list[StageTiming] = []
+    if not _ENABLED:
+        yield timings
+        return
+    thread_id = threading.get_ident()
+
+    def callback(timing: StageTiming) -> None:
+        if timing.thread_id == thread_id:
+            timings.append(timing)
+
+    add_callback(callback)
+    try:
+        yield timings
+    finally:
+        remove_callback(callback)
+
+
+def summary(timings: list[StageTiming]) -> str:
+    """Summarise the timings of the innermost stages on one line."""
+    paths = [t.path for t in timings]
+    leaves = [t for t in timings if not any(p.startswith(t.path + "/") for p in paths)]
+    return " · ".join(str(t) for t in leaves)
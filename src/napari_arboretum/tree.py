@@ -4,9 +4,10 @@ Classes and functions for laying out graphs for visualisation.
 from __future__ import annotations
 
 import itertools
-from collections import Counter
+from collections import Counter, deque
 from dataclasses import dataclass, field
-from typing import Any
+from functools import partial
+from typing import Any, Callable, Sequence
 
 import numpy as np
 import numpy.typing as npt
@@ -19,6 +20,22 @@ WHITE = np.array([1.0, 1.0, 1.0, 1.0])
 # minimum number of output edges to be considered a branching point
 MIN_OUT_EDGES = 2
 
+# number of crossing reduction sweeps of the DAG layout
+N_CROSSING_SWEEPS = 4
+
+# horizontal gap between trees drawn side by side
+TREE_GAP = 1.0
+# tints of the links and labels of trees drawn side by side
+TREE_TINTS = np.array(
+    [
+        [1.0, 1.0, 1.0, 1.0],
+        [1.0, 0.6, 0.2, 1.0],
+        [0.3, 0.8, 1.0, 1.0],
+        [0.6, 1.0, 0.4, 1.0],
+        [1.0, 0.5, 0.8, 1.0],
+    ]
+)
+
 # napari specifies colours as a RGBA tuple in the range [0, 1], so mirror
 # that convention throughout arboretum.
 ColorType = npt.ArrayLike
@@ -39,20 +56,50 @@ class Edge:
     color: ColorType = field(default_factory=lambda: WHITE)
     track_id: int | None = None
     node: TreeNode | None = None
+    # index of the tree the edge belongs to, if several trees are drawn
+    tree: int = 0
 
 
 def _find_merges(nodes: list[TreeNode]) -> dict[int, list[Any]]:
-    node_ids = itertools.chain(*[n.children for n in nodes])
-    merges = [n for n, count in Counter(node_ids).items() if count > 1]
-    parents = [n for n in nodes if len(n.children) == 1]
+    """Map the ID of each track with more than one parent to the parents that
+    have it as their only child."""
+    counts = Counter(itertools.chain.from_iterable(n.children for n in nodes))
+    parent_merges: dict[int, list[TreeNode]] = {
+        m: [] for m, count in counts.items() if count > 1
+    }
+    for n in nodes:
+        if len(n.children) == 1 and n.children[0] in parent_merges:
+            parent_merges[n.children[0]].append(n)
 
-    parent_merges: dict[int, list[TreeNode]] = {m: [] for m in merges}
+    return parent_merges
 
-    for merge in merges:
-        parent_id = [p for p in parents if p.children[0] == merge]
-        parent_merges[merge] += parent_id
 
-    return parent_merges
+def has_merges(nodes: list[TreeNode]) -> bool:
+    """Return ``True`` if any track in a lineage has more than one parent."""
+    children = list(itertools.chain.from_iterable(n.children for n in nodes))
+    return len(children) != len(set(children))
+
+
+def _link_edges(edges: list[Edge]) -> list[Edge]:
+    """Build the edges representing links, splits and merges between the
+    branches of a tree."""
+    branch_edges = {e.track_id: i for i, e in enumerate(edges) if e.node is not None}
+    links = []
+    for hyperedge in edges:
+        if hyperedge.node is None:
+            continue
+        children = sorted(
+            branch_edges[c] for c in set(hyperedge.node.children) if c in branch_edges
+        )
+        for i in children:
+            childedge = edges[i]
+            links.append(
+                Edge(
+                    y=(hyperedge.y[-1], childedge.y[0]),
+                    x=(hyperedge.x[-1], childedge.x[0]),
+                )
+            )
+    return links
 
 
 def layout_tree(nodes: list[TreeNode]) -> tuple[list[Edge], list[Annotation]]:
@@ -73,13 +120,15 @@ def layout_tree(nodes: list[TreeNode]) -> tuple[list[Edge], list[Annotation]]:
     # put the start vertex into the queue, and the marked list
     root = nodes[0]
 
-    queue = [root]
-    marked = [root]
-    y_pos = [0.0]
+    queue = deque([(root, 0.0)])
+    marked = {root.ID}
+    position = {n.ID: i for i, n in enumerate(nodes)}
 
     # store the line coordinates that need to be plotted
     edges: list[Edge] = []
     annotations: list[Annotation] = []
+    # the edge of each drawn node
+    node_edges: dict[int, Edge] = {}
 
     # iterate over the nodes and find merges
     merges = _find_merges(nodes)
@@ -87,13 +136,12 @@ def layout_tree(nodes: list[TreeNode]) -> tuple[list[Edge], list[Annotation]]:
     # now step through
     while queue:
         # pop the root from the tree
-        node = queue.pop(0)
-        y = y_pos.pop(0)
+        node, y = queue.popleft()
 
         # draw the root of the tree
-        edges.append(
-            Edge(y=(y, y), x=(node.t[0], node.t[-1]), track_id=node.ID, node=node)
-        )
+        edge = Edge(y=(y, y), x=(node.t[0], node.t[-1]), track_id=node.ID, node=node)
+        edges.append(edge)
+        node_edges[id(node)] = edge
 
         if node.is_root:
             annotations.append(Annotation(y=y, x=node.t[0], label=str(node.ID)))
@@ -103,7 +151,10 @@ def layout_tree(nodes: list[TreeNode]) -> tuple[list[Edge], list[Annotation]]:
             annotations.append(Annotation(y=y, x=node.t[-1], label=str(node.ID)))
             continue
 
-        children = [t for t in nodes if t.ID in node.children]
+        children = [
+            nodes[i]
+            for i in sorted(position[c] for c in set(node.children) if c in position)
+        ]
 
         # calculate the depth modifier
         depth_mod = 2.0 / (2.0 ** (node.generation))
@@ -113,40 +164,411 @@ def layout_tree(nodes: list[TreeNode]) -> tuple[list[Edge], list[Annotation]]:
         for idx, child in enumerate(children):
             if child.ID in merges:
                 parents = merges[child.ID]
-                parent_edges = [e for e in edges if e.node in parents]
+                parent_edges = [
+                    node_edges[id(p)] for p in parents if id(p) in node_edges
+                ]
                 if len(parent_edges) < MIN_OUT_EDGES:
                     continue
                 y_mod = np.asarray([np.mean([e.y[0] for e in parent_edges]) - y])
 
-            if child not in marked:
+            if child.ID not in marked:
                 # mark the children
-                marked.append(child)
-                queue.append(child)
-
-                y_pos.append(y + y_mod[idx])
+                marked.add(child.ID)
+                child_y = y + y_mod[idx]
+                queue.append((child, child_y))
 
                 # if it's a leaf don't plot the annotation
                 if not child.is_leaf:
                     annotations.append(
                         Annotation(
-                            y=y_pos[-1],
+                            y=child_y,
                             x=child.t[-1] - (child.t[-1] - child.t[0]) / 2.0,
                             label=str(child.ID),
                         )
                     )
 
     # plot all of the hyperedges representing links, splits and merges
-    hyperedges = filter(lambda e: e.node, edges)
+    edges += _link_edges(edges)
 
-    for hyperedge in hyperedges:
-        children = hyperedge.node.children if hyperedge.node is not None else []
-        childedges = filter(lambda e: e.track_id in children, edges)
-        for childedge in childedges:
-            edges.append(
-                Edge(
-                    y=(hyperedge.y[-1], childedge.y[0]),
-                    x=(hyperedge.x[-1], childedge.x[0]),
-                )
+    return edges, annotations
+
+
+def _dag_layers(
+    ids: list[int], children: dict[int, list[int]], parents: dict[int, list[int]]
+) -> tuple[list[int], dict[int, int]]:
+    """Order the nodes of a DAG topologically, and assign each node to the
+    layer given by the longest path from a root."""
+    indegree = {i: len(parents[i]) for i in ids}
+    order = [i for i in ids if not indegree[i]]
+    layer = dict.fromkeys(ids, 0)
+    for node in order:
+        for child in children[node]:
+            layer[child] = max(layer[child], layer[node] + 1)
+            indegree[child] -= 1
+            if not indegree[child]:
+                order.append(child)
+    # nodes on a cycle are never reached, so add them at the end
+    reached = set(order)
+    order += [i for i in ids if i not in reached]
+    return order, layer
+
+
+def _scaled_positions(layer: list[int]) -> dict[int, float]:
+    scale = 1.0 / max(len(layer) - 1, 1)
+    return {n: i * scale for i, n in enumerate(layer)}
+
+
+def _barycenter(
+    node: int, neighbours: dict[int, list[int]], pos: dict[int, float]
+) -> tuple[float, float]:
+    """Sort key of a node: the mean position of its neighbours, then its own
+    position."""
+    ns = neighbours[node]
+    if not ns:
+        return pos[node], pos[node]
+    return sum(pos[n] for n in ns) / len(ns), pos[node]
+
+
+def _reduce_crossings(
+    layers: list[list[int]],
+    children: dict[int, list[int]],
+    parents: dict[int, list[int]],
+    n_sweeps: int,
+) -> dict[int, float]:
+    """Reorder the nodes in each layer to reduce edge crossings, using the
+    barycenter heuristic, and return the position of each node in its layer
+    scaled to [0, 1]."""
+    pos: dict[int, float] = {}
+    for layer in layers:
+        pos.update(_scaled_positions(layer))
+
+    for sweep in range(n_sweeps):
+        # alternate between sweeping down using parents, and up using children
+        downwards = sweep % 2 == 0
+        key = partial(
+            _barycenter, neighbours=parents if downwards else children, pos=pos
+        )
+        for layer in layers if downwards else reversed(layers):
+            layer.sort(key=key)
+            pos.update(_scaled_positions(layer))
+
+    return pos
+
+
+def _place_tracks(
+    roots: list[int], children: dict[int, list[int]], pos: dict[int, float]
+) -> tuple[dict[int, float], dict[int, int]]:
+    """Place leaves in depth-first order, and parents at the mean of the
+    children that they were first to reach.
+
+    Returns the position of each track, and the parent that first reached
+    each track.
+    """
+    y: dict[int, float] = {}
+    owner: dict[int, int] = {}
+    visited: set[int] = set()
+    next_slot = 0.0
+    for root in roots:
+        stack = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                owned = [c for c in children[node] if owner.get(c) == node]
+                if owned:
+                    y[node] = sum(y[c] for c in owned) / len(owned)
+                else:
+                    y[node], next_slot = next_slot, next_slot + 1.0
+            elif node not in visited:
+                visited.add(node)
+                stack.append((node, True))
+                unowned = [c for c in children[node] if c not in owner]
+                for c in sorted(unowned, key=pos.__getitem__, reverse=True):
+                    owner[c] = node
+                    stack.append((c, False))
+    return y, owner
+
+
+def _center_merges(
+    order: list[int],
+    parents: dict[int, list[int]],
+    owner: dict[int, int],
+    y: dict[int, float],
+) -> None:
+    """Move merged tracks, and the tracks that they own, between their parents.
+
+    Each track is moved by the offset of its owner, plus its own offset if it
+    is merged, so that every track is visited once, in topological order.
+    """
+    offset: dict[int, float] = {}
+    for node in order:
+        if node not in y:
+            continue
+        shift = offset.get(owner.get(node), 0.0)
+        if len(parents[node]) >= MIN_OUT_EDGES:
+            mean = sum(y[p] + offset.get(p, 0.0) for p in parents[node])
+            shift = mean / len(parents[node]) - y[node]
+        offset[node] = shift
+    for node, shift in offset.items():
+        y[node] += shift
+
+
+def layout_dag(
+    nodes: list[TreeNode], *, n_sweeps: int = N_CROSSING_SWEEPS
+) -> tuple[list[Edge], list[Annotation]]:
+    """Layout a lineage with any number of merges, as a layered graph.
+
+    This is a Sugiyama-style layout: tracks are assigned to layers by their
+    longest path from a root, and a bounded number of barycenter sweeps
+    reorders the tracks in each layer to reduce crossings. Leaves are then
+    spaced evenly in depth-first order, with every other track placed at the
+    mean position of the children it was first to reach, and merged tracks
+    moved to the mean position of their parents. Each step takes near-linear
+    time.
+
+    Parameters
+    ----------
+    nodes :
+        A list of graph.TreeNode objects encoding a single lineage.
+    n_sweeps :
+        Number of crossing reduction sweeps.
+
+    Returns
+    -------
+    edges :
+        A list of edges to be drawn.
+    annotations :
+        A list of annotations to be added to the graph.
+    """
+    by_id = {n.ID: n for n in nodes}
+    ids = list(by_id)
+    children = {
+        i: [c for c in dict.fromkeys(n.children) if c in by_id]
+        for i, n in by_id.items()
+    }
+    parents: dict[int, list[int]] = {i: [] for i in ids}
+    for i in ids:
+        for c in children[i]:
+            parents[c].append(i)
+
+    order, layer_of = _dag_layers(ids, children, parents)
+    layers: list[list[int]] = [[] for _ in range(max(layer_of.values()) + 1)]
+    for i in order:
+        layers[layer_of[i]].append(i)
+    pos = _reduce_crossings(layers, children, parents, n_sweeps)
+
+    y, owner = _place_tracks(layers[0], children, pos)
+    _center_merges(order, parents, owner, y)
+
+    edges: list[Edge] = []
+    annotations: list[Annotation] = []
+    for node in (by_id[i] for i in order if i in y):
+        node_y = y[node.ID]
+        edges.append(
+            Edge(
+                y=(node_y, node_y),
+                x=(node.t[0], node.t[-1]),
+                track_id=node.ID,
+                node=node,
             )
+        )
+        if not parents[node.ID]:
+            label_t = node.t[0]
+        elif not children[node.ID]:
+            label_t = node.t[-1]
+        else:
+            label_t = node.t[-1] - (node.t[-1] - node.t[0]) / 2.0
+        annotations.append(Annotation(y=node_y, x=label_t, label=str(node.ID)))
+
+    edges += _link_edges(edges)
+    return edges, annotations
+
+
+def layout_auto(nodes: list[TreeNode]) -> tuple[list[Edge], list[Annotation]]:
+    """Layout a lineage with `layout_dag` if it has merges, otherwise with
+    `layout_tree`."""
+    return layout_dag(nodes) if has_merges(nodes) else layout_tree(nodes)
+
+
+LAYOUTS = {"auto": layout_auto, "tree": layout_tree, "dag": layout_dag}
+
+
+def layout_forest(
+    trees: list[list[TreeNode]],
+    *,
+    gap: float = TREE_GAP,
+    layout: str = "auto",
+    layouts: Sequence[Callable | None] | None = None,
+    tints: Sequence[int] | None = None,
+) -> tuple[list[Edge], list[Annotation]]:
+    """Layout several lineage trees side by side.
+
+    Each tree is laid out with ``layout``, then shifted so that it starts
+    ``gap`` to the right of the previous tree. The first tree is not shifted,
+    so a single tree is laid out exactly as by ``layout``. When there is
+    more than one lineage, the links and labels of each tree are tinted with
+    the colour of its lineage from `TREE_TINTS`.
+
+    Parameters
+    ----------
+    trees :
+        A list of trees, each given as a list of graph.TreeNode objects.
+    gap :
+        Horizontal gap between neighbouring trees.
+    layout :
+        The layout of each tree, one of `LAYOUTS`.
+    layouts :
+        A function laying out each tree, used instead of ``layout`` for the
+        trees where it is not `None`, e.g. to read cached layouts.
+    tints :
+        The index of the lineage of each tree, used to pick its tint, so that
+        the pieces of a lineage cut by a time window share a colour. By
+        default each tree is its own lineage.
+
+    Returns
+    -------
+    edges :
+        A list of edges to be drawn. The ``tree`` attribute of each edge is
+        the index of its tree in ``trees``.
+    annotations :
+        A list of annotations to be added to the graph.
+    """
+    edges: list[Edge] = []
+    annotations: list[Annotation] = []
+    if tints is None:
+        tints = range(len(trees))
+    n_lineages = len(set(tints))
+    right = None
+    for tree, nodes in enumerate(trees):
+        layout_function = None if layouts is None else layouts[tree]
+        if layout_function is None:
+            layout_function = LAYOUTS[layout]
+        tree_edges, tree_annotations = layout_function(nodes)
+        ys = [y for e in tree_edges for y in e.y]
+        shift = 0.0 if right is None else right + gap - min(ys)
+        right = max(ys) + shift
+        tint = TREE_TINTS[tints[tree] % len(TREE_TINTS)] if n_lineages > 1 else WHITE
+
+        for e in tree_edges:
+            e.y = (e.y[0] + shift, e.y[1] + shift)
+            e.tree = tree
+            if e.track_id is None:
+                e.color = tint
+        for a in tree_annotations:
+            a.y += shift
+            a.color = tint
+
+        edges += tree_edges
+        annotations += tree_annotations
 
     return edges, annotations
+
+
+def layout_to_arrays(
+    edges: list[Edge], annotations: list[Annotation]
+) -> tuple[np.ndarray, np.ndarray]:
+    """Convert the layout of a lineage to arrays, e.g. to store it.
+
+    Returns
+    -------
+    edges :
+        An (E, 5) array of ``(x0, x1, y0, y1, track_id)`` rows. Links between
+        branches have a track ID of NaN.
+    labels :
+        An (A, 3) array of ``(x, y, track_id)`` rows, one for each annotation.
+    """
+    edges_array = np.array(
+        [[*e.x, *e.y, np.nan if e.track_id is None else e.track_id] for e in edges],
+        dtype=np.float64,
+    ).reshape(-1, 5)
+    labels_array = np.array(
+        [[a.x, a.y, int(a.label)] for a in annotations], dtype=np.float64
+    ).reshape(-1, 3)
+    return edges_array, labels_array
+
+
+def layout_from_arrays(
+    edges_array: np.ndarray, labels_array: np.ndarray, nodes: list[TreeNode]
+) -> tuple[list[Edge], list[Annotation]]:
+    """Convert arrays made by `layout_to_arrays` back to edges and annotations.
+
+    Parameters
+    ----------
+    edges_array, labels_array :
+        The layout arrays of a lineage.
+    nodes :
+        The graph.TreeNode objects of the lineage, which are attached to the
+        edges of their branches.
+    """
+    by_id = {n.ID: n for n in nodes}
+    edges = []
+    for x0, x1, y0, y1, track_id in np.asarray(edges_array).tolist():
+        if np.isnan(track_id):
+            edges.append(Edge(x=(x0, x1), y=(y0, y1)))
+        else:
+            node = by_id[int(track_id)]
+            edges.append(Edge(x=(x0, x1), y=(y0, y1), track_id=node.ID, node=node))
+    annotations = [
+        Annotation(x=x, y=y, label=str(int(label)))
+        for x, y, label in np.asarray(labels_array).tolist()
+    ]
+    return edges, annotations
+
+
+class BranchIndex:
+    """
+    Spatial index of the branches of a laid out tree, used to find the branch
+    under the mouse.
+
+    Branches are vertical line segments at a fixed ``y`` spanning the times
+    ``t_start`` to ``t_end``. They are sorted by ``y``, so that a query only
+    has to check the branches within the tolerance of the query point, which
+    are found by binary search.
+
+    Attributes
+    ----------
+    y : np.ndarray
+        Sorted y position of each branch.
+    t_start, t_end : np.ndarray
+        Start and end time of each branch.
+    track_ids : np.ndarray
+        Track ID of each branch.
+    trees : np.ndarray
+        Index of the tree that each branch belongs to.
+    """
+
+    def __init__(self, edges: list[Edge]):
+        branches = [e for e in edges if e.node is not None and e.track_id is not None]
+        y = np.array([e.y[0] for e in branches], dtype=float)
+        t = np.array([e.x for e in branches], dtype=float).reshape(-1, 2)
+        order = np.argsort(y, kind="stable")
+        self.y = y[order]
+        self.t_start = t.min(axis=1)[order]
+        self.t_end = t.max(axis=1)[order]
+        self.track_ids = np.array([e.track_id for e in branches], dtype=int)[order]
+        self.trees = np.array([e.tree for e in branches], dtype=int)[order]
+
+    def __len__(self) -> int:
+        return self.y.size
+
+    def query(self, y: float, t: float, tolerance: float) -> int | None:
+        """Find the branch closest to a point.
+
+        Parameters
+        ----------
+        y, t :
+            Position of the query point.
+        tolerance :
+            Maximum distance in ``y`` between the point and a branch.
+
+        Returns
+        -------
+        index :
+            Index of the closest branch that contains ``t`` and is within
+            ``tolerance`` of ``y``, or `None` if there is no such branch.
+        """
+        lo = np.searchsorted(self.y, y - tolerance, side="left")
+        hi = np.searchsorted(self.y, y + tolerance, side="right")
+        hits = np.flatnonzero((self.t_start[lo:hi] <= t) & (t <= self.t_end[lo:hi]))
+        if not hits.size:
+            return None
+        return int(lo + hits[np.argmin(np.abs(self.y[lo + hits] - y))])
@@ -1,20 +1,45 @@
 from __future__ import annotations
 
 import abc
+import functools
+from typing import TYPE_CHECKING, Callable, Iterable
 
 import numpy as np
-import pandas as pd
 from qtpy.QtWidgets import QWidget
 
-from napari_arboretum.graph import TreeNode, build_subgraph
-from napari_arboretum.tree import Annotation, Edge, layout_tree
+from napari_arboretum.graph import TreeNode, build_graph_index, build_subgraph
+from napari_arboretum.timing import timed
+from napari_arboretum.tree import Annotation, ColorType, Edge, layout_forest
 from napari_arboretum.util import TrackPropertyMixin
 
+if TYPE_CHECKING:
+    from napari.layers import Tracks
+
+    from napari_arboretum.graph import GraphIndex
+    from napari_arboretum.io.layout_cache import LayoutCache
+
 GUI_MAXIMUM_WIDTH = 600
+# default colour of highlighted branches
+HIGHLIGHT_COLOR = np.array([1.0, 0.0, 1.0, 1.0])
 
 __all__ = ["TreePlotterBase", "TreePlotterQWidgetBase"]
 
 
+def _interpolate_colors(
+    t: np.ndarray, colors: np.ndarray, at: np.ndarray
+) -> np.ndarray:
+    """Linearly interpolate the colours of the time points ``t`` of a track
+    at the times ``at``. Times outside ``t`` get the colour of the nearest end.
+    """
+    if not t.size:
+        return colors[:0].reshape(0, colors.shape[-1])
+    order = np.argsort(t, kind="stable")
+    t, colors = t[order], colors[order]
+    return np.column_stack(
+        [np.interp(at, t, colors[:, i]) for i in range(colors.shape[1])]
+    ).astype(colors.dtype)
+
+
 class TreePlotterBase(abc.ABC, TrackPropertyMixin):
     """
     Base class for a `napari.layers.Tracks` plotter.
@@ -30,37 +55,174 @@ class TreePlotterBase(abc.ABC, TrackPropertyMixin):
     ----------
     edges : List[Edge]
     annotations : List[Annotation]
+    tree_layers : List[Tracks | None]
+        The layer of each drawn tree.
+    layout_mode : str
+        How trees are laid out, one of `napari_arboretum.tree.LAYOUTS`. The
+        default, ``"auto"``, uses the layered DAG layout for lineages with
+        merges.
+    layout_cache : Callable[[Tracks], LayoutCache | None] | None
+        Called with the layer of each tree to get its on-disk layout cache,
+        or `None` if its layout should not be cached.
+    graph_index : Callable[[Tracks], GraphIndex] | None
+        Called with the layer of each tree to get its graph index, e.g. from a
+        cache. If `None`, the index is built each time trees are drawn.
+    time_window : tuple[float, float] | None
+        If set, only the parts of the lineages inside this ``(t_min, t_max)``
+        window are built, laid out and drawn.
     """
 
+    layout_mode = "auto"
+    layout_cache: Callable[[Tracks], LayoutCache | None] | None = None
+    graph_index: Callable[[Tracks], GraphIndex] | None = None
+    time_window: tuple[float, float] | None = None
+
     def on_track_id_change(self) -> None:
-        self.draw_tree()
+        # the tree is the same for every track in a lineage, so only re-draw
+        # if the track is not in a tree that is already drawn
+        if not self.is_drawn(self.tracks, self.track_id):
+            self.draw_tree()
 
     @property
     def has_tracks(self) -> bool:
         return hasattr(self, "_tracks")
 
+    def is_drawn(self, tracks: Tracks, track_id: int) -> bool:
+        """Return ``True`` if a track of a layer is in a drawn tree."""
+        return (id(tracks), track_id) in getattr(self, "_drawn_track_ids", set())
+
+    def drawn_track_ids(self, tracks: Tracks | None) -> list[int]:
+        """Return the sorted IDs of the tracks of a layer in the drawn trees."""
+        drawn = getattr(self, "_drawn_track_ids", set())
+        return sorted(i for layer_id, i in drawn if layer_id == id(tracks))
+
     def draw_tree(self) -> None:
         """
         Plot the tree.
         """
-        self.clear()
-        subgraph_nodes = build_subgraph(self.tracks, self.track_id)
-        self.draw_from_nodes(subgraph_nodes, self.track_id)
+        self.draw_trees([(self.tracks, self.track_id)])
 
-    def draw_from_nodes(self, tree_nodes: list[TreeNode], track_id: int | None = None):
-        self.edges, self.annotations = layout_tree(tree_nodes)
+    def draw_trees(self, lineages: list[tuple[Tracks, int]]) -> None:
+        """
+        Plot several lineage trees side by side.
 
-        if self.has_tracks:
-            self.update_edge_colors(update_live=False)
+        Parameters
+        ----------
+        lineages :
+            ``(layer, track_id)`` pairs. The tree containing each track is
+            drawn, and the tracks can come from different layers. If
+            `time_window` is set, the part of a lineage inside the window may
+            be drawn as several trees.
+        """
+        with timed("draw_tree"):
+            self.clear()
+            trees = []
+            layers = []
+            caches = []
+            tints = []
+            with timed("build_subgraph"):
+                for lineage, (layer, track_id) in enumerate(lineages):
+                    cache = None
+                    index = None
+                    if self.layout_cache is not None and layer is not None:
+                        cache = self.layout_cache(layer)
+                    if cache is not None:
+                        index = cache.graph_index
+                    elif self.graph_index is not None and layer is not None:
+                        index = self.graph_index(layer)
+                    if self.time_window is not None:
+                        if index is None:
+                            index = build_graph_index(layer.data, layer.graph)
+                        window_trees = index.window_subgraphs(
+                            index.root_id(track_id), *self.time_window
+                        )
+                        # layouts of windows are not cached
+                        trees += window_trees
+                        layers += [layer] * len(window_trees)
+                        caches += [None] * len(window_trees)
+                        tints += [lineage] * len(window_trees)
+                        continue
+                    if index is None:
+                        trees.append(build_subgraph(layer, track_id))
+                    else:
+                        trees.append(index.subgraph(index.root_id(track_id)))
+                    layers.append(layer)
+                    caches.append(cache)
+                    tints.append(lineage)
+            self.draw_from_forest(trees, layers, caches=caches, tints=tints)
+
+    def _layer_graph_index(self, layer: Tracks) -> GraphIndex:
+        """Return the graph index of a layer, from its layout cache or the
+        `graph_index` callback if they are set."""
+        cache = None if self.layout_cache is None else self.layout_cache(layer)
+        if cache is not None:
+            return cache.graph_index
+        if self.graph_index is not None:
+            return self.graph_index(layer)
+        return build_graph_index(layer.data, layer.graph)
 
-        for e in self.edges:
-            self.add_branch(e)
+    def draw_from_nodes(self, tree_nodes: list[TreeNode], track_id: int | None = None):
+        self.draw_from_forest([tree_nodes], [self.tracks if self.has_tracks else None])
 
-        # labels
-        for a in self.annotations:
-            self.add_annotation(a)
+    def draw_from_forest(
+        self,
+        trees: list[list[TreeNode]],
+        layers: list[Tracks | None],
+        *,
+        caches: list[LayoutCache | None] | None = None,
+        tints: list[int] | None = None,
+    ) -> None:
+        """
+        Plot several trees, given their nodes, side by side.
 
-        self.draw_tree_visual()
+        Parameters
+        ----------
+        trees :
+            A list of trees, each given as a list of graph.TreeNode objects.
+        layers :
+            The layer that each tree comes from, which is used to colour its
+            branches. Branches of trees with no layer are drawn in white.
+        caches :
+            The layout cache of each tree, or `None` to lay it out from
+            scratch.
+        tints :
+            The index of the lineage of each tree, so that trees from the same
+            lineage share a tint. By default each tree is its own lineage.
+        """
+        self.tree_layers = layers
+        self._drawn_track_ids = {
+            (id(layer), node.ID)
+            for layer, nodes in zip(layers, trees)
+            for node in nodes
+        }
+        layouts = [
+            None
+            if cache is None
+            else functools.partial(cache.layout, layout=self.layout_mode)
+            for cache in caches or []
+        ]
+        with timed("layout_tree"):
+            self.edges, self.annotations = layout_forest(
+                trees, layout=self.layout_mode, layouts=layouts or None, tints=tints
+            )
+        if not self.edges:
+            # nothing to draw, e.g. no tracks in the time window
+            return
+
+        if self._highlights or any(layer is not None for layer in layers):
+            with timed("update_edge_colors"):
+                self.update_edge_colors(update_live=False)
+
+        with timed("add_branches"):
+            for e in self.edges:
+                self.add_branch(e)
+
+            # labels
+            for a in self.annotations:
+                self.add_annotation(a)
+
+        with timed("draw_tree_visual"):
+            self.draw_tree_visual()
 
     def update_edge_colors(self, *, update_live: bool = True) -> None:
         """
@@ -72,15 +234,62 @@ class TreePlotterBase(abc.ABC, TrackPropertyMixin):
             If `True`, also call `update_colors()` on the plotting backend
             to update the colors in a live plot.
         """
+        highlights = self._highlights
+        # the rows of each track are looked up in the graph index of its
+        # layer, rather than by comparing every row with the track ID
+        indexes: dict[int, GraphIndex] = {}
         for e in self.edges:
-            if e.track_id is not None:
-                e.color = self.tracks.track_colors[
-                    self.tracks.properties["track_id"] == e.track_id
-                ]
+            if e.track_id is None:
+                continue
+            tracks = self.tree_layers[e.tree]
+            if (id(tracks), e.track_id) in highlights:
+                e.color = highlights[id(tracks), e.track_id]
+            elif tracks is not None:
+                if id(tracks) not in indexes:
+                    indexes[id(tracks)] = self._layer_graph_index(tracks)
+                index = indexes[id(tracks)]
+                rows = index.rows(e.track_id)
+                colors = tracks.track_colors[rows]
+                t = index.t[rows]
+                if e.node is not None and not np.array_equal(t, e.node.t):
+                    # the branch may not have a vertex per time point, e.g. if
+                    # it was cut by the time window
+                    colors = _interpolate_colors(t, colors, e.node.t)
+                e.color = colors
 
         if update_live:
             self.update_colors()
 
+    @property
+    def _highlights(self) -> dict[tuple[int, int], np.ndarray]:
+        return getattr(self, "_highlighted_branches", {})
+
+    def highlight_branches(
+        self,
+        tracks: Tracks | None,
+        track_ids: Iterable[int],
+        color: ColorType = HIGHLIGHT_COLOR,
+    ) -> None:
+        """
+        Draw the branches of some tracks in a single colour, e.g. to show the
+        tracks that changed between two tracking runs. This replaces any
+        previous highlights.
+
+        Parameters
+        ----------
+        tracks :
+            The layer containing the tracks, or `None` for trees that were
+            not drawn from a layer.
+        track_ids :
+            The tracks to highlight. Pass an empty list to clear highlights.
+        color :
+            RGBA colour of the highlighted branches.
+        """
+        color = np.asarray(color, dtype=float)
+        self._highlighted_branches = {(id(tracks), int(i)): color for i in track_ids}
+        if hasattr(self, "edges"):
+            self.update_edge_colors()
+
     @abc.abstractmethod
     def update_colors(self) -> None:
         """
@@ -154,14 +363,18 @@ class PropertyPlotterBase(abc.ABC, TrackPropertyMixin):
         layer, currently selected track_id, and the property used to 'color_by'
         in the napari viewer.
         """
-        t, prop = self.get_track_properties()
+        with timed("plot_property"):
+            with timed("get_track_properties"):
+                t, prop = self.get_track_properties()
 
-        self.clear()
-        self.plot(t, prop)
-        self.set_xlabel("Time")
-        self.set_ylabel("Property value")
-        self.set_title(f"{self.tracks.color_by}, cell #{self.track_id}")
-        self.redraw()
+            with timed("plot"):
+                self.clear()
+                self.plot(t, prop)
+                self.set_xlabel("Time")
+                self.set_ylabel("Property value")
+                self.set_title(f"{self.tracks.color_by}, cell #{self.track_id}")
+            with timed("redraw"):
+                self.redraw()
 
     def get_track_properties(self) -> tuple[np.ndarray, np.ndarray]:
         """
@@ -175,10 +388,10 @@ class PropertyPlotterBase(abc.ABC, TrackPropertyMixin):
         prop :
             Property values.
         """
-        all_props = pd.DataFrame(self.tracks.properties)
-        all_props = all_props.loc[all_props["track_id"] == self.track_id]
+        properties = self.tracks.properties
+        in_track = np.asarray(properties["track_id"]) == self.track_id
         t = self.tracks.data[self.tracks.data[:, 0] == self.track_id, 1]
-        return t, all_props[self.tracks.color_by].values
+        return t, np.asarray(properties[self.tracks.color_by])[in_track]
 
     @abc.abstractmethod
     def get_qwidget(self) -> QWidget:
@@ -0,0 +1,82 @@
+"""
+A downsampled overview of a laid out tree, for drawing a minimap.
+
+`edge_density` rasterises every edge of a layout once, into a small image of
+the number of edges crossing each pixel. Drawing the minimap then only needs
+this image, however many edges the tree has.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from napari_arboretum.tree import Edge
+from napari_arboretum.visualisation.raster import line_samples
+
+# (time, position) size of the density image, in pixels
+MINIMAP_SHAPE = (256, 64)
+
+# number of edges rasterised at a time, which bounds the memory used
+EDGE_CHUNK_SIZE = 4096
+
+
+@dataclass
+class EdgeDensity:
+    """
+    The density of the edges of a tree.
+
+    Attributes
+    ----------
+    image : np.ndarray
+        Log-scaled number of edges crossing each pixel, in the range [0, 1].
+        Rows are along time, and columns along the position in the tree.
+    origin : np.ndarray
+        ``(position, time)`` of the centre of the first pixel.
+    pixel_size : np.ndarray
+        ``(position, time)`` size of a pixel.
+    """
+
+    image: np.ndarray
+    origin: np.ndarray
+    pixel_size: np.ndarray
+
+
+def edge_density(
+    edges: list[Edge], shape: tuple[int, int] = MINIMAP_SHAPE
+) -> EdgeDensity:
+    """Rasterise the edges of a tree into a density image.
+
+    Each edge is sampled once per pixel along its length, so the cost is
+    proportional to the number of edges times the size of the image, and the
+    memory used is bounded by `EDGE_CHUNK_SIZE`.
+
+    Parameters
+    ----------
+    edges :
+        The edges of the tree.
+    shape :
+        ``(time, position)`` size of the image, in pixels.
+    """
+    # (position, time) of the start and end of each edge
+    start = np.array([(e.y[0], e.x[0]) for e in edges], dtype=float).reshape(-1, 2)
+    end = np.array([(e.y[-1], e.x[-1]) for e in edges], dtype=float).reshape(-1, 2)
+    size = np.array(shape[::-1])
+    if not len(edges):
+        return EdgeDensity(np.zeros(shape), np.zeros(2), np.ones(2))
+
+    lo = np.minimum(start.min(axis=0), end.min(axis=0))
+    span = np.maximum(start.max(axis=0), end.max(axis=0)) - lo
+    span[span == 0] = 1.0
+    pixel_size = span / (size - 1)
+    start = (start - lo) / pixel_size
+    end = (end - lo) / pixel_size
+
+    counts = np.zeros(size.prod(), dtype=np.int64)
+    for _, _, points in line_samples(start, end, EDGE_CHUNK_SIZE):
+        counts += np.bincount(
+            points[:, 1] * size[0] + points[:, 0], minlength=counts.size
+        )
+
+    image = np.log1p(counts.reshape(shape))
+    return EdgeDensity(image=image / image.max(), origin=lo, pixel_size=pixel_size)
@@ -0,0 +1,187 @@
+"""
+Draw laid out trees into NumPy images, without a display or OpenGL context.
+
+`rasterize` draws every edge of a layout as a line of pixels, coloured by
+interpolating the colours of its vertices, e.g. the colour of each time point
+of a branch. Lines are sampled once per pixel along their length, in
+vectorized chunks, so drawing a tree takes milliseconds and thumbnails of
+thousands of lineages can be drawn on headless machines.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterator
+
+import numpy as np
+
+from napari_arboretum.tree import Edge
+
+# (time, position) size of a raster, in pixels
+RASTER_SHAPE = (256, 256)
+
+# RGBA colour of the pixels that no edge crosses
+BACKGROUND = (0, 0, 0, 255)
+
+# number of line segments sampled at a time, which bounds the memory used
+SEGMENT_CHUNK_SIZE = 4096
+
+# empty margin around the tree, in pixels
+MARGIN = 2
+
+TWO_DIM = 2
+
+
+@dataclass
+class Raster:
+    """
+    A tree drawn into an image.
+
+    Attributes
+    ----------
+    image : np.ndarray
+        (H, W, 4) uint8 RGBA image. Rows are along time, and columns along
+        the position in the tree.
+    origin : np.ndarray
+        ``(position, time)`` of the centre of the first pixel.
+    pixel_size : np.ndarray
+        ``(position, time)`` size of a pixel.
+    """
+
+    image: np.ndarray
+    origin: np.ndarray
+    pixel_size: np.ndarray
+
+    def pixel(self, position: float, time: float) -> tuple[int, int]:
+        """Return the ``(row, column)`` of the pixel containing a point."""
+        col, row = np.rint((np.array([position, time]) - self.origin) / self.pixel_size)
+        return int(row), int(col)
+
+
+def line_samples(
+    start: np.ndarray, end: np.ndarray, chunk_size: int = SEGMENT_CHUNK_SIZE
+) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Sample line segments once per pixel along their length.
+
+    Parameters
+    ----------
+    start, end :
+        (N, 2) arrays of the ends of each segment, in pixels.
+    chunk_size :
+        Number of segments sampled at a time.
+
+    Yields
+    ------
+    segment :
+        The index of the segment of each sample.
+    fraction :
+        How far along its segment each sample is, from 0 to 1.
+    points :
+        (S, 2) integer pixel coordinates of each sample.
+    """
+    for i in range(0, len(start), chunk_size):
+        a = start[i : i + chunk_size]
+        delta = end[i : i + chunk_size] - a
+        n = np.ceil(np.abs(delta).max(axis=1)).astype(np.int64) + 1
+        segment = np.repeat(np.arange(n.size), n)
+        step = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+        fraction = step / np.maximum(n - 1, 1)[segment]
+        points = np.rint(a[segment] + delta[segment] * fraction[:, None])
+        yield segment + i, fraction, points.astype(np.int64)
+
+
+def edge_segments(
+    edges: list[Edge],
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Split edges into straight segments with a colour at each end.
+
+    Branches coloured per time point are split at each time point, and other
+    edges are a single segment of one colour.
+
+    Returns
+    -------
+    start, end :
+        (N, 2) arrays of the ``(position, time)`` of the ends of each segment.
+    start_color, end_color :
+        (N, 4) arrays of the RGBA colour, in [0, 1], of the ends of each
+        segment.
+    """
+    start, end, start_color, end_color = [], [], [], []
+    for e in edges:
+        color = np.asarray(e.color, dtype=float)
+        if e.node is not None and color.ndim == TWO_DIM and len(color) > 1:
+            t = np.asarray(e.node.t, dtype=float)
+            y = np.full(t.size, e.y[0], dtype=float)
+            points = np.column_stack((y, t))
+            start.append(points[:-1])
+            end.append(points[1:])
+            start_color.append(color[:-1])
+            end_color.append(color[1:])
+        else:
+            color = color.reshape(-1, 4)[:1]
+            start.append([(e.y[0], e.x[0])])
+            end.append([(e.y[-1], e.x[-1])])
+            start_color.append(color)
+            end_color.append(color)
+    if not start:
+        return np.empty((0, 2)), np.empty((0, 2)), np.empty((0, 4)), np.empty((0, 4))
+    return (
+        np.concatenate(start).astype(float),
+        np.concatenate(end).astype(float),
+        np.concatenate(start_color),
+        np.concatenate(end_color),
+    )
+
+
+def rasterize(
+    edges: list[Edge],
+    shape: tuple[int, int] = RASTER_SHAPE,
+    *,
+    background: tuple[int, int, int, int] = BACKGROUND,
+    line_width: int = 1,
+) -> Raster:
+    """Draw the edges of a tree into an RGBA image.
+
+    The tree is scaled to fill the image, with time increasing down the rows.
+    Edges are drawn in order, so later edges are drawn over earlier ones.
+    Annotations are not drawn.
+
+    Parameters
+    ----------
+    edges :
+        The edges of the tree.
+    shape :
+        ``(time, position)`` size of the image, in pixels.
+    background :
+        RGBA colour of the background, as integers in [0, 255].
+    line_width :
+        Width of the lines, in pixels.
+    """
+    image = np.empty((*shape, 4), dtype=np.uint8)
+    image[...] = background
+    start, end, start_color, end_color = edge_segments(edges)
+    if not len(start):
+        return Raster(image, np.zeros(2), np.ones(2))
+
+    size = np.array(shape[::-1])
+    lo = np.minimum(start.min(axis=0), end.min(axis=0))
+    span = np.maximum(start.max(axis=0), end.max(axis=0)) - lo
+    span[span == 0] = 1.0
+    pixel_size = span / np.maximum(size - 1 - 2 * MARGIN, 1)
+    origin = lo - MARGIN * pixel_size
+    start = (start - origin) / pixel_size
+    end = (end - origin) / pixel_size
+
+    # offsets of the pixels of a square brush
+    radius = np.arange(line_width) - (line_width - 1) // 2
+    brush = np.stack(np.meshgrid(radius, radius), axis=-1).reshape(-1, 2)
+
+    pixels = image.reshape(-1, 4)
+    for segment, fraction, points in line_samples(start, end):
+        f = fraction[:, None]
+        colors = (1 - f) * start_color[segment] + f * end_color[segment]
+        colors = np.rint(np.clip(colors, 0, 1) * 255).astype(np.uint8)
+        for offset in brush:
+            col, row = (points + offset).T
+            inside = (col >= 0) & (col < size[0]) & (row >= 0) & (row < size[1])
+            pixels[row[inside] * size[0] + col[inside]] = colors[inside]
+    return Raster(image=image, origin=origin, pixel_size=pixel_size)
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING, Callable
+
+import numpy as np
+
+from napari_arboretum.io.png import export_png
+from napari_arboretum.tree import Annotation, Edge
+from napari_arboretum.visualisation.base_plotter import TreePlotterBase
+from napari_arboretum.visualisation.raster import BACKGROUND, RASTER_SHAPE, rasterize
+
+if TYPE_CHECKING:
+    from napari.layers import Tracks
+
+    from napari_arboretum.graph import GraphIndex
+
+__all__ = ["RasterPlotter"]
+
+# RGBA colour of the current time line
+TIME_LINE_COLOR = (255, 255, 255, 255)
+
+
+class RasterPlotter(TreePlotterBase):
+    """
+    Tree plotter that draws into a NumPy RGBA image, see
+    `napari_arboretum.visualisation.raster`.
+
+    It needs no display or OpenGL context, so it can draw trees on headless
+    machines, e.g. to make thumbnails of every lineage. Annotations are not
+    drawn.
+
+    Parameters
+    ----------
+    shape :
+        ``(time, position)`` size of the image, in pixels.
+    background :
+        RGBA colour of the background, as integers in [0, 255].
+    line_width :
+        Width of the branches, in pixels.
+    graph_index :
+        Called with the layer of each tree to get its graph index, see
+        `TreePlotterBase.graph_index`.
+
+    Attributes
+    ----------
+    raster : napari_arboretum.visualisation.raster.Raster
+        The drawn tree.
+    """
+
+    def __init__(
+        self,
+        shape: tuple[int, int] = RASTER_SHAPE,
+        *,
+        background: tuple[int, int, int, int] = BACKGROUND,
+        line_width: int = 1,
+        graph_index: Callable[[Tracks], GraphIndex] | None = None,
+    ):
+        self.shape = shape
+        self.background = background
+        self.line_width = line_width
+        self.graph_index = graph_index
+        self.time: int | None = None
+        self.clear()
+
+    @property
+    def image(self) -> np.ndarray:
+        """The (H, W, 4) uint8 RGBA image of the tree."""
+        return self.raster.image
+
+    def save(self, filename: os.PathLike) -> None:
+        """Save the image of the tree as a PNG file."""
+        export_png(filename, self.image)
+
+    def clear(self) -> None:
+        self.raster = rasterize([], self.shape, background=self.background)
+
+    def update_colors(self) -> None:
+        self.draw_tree_visual()
+
+    def add_branch(self, e: Edge) -> None:
+        # branches are drawn from self.edges by draw_tree_visual
+        pass
+
+    def add_annotation(self, a: Annotation) -> None:
+        # text is not drawn
+        pass
+
+    def draw_current_time_line(self, time: int) -> None:
+        self.time = time
+        self.draw_tree_visual()
+
+    def draw_tree_visual(self) -> None:
+        self.raster = rasterize(
+            getattr(self, "edges", []),
+            self.shape,
+            background=self.background,
+            line_width=self.line_width,
+        )
+        if self.time is not None and getattr(self, "edges", []):
+            row, _ = self.raster.pixel(0, self.time)
+            if 0 <= row < self.shape[0]:
+                self.raster.image[row] = TIME_LINE_COLOR
@@ -1,13 +1,20 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable
 
 import numpy as np
 from qtpy.QtWidgets import QWidget
-from vispy import scene
+from vispy import gloo, scene
+from vispy.visuals import Visual
+from vispy.visuals.transforms import STTransform
 
-from napari_arboretum.tree import Annotation, Edge
+from napari_arboretum.tree import Annotation, BranchIndex, ColorType, Edge
 from napari_arboretum.visualisation.base_plotter import TreePlotterQWidgetBase
+from napari_arboretum.visualisation.minimap import edge_density
+
+if TYPE_CHECKING:
+    from napari.layers import Tracks
 
 __all__ = ["VisPyPlotter"]
 
@@ -15,6 +22,18 @@ __all__ = ["VisPyPlotter"]
 DEFAULT_TEXT_SIZE = 8
 DEFAULT_BRANCH_WIDTH = 3
 TWO_DIM = 2
+HIGHLIGHT_COLOR = "yellow"
+# maximum distance, in pixels, between the mouse and a picked branch
+PICK_TOLERANCE = 5
+# maximum distance, in pixels, the mouse can move during a click
+CLICK_TOLERANCE = 3
+# width of the minimap, in pixels
+MINIMAP_WIDTH = 60
+MINIMAP_COLORMAP = "viridis"
+VIEWPORT_COLOR = "white"
+# vertices of a branch whose colours differ by less than this are merged, which
+# is less than one step of an 8-bit colour channel
+COLOR_TOLERANCE = 1 / 255
 
 
 @dataclass
@@ -25,14 +44,75 @@ class Bounds:
     ymax: float
 
 
+def color_run_vertices(
+    color: np.ndarray,
+    tolerance: float = COLOR_TOLERANCE,
+    *,
+    breaks: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Return the indices of the vertices of straight lines that are needed to
+    draw their colours to within a tolerance.
+
+    Colours are binned into cells of size ``tolerance``, and only the first
+    and last vertex of each run of vertices in the same cell are kept. The
+    colours interpolated between them are within ``tolerance`` of the
+    original colours, so the number of vertices depends on how much the
+    colour changes along the line, and not on its length.
+
+    Parameters
+    ----------
+    color :
+        (N, 4) array of the RGBA colour of each vertex.
+    tolerance :
+        Maximum difference between drawn and original colour channels, in
+        the units of ``color``.
+    breaks :
+        Indices of the first vertex of each line after the first, if the
+        vertices of several lines are given one after the other. The ends of
+        every line are kept.
+    """
+    n_vertices = len(color)
+    cells = np.floor_divide(color, tolerance)
+    # changes[i] is True if vertices i and i + 1 are in different runs
+    changes = np.any(cells[1:] != cells[:-1], axis=1)
+    keep = np.zeros(n_vertices, dtype=bool)
+    if n_vertices:
+        keep[[0, -1]] = True
+    if breaks is not None:
+        keep[breaks] = True
+        keep[np.asarray(breaks) - 1] = True
+    keep[:-1] |= changes
+    keep[1:] |= changes
+    return np.flatnonzero(keep)
+
+
+def to_uint8(color: np.ndarray) -> np.ndarray:
+    """Convert RGBA colours in [0, 1] to integers in [0, 255]."""
+    return np.rint(np.clip(color, 0, 1) * 255).astype(np.uint8)
+
+
+def pack_colors(color: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    """
+    Pack (N, 4) uint8 RGBA colours into (N, 2) float32 values of
+    ``(red + 256 * green, blue + 256 * alpha)``, as unpacked by the vertex
+    shader of `BranchLinesVisual`.
+    """
+    color = np.ascontiguousarray(color, dtype=np.uint8)
+    if out is None:
+        out = np.empty((len(color), 2), dtype=np.float32)
+    out = out[: len(color)]
+    # each pair of channels read as a little-endian 16-bit integer
+    np.copyto(out, color.view("<u2"))
+    return out
+
+
 @dataclass
 class TrackSubvisualProxy:
     pos: np.ndarray
-    color: np.ndarray = np.array([1.0, 1.0, 1.0, 1.0])
-
-    @property
-    def connex(self):
-        return [True] * (self.pos.shape[0] - 1) + [False]
+    color: np.ndarray = field(
+        default_factory=lambda: np.array([1.0, 1.0, 1.0, 1.0], dtype=np.float32)
+    )
 
     @property
     def safe_color(self) -> np.ndarray:
@@ -45,7 +125,7 @@ class TrackSubvisualProxy:
 class AnnotationSubvisualProxy:
     pos: np.ndarray
     text: str
-    color: str = "white"
+    color: ColorType = "white"
 
 
 class VisPyPlotter(TreePlotterQWidgetBase):
@@ -58,6 +138,17 @@ class VisPyPlotter(TreePlotterQWidgetBase):
         Main plotting canvas
     tree : TreeVisual
         The tree.
+    branch_index : BranchIndex
+        Spatial index of the drawn branches, used to pick branches with the
+        mouse.
+    branch_picked_callbacks : list
+        Functions called with ``(layer, track_id, time)`` when a branch is
+        clicked, where ``layer`` is the layer of the tree that was clicked,
+        or `None` if the tree was not drawn from a layer.
+    minimap : vispy.scene.ViewBox
+        Overview of the whole tree, next to the main view, showing the part
+        of the tree in the main view as a rectangle. Clicking the minimap
+        centres the main view on that point.
     """
 
     def __init__(self):
@@ -65,16 +156,129 @@ class VisPyPlotter(TreePlotterQWidgetBase):
         Setup the plot canvas..
         """
         self.canvas = scene.SceneCanvas(keys=None, size=(300, 1200))
-        self.view = self.canvas.central_widget.add_view()
+        grid = self.canvas.central_widget.add_grid()
+        self.view = grid.add_view(row=0, col=0)
         self.view.camera = scene.PanZoomCamera()
         self.tree = TreeVisual(parent=None)
         self.view.add(self.tree)
 
+        self.branch_index = BranchIndex([])
+        self.branch_picked_callbacks: list[
+            Callable[[Tracks | None, int, int], None]
+        ] = []
+        self._highlight = scene.visuals.Line(
+            color=HIGHLIGHT_COLOR, width=2 * DEFAULT_BRANCH_WIDTH
+        )
+        self._highlight.visible = False
+        self.view.add(self._highlight)
+        self.canvas.events.mouse_move.connect(self._on_mouse_move)
+        self.canvas.events.mouse_release.connect(self._on_mouse_release)
+
+        # The minimap shows an edge density image, which is only computed
+        # when a tree is drawn, so panning and zooming only moves the
+        # viewport rectangle
+        self.minimap = grid.add_view(row=0, col=1)
+        self.minimap.width_max = MINIMAP_WIDTH
+        self.minimap.camera = scene.PanZoomCamera(interactive=False)
+        self._density = scene.visuals.Image(
+            cmap=MINIMAP_COLORMAP, clim=(0, 1), parent=self.minimap.scene
+        )
+        self._viewport = scene.visuals.Line(
+            color=VIEWPORT_COLOR, parent=self.minimap.scene
+        )
+        self.minimap.visible = False
+        self.view.scene.transform.changed.connect(self._update_viewport)
+
     def get_qwidget(self) -> QWidget:
         return self.canvas.native
 
     def clear(self) -> None:
         self.tree.clear()
+        self.branch_index = BranchIndex([])
+        self._highlight.visible = False
+        self.minimap.visible = False
+
+    def pick(
+        self, canvas_pos: tuple[float, float]
+    ) -> tuple[Tracks | None, int, int] | None:
+        """
+        Find the branch under a point on the canvas.
+
+        Parameters
+        ----------
+        canvas_pos :
+            Position on the canvas, in pixels.
+
+        Returns
+        -------
+        picked :
+            The layer and track ID of the branch, and the time under the
+            point, or `None` if there is no branch under the point.
+        """
+        idx = self._pick_index(canvas_pos)
+        if idx is None:
+            return None
+        index = self.branch_index
+        t = self.view.scene.transform.imap(canvas_pos)[1]
+        t = np.clip(t, index.t_start[idx], index.t_end[idx])
+        layer = self.tree_layers[index.trees[idx]]
+        return layer, int(index.track_ids[idx]), int(np.rint(t))
+
+    def _pick_index(self, canvas_pos: tuple[float, float]) -> int | None:
+        if not len(self.branch_index):
+            return None
+        transform = self.view.scene.transform
+        y, t = transform.imap(canvas_pos)[:2]
+        edge = transform.imap((canvas_pos[0] + PICK_TOLERANCE, canvas_pos[1]))[0]
+        return self.branch_index.query(y, t, abs(edge - y))
+
+    def _minimap_pos(self, canvas_pos: tuple[float, float]) -> np.ndarray | None:
+        """The tree coordinates of a point on the canvas, if it is inside the
+        minimap."""
+        if not self.minimap.visible:
+            return None
+        offset = np.subtract(canvas_pos[:2], self.minimap.pos)
+        if np.any(offset < 0) or np.any(offset > self.minimap.size):
+            return None
+        return self.canvas.scene.node_transform(self.minimap.scene).map(canvas_pos[:2])[
+            :2
+        ]
+
+    def _on_mouse_move(self, event) -> None:
+        """Highlight the branch under the mouse."""
+        if self._minimap_pos(event.pos) is not None:
+            if event.is_dragging:
+                self._on_mouse_release(event)
+            return
+        if event.is_dragging:
+            return
+        idx = self._pick_index(event.pos)
+        if idx is None:
+            self._highlight.visible = False
+            return
+        index = self.branch_index
+        y = index.y[idx]
+        self._highlight.set_data(
+            pos=np.array([[y, index.t_start[idx]], [y, index.t_end[idx]]])
+        )
+        self._highlight.visible = True
+
+    def _on_mouse_release(self, event) -> None:
+        """Call the branch picked callbacks if a branch was clicked."""
+        press = event.press_event
+        if event.button != 1 or press is None:
+            return
+        center = self._minimap_pos(event.pos)
+        if center is not None:
+            self.view.camera.center = tuple(center)
+            return
+        if np.linalg.norm(np.subtract(event.pos, press.pos)) > CLICK_TOLERANCE:
+            # the mouse was dragged to pan the view
+            return
+        picked = self.pick(event.pos)
+        if picked is not None:
+            for callback in self.branch_picked_callbacks:
+                callback(*picked)
 
     @property
     def bounds(self) -> Bounds:
@@ -119,9 +323,11 @@ class VisPyPlotter(TreePlotterQWidgetBase):
         """
         Update plotted track colors from the colors in self.edges.
         """
+        # colours are converted for every branch at once by the tree
         for e in self.edges:
             if e.track_id is not None:
-                self.tree.set_branch_color(e.track_id, e.color)
+                self.tree.tracks[e.tree, e.track_id].color = e.color
+        self.tree.update_colors()
 
     def add_branch(self, e: Edge) -> None:
         """
@@ -129,7 +335,6 @@ class VisPyPlotter(TreePlotterQWidgetBase):
         """
         # self.tree.add_track(e.track_id, np.column_stack((e.y, e.x)), e.color)
         self.tree.add_track(e)
-        self.autoscale_view()
 
     def add_annotation(self, a: Annotation) -> None:
         """
@@ -141,6 +346,9 @@ class VisPyPlotter(TreePlotterQWidgetBase):
         if not hasattr(self, "_time_line"):
             self._time_line = scene.visuals.Line()
             self.view.add(self._time_line)
+        self._time_line.visible = bool(self.tree.tracks)
+        if not self.tree.tracks:
+            return
         bounds = self.bounds
         padding = (bounds.xmax - bounds.xmin) * 0.1
         self._time_line.set_data(
@@ -152,6 +360,152 @@ class VisPyPlotter(TreePlotterQWidgetBase):
         Draw the whole tree.
         """
         self.tree.draw_tree()
+        self.draw_minimap()
+        self.autoscale_view()
+        self.branch_index = BranchIndex(self.edges)
+
+    def draw_minimap(self) -> None:
+        """Draw the edge density of the whole tree in the minimap."""
+        density = edge_density(self.edges)
+        self._density.set_data(density.image)
+        self._density.transform = STTransform(
+            scale=density.pixel_size,
+            translate=density.origin - density.pixel_size / 2,
+        )
+        height, width = density.image.shape
+        self.minimap.camera.rect = (
+            *(density.origin - density.pixel_size / 2),
+            *(density.pixel_size * (width, height)),
+        )
+        self.minimap.visible = True
+        self._update_viewport()
+
+    def _update_viewport(self, event=None) -> None:
+        """Draw the part of the tree in the main view on the minimap."""
+        rect = self.view.camera.rect
+        self._viewport.set_data(
+            pos=np.array(
+                [
+                    [rect.left, rect.bottom],
+                    [rect.right, rect.bottom],
+                    [rect.right, rect.top],
+                    [rect.left, rect.top],
+                    [rect.left, rect.bottom],
+                ]
+            )
+        )
+
+
+class BranchLinesVisual(Visual):
+    """
+    Line segments with a uint8 RGBA colour at each vertex.
+
+    VisPy's LineVisual only takes float colours, which it uploads as four
+    float32 values per vertex. gloo only sends vertex attributes as floats,
+    so here the uint8 colour channels are packed in pairs into two float32
+    values per vertex, each an integer below 2**16 and so exact, which the
+    vertex shader unpacks and normalises to [0, 1].
+
+    The vertex buffers are allocated by `allocate`, filled in place by the
+    caller, and sent to the GPU by `upload`.
+
+    Attributes
+    ----------
+    pos : np.ndarray
+        (N, 2) float32 array of vertex positions.
+    color : np.ndarray
+        (N, 4) uint8 array of the RGBA colour of each vertex.
+    connect : np.ndarray
+        (N,) bool array, True if each vertex is connected to the next.
+    """
+
+    VERTEX_SHADER = """
+        attribute vec2 a_position;
+        // (red + 256 * green, blue + 256 * alpha)
+        attribute vec2 a_color;
+        varying vec4 v_color;
+
+        void main() {
+            vec2 high = floor(a_color / 256.0);
+            vec2 low = a_color - 256.0 * high;
+            v_color = vec4(low.x, high.x, low.y, high.y) / 255.0;
+            gl_Position = $transform(vec4(a_position, 0.0, 1.0));
+        }
+    """
+
+    FRAGMENT_SHADER = """
+        varying vec4 v_color;
+
+        void main() {
+            gl_FragColor = v_color;
+        }
+    """
+
+    def __init__(self, width: float = DEFAULT_BRANCH_WIDTH):
+        super().__init__(vcode=self.VERTEX_SHADER, fcode=self.FRAGMENT_SHADER)
+        self.unfreeze()
+        self.width = width
+        self._pos_vbo = gloo.VertexBuffer(np.zeros((1, 2), dtype=np.float32))
+        self._color_vbo = gloo.VertexBuffer(np.zeros((1, 2), dtype=np.float32))
+        self._segments = gloo.IndexBuffer(np.zeros(0, dtype=np.uint32))
+        self.free()
+        self.shared_program["a_position"] = self._pos_vbo
+        self.shared_program["a_color"] = self._color_vbo
+        self.set_gl_state("translucent")
+        self._draw_mode = "lines"
+        self._index_buffer = self._segments
+        self.freeze()
+
+    def free(self) -> None:
+        """Free the vertex buffers, so they are allocated once for the next
+        set of lines."""
+        self._pos_buffer = np.empty((0, 2), dtype=np.float32)
+        self._color_buffer = np.empty((0, 4), dtype=np.uint8)
+        self._packed_buffer = np.empty((0, 2), dtype=np.float32)
+        self._connect_buffer = np.empty(0, dtype=bool)
+        self.allocate(0)
+
+    def allocate(self, n_vertices: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Set the number of vertices, and return the ``pos``, ``color`` and
+        ``connect`` buffers to fill. The buffers are only reallocated if they
+        are too small.
+        """
+        if len(self._pos_buffer) < n_vertices:
+            self._pos_buffer = np.empty((n_vertices, 2), dtype=np.float32)
+            self._color_buffer = np.empty((n_vertices, 4), dtype=np.uint8)
+            self._packed_buffer = np.empty((n_vertices, 2), dtype=np.float32)
+            self._connect_buffer = np.empty(n_vertices, dtype=bool)
+        self.pos = self._pos_buffer[:n_vertices]
+        self.color = self._color_buffer[:n_vertices]
+        self.connect = self._connect_buffer[:n_vertices]
+        return self.pos, self.color, self.connect
+
+    def upload(self) -> None:
+        """Send the filled vertex buffers to the GPU."""
+        starts = np.flatnonzero(self.connect).astype(np.uint32)
+        self._segments.set_data(np.column_stack((starts, starts + 1)))
+        if len(self.pos):
+            self._pos_vbo.set_data(self.pos)
+            self._color_vbo.set_data(pack_colors(self.color, self._packed_buffer))
+        self.update()
+
+    def _prepare_transforms(self, view) -> None:
+        view.view_program.vert["transform"] = view.get_transform()
+
+    def _prepare_draw(self, view) -> bool | None:
+        if not self.connect.any():
+            return False
+        width = self.transforms.pixel_scale * self.width
+        self.update_gl_state(line_width=max(width, 1.0))
+        return None
+
+    def _compute_bounds(self, axis: int, view) -> tuple[float, float] | None:
+        if not len(self.pos):
+            return None
+        if axis >= self.pos.shape[1]:
+            return (0, 0)
+        return self.pos[:, axis].min(), self.pos[:, axis].max()
 
 
 class TreeVisual(scene.visuals.Compound):
@@ -159,17 +513,19 @@ class TreeVisual(scene.visuals.Compound):
     Tree visual that stores branches as sub-visuals.
     """
 
-    def __init__(self, parent):
+    def __init__(self, parent, color_tolerance: float = COLOR_TOLERANCE):
         super().__init__([])
         self.parent = parent
         self.unfreeze()
+        self.color_tolerance = color_tolerance
+        self._clear_vertices()
         # Keep a reference to tracks we add so their colour can be changed later
         self.tracks = {}
         self.edges = []
         self.annotations = []
 
         subvisuals = [
-            scene.visuals.Line(color="white", width=DEFAULT_BRANCH_WIDTH),
+            BranchLinesVisual(width=DEFAULT_BRANCH_WIDTH),
             scene.visuals.Text(
                 anchor_x="left",
                 anchor_y="top",
@@ -182,17 +538,72 @@ class TreeVisual(scene.visuals.Compound):
         for visual in subvisuals:
             self.add_subvisual(visual)
 
-    def get_branch_color(self, branch_id: int) -> np.ndarray:
-        return self.tracks[branch_id].color
+    def get_branch_color(self, branch_id: int, tree: int = 0) -> np.ndarray:
+        return self.tracks[tree, branch_id].color
 
-    def set_branch_color(self, branch_id: int, color: np.ndarray) -> None:
+    def set_branch_color(
+        self, branch_id: int, color: np.ndarray, tree: int = 0
+    ) -> None:
         """
         Set the color of an individual branch.
         """
-        self.tracks[branch_id].color = color
-        self._subvisuals[0].set_data(
-            color=np.row_stack([e.safe_color for e in self.edges]),
+        self.tracks[tree, branch_id].color = np.asarray(color)
+        self.update_colors()
+
+    def update_colors(self) -> None:
+        """
+        Update the drawn colors from the colors of the branches.
+        """
+        # the vertices depend on the colours, so they are all set again
+        self._fill_buffers()
+
+    def _fill_buffers(self) -> None:
+        """
+        Write the vertices of every branch into the vertex buffers of the
+        lines, with runs of vertices of nearly the same colour merged, and
+        upload them.
+
+        The colours of the branches are gathered into one table, converted
+        to uint8 once, and every vertex then reads its row of the table, so
+        no work is done per branch.
+        """
+        line = self._subvisuals[0]
+        if not self.edges:
+            line.allocate(0)
+            line.upload()
+            return
+
+        # each branch has one colour, or one colour per vertex
+        colors = [np.asarray(e.color) for e in self.edges]
+        n_colors = np.fromiter((c.size // 4 for c in colors), dtype=np.int64)
+        n_vertices = np.diff(self._vertex_offsets)
+        if np.any((n_colors != 1) & (n_colors != n_vertices)):
+            msg = "Expected one colour, or one colour per vertex, for each branch."
+            raise ValueError(msg)
+        table = to_uint8(np.vstack(colors))
+
+        # the row of the colour table of every vertex
+        color_offsets = np.cumsum(n_colors) - n_colors
+        vertex_edge = np.repeat(np.arange(len(self.edges)), n_vertices)
+        rows = color_offsets[vertex_edge]
+        per_vertex = (n_colors > 1)[vertex_edge]
+        rows[per_vertex] += (np.arange(len(rows)) - self._vertex_offsets[vertex_edge])[
+            per_vertex
+        ]
+
+        keep = color_run_vertices(
+            table[rows],
+            self.color_tolerance * 255,
+            breaks=self._vertex_offsets[1:-1],
         )
+        pos, color, connect = line.allocate(keep.size)
+        np.take(self._vertex_pos, keep, axis=0, out=pos)
+        np.take(table, rows[keep], axis=0, out=color)
+        # do not connect the last vertex of a branch to the next branch
+        kept_edge = vertex_edge[keep]
+        np.equal(kept_edge[:-1], kept_edge[1:], out=connect[:-1])
+        connect[-1] = False
+        line.upload()
 
     def add_track(self, e: Edge) -> None:
         """
@@ -206,25 +617,22 @@ class TreeVisual(scene.visuals.Compound):
             Array of shape (n, 4) specifying RGBA values in range [0, 1] along
             the track.
         """
-        color = e.color
-        pos = np.column_stack((e.y, e.x))
+        color = np.asarray(e.color)
 
         if e.node is None:
-            subvisual_proxy = TrackSubvisualProxy(
-                pos=pos,
-                color=np.array([1.0, 1.0, 1.0, 1.0]),
-            )
+            pos = np.empty((len(e.x), 2), dtype=np.float32)
+            pos[:, 0] = e.y
+            pos[:, 1] = e.x
+            subvisual_proxy = TrackSubvisualProxy(pos=pos, color=color)
         else:
             # Split up line into individual time steps so color can vary
             # along the line
-            ys = np.asarray(e.node.t)  # np.arange(pos[0, 1], pos[1, 1] + 1)
-            xs = np.ones(ys.size) * pos[0, 0]
-            subvisual_proxy = TrackSubvisualProxy(
-                pos=np.column_stack((xs, ys)),
-                color=color,
-            )
+            pos = np.empty((len(e.node.t), 2), dtype=np.float32)
+            pos[:, 0] = e.y[0]
+            pos[:, 1] = e.node.t
+            subvisual_proxy = TrackSubvisualProxy(pos=pos, color=color)
             # store a reference to this subvisual proxy
-            self.tracks[e.track_id] = subvisual_proxy
+            self.tracks[e.tree, e.track_id] = subvisual_proxy
 
         self.edges.append(subvisual_proxy)
 
@@ -232,31 +640,38 @@ class TreeVisual(scene.visuals.Compound):
         subvisual_proxy = AnnotationSubvisualProxy(
             text=label,
             pos=np.array([y, x, 0]),
+            color=color,
         )
 
         self.annotations.append(subvisual_proxy)
 
+    def _clear_vertices(self) -> None:
+        """Free the vertices of the branches."""
+        self._vertex_pos = np.empty((0, 2), dtype=np.float32)
+        self._vertex_offsets = np.zeros(1, dtype=np.int64)
+
     def clear(self) -> None:
         """Remove all tracks."""
+        self._clear_vertices()
+        self._subvisuals[0].free()
         self.tracks = {}
         self.edges = []
         self.annotations = []
 
-        for visual in self._subvisuals:
-            visual._pos = None
-
-            if hasattr(visual, "_text"):
-                visual._text = None
+        text = self._subvisuals[1]
+        text._pos = None
+        text._text = None
 
     def draw_tree(self) -> None:
         """Once the data is added, draw the tree."""
-
-        self._subvisuals[0].set_data(
-            pos=np.row_stack([e.pos for e in self.edges]),
-            color=np.row_stack([e.safe_color for e in self.edges]),
-            connect=np.concatenate([e.connex for e in self.edges]),
+        # the vertices of every branch, one after the other
+        self._vertex_pos = np.concatenate(
+            [e.pos for e in self.edges] or [np.empty((0, 2), dtype=np.float32)]
         )
+        self._vertex_offsets = np.cumsum([0] + [len(e.pos) for e in self.edges])
+        self._fill_buffers()
 
         # TextVisual does not have a ``set_data`` method
         self._subvisuals[1].pos = np.asarray([a.pos for a in self.annotations])
         self._subvisuals[1].text = [a.text for a in self.annotations]
+        self._subvisuals[1].color = [a.color for a in self.annotations] or "white"
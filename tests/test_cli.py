@@ -0,0 +1,97 @@
+import json
+
+import numpy as np
+
+from napari_arboretum import cli
+from napari_arboretum.graph import build_graph_index
+from napari_arboretum.tree import LAYOUTS
+
+TEST_GRAPH = {1: [0], 2: [0], 3: [1], 4: [1], 6: [5]}
+
+
+def _write_tracks(tmp_path):
+    ids = np.repeat(np.arange(7), 3)
+    t = np.arange(ids.size)
+    data = np.column_stack([ids, t, np.zeros_like(t), np.zeros_like(t)])
+    np.savetxt(
+        tmp_path / "tracks.csv", data, delimiter=",", header="ID,t,y,x", comments=""
+    )
+    with open(tmp_path / "graph.json", "w") as f:
+        json.dump(TEST_GRAPH, f)
+
+
+def test_export_cli(tmp_path):
+    """Test that every lineage is exported as an SVG."""
+    _write_tracks(tmp_path)
+    out = tmp_path / "out"
+    cli.main(
+        [
+            str(tmp_path / "tracks.csv"),
+            str(tmp_path / "graph.json"),
+            "--out",
+            str(out),
+            "--workers",
+            "1",
+        ]
+    )
+    assert sorted(p.name for p in out.iterdir()) == ["tree_0.svg", "tree_5.svg"]
+
+
+def test_export_cli_tracks_dir(tmp_path):
+    """Test exporting from a converted tracks directory."""
+    _write_tracks(tmp_path)
+    cli.convert_main(
+        [
+            str(tmp_path / "tracks.csv"),
+            str(tmp_path / "tracks"),
+            "--graph",
+            str(tmp_path / "graph.json"),
+        ]
+    )
+    out = tmp_path / "out"
+    cli.main([str(tmp_path / "tracks"), "--out", str(out), "--workers", "1"])
+    assert sorted(p.name for p in out.iterdir()) == ["tree_0.svg", "tree_5.svg"]
+
+
+def test_export_cli_png(tmp_path):
+    """Test exporting PNG thumbnails of every lineage."""
+    _write_tracks(tmp_path)
+    out = tmp_path / "out"
+    cli.main(
+        [
+            str(tmp_path / "tracks.csv"),
+            str(tmp_path / "graph.json"),
+            "--out",
+            str(out),
+            "--workers",
+            "1",
+            "--format",
+            "png",
+            "--size",
+            "32",
+            "16",
+        ]
+    )
+    assert sorted(p.name for p in out.iterdir()) == ["tree_0.png", "tree_5.png"]
+    assert (out / "tree_0.png").read_bytes()[:4] == b"\x89PNG"
+
+
+def test_export_lineage_layout(tmp_path, monkeypatch):
+    """Test that lineages are laid out with the chosen layout, by default the
+    one that handles merges."""
+    # the lineage of examples/show_multi_merge.py, which has two merges
+    graph = {2: [0], 1: [0], 3: [1], 4: [1], 5: [2], 6: [2], 7: [4, 6], 8: [3, 5]}
+    data = np.array([[i, t, 0, 0] for i in range(9) for t in (i, i + 1)], dtype=float)
+    index = build_graph_index(data, graph)
+    monkeypatch.setattr(cli, "_WORKER_INDEX", index)
+    exported = []
+    monkeypatch.setattr(
+        cli, "export_svg", lambda path, edges, annotations: exported.append(edges)
+    )
+
+    cli._export_lineage(0, tmp_path)
+    cli._export_lineage(0, tmp_path, layout="tree")
+    default, tree = ([(e.x, e.y) for e in edges] for edges in exported)
+    assert default == [(e.x, e.y) for e in LAYOUTS["dag"](index.subgraph(0))[0]]
+    assert tree == [(e.x, e.y) for e in LAYOUTS["tree"](index.subgraph(0))[0]]
+    assert default != tree
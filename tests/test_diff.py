@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from napari_arboretum.diff import diff_lineages, lineage_hashes
+from napari_arboretum.graph import build_graph_index
+from napari_arboretum.sample.synthetic import make_forest
+
+
+@pytest.fixture
+def forest():
+    data, _, graph = make_forest(5, 60, seed=0, cycle_length_mean=10)
+    return data, graph
+
+
+def relabel(data, graph, offset):
+    data = data.copy()
+    data[:, 0] += offset
+    graph = {k + offset: [p + offset for p in v] for k, v in graph.items()}
+    return data, graph
+
+
+def test_identical(forest):
+    """Test that relabelled copies of a forest are identical."""
+    data, graph = forest
+    index = build_graph_index(data, graph)
+    diff = diff_lineages(index, build_graph_index(*relabel(data, graph, 1000)))
+    assert diff.is_identical
+    assert diff.identical == {r: r + 1000 for r in index.roots}
+
+
+def test_hashes_ignore_child_order(forest):
+    """Test that subtree hashes do not depend on the order of children."""
+    data, graph = forest
+    index = build_graph_index(data, graph)
+    hashes = lineage_hashes(index)
+    for children in index.reverse_graph.values():
+        children.reverse()
+    assert lineage_hashes(index).subtree == hashes.subtree
+
+
+def test_removed_and_changed(forest):
+    """Test that removed tracks and changed branches are found."""
+    data, graph = forest
+    index = build_graph_index(data, graph)
+
+    # remove the daughters of one track, and shorten another track by a frame
+    parent = graph[max(graph)][0]
+    daughters = [k for k, v in graph.items() if v == [parent]]
+    shortened = next(k for k in graph if k not in daughters and k != parent)
+    last = data[:, 1] == data[data[:, 0] == shortened, 1].max()
+    keep = ~np.isin(data[:, 0], daughters) & ~((data[:, 0] == shortened) & last)
+    graph_b = {k: v for k, v in graph.items() if k not in daughters}
+    index_b = build_graph_index(data[keep], graph_b)
+
+    diff = diff_lineages(index, index_b, time_tolerance=1)
+    assert sorted(diff.removed) == sorted(daughters)
+    assert diff.added == []
+    assert diff.changed == [(shortened, shortened)]
+    assert diff.changed_tracks == [shortened]
+
+    # the shortened track is not a change if only topology is compared
+    diff = diff_lineages(index, index_b)
+    assert diff.changed == []
+    assert sorted(diff.removed) == sorted(daughters)
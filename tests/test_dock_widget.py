@@ -3,7 +3,7 @@ import pytest
 # this is your plugin name declared in your napari.plugins entry point
 MY_PLUGIN_NAME = "napari-arboretum"
 # the name of your widget(s)
-MY_WIDGET_NAMES = ["Arboretum"]
+MY_WIDGET_NAMES = ["Arboretum", "Lineage gallery"]
 
 
 @pytest.mark.parametrize("widget_name", MY_WIDGET_NAMES)
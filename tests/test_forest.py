@@ -0,0 +1,70 @@
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from napari_arboretum.graph import build_graph_index
+from napari_arboretum.io import forest
+
+# two lineages, where track 5 is a merge of tracks 3 and 4
+TEST_GRAPH = {1: [0], 2: [0], 3: [1], 4: [1], 5: [3, 4], 7: [6]}
+TEST_N_TRACKS = 8
+TEST_N_LINEAGES = 2
+TEST_FIRST_LINEAGE_SIZE = 6
+
+
+def _index(graph=TEST_GRAPH, n_tracks=TEST_N_TRACKS):
+    ids = np.repeat(np.arange(n_tracks), 2)
+    data = np.column_stack([ids, np.arange(ids.size), np.zeros((ids.size, 2))])
+    return build_graph_index(data, graph)
+
+
+def test_newick(tmp_path):
+    filename = tmp_path / "forest.nwk"
+    forest.export_forest(filename, _index(), fmt="newick")
+    assert filename.read_text().splitlines() == [
+        "(((5:1)3:1,4:1)1:1,2:1)0:1;",
+        "(7:1)6:1;",
+    ]
+
+
+def test_graphml_keeps_merges(tmp_path):
+    filename = tmp_path / "forest.graphml"
+    forest.export_forest(filename, _index(), fmt="graphml")
+    ns = {"g": "http://graphml.graphdrawing.org/xmlns"}
+    graph = ET.parse(filename).getroot().find("g:graph", ns)  # noqa: S314
+    assert len(graph.findall("g:node", ns)) == TEST_N_TRACKS
+    targets = [e.get("target") for e in graph.findall("g:edge", ns)]
+    assert sorted(targets) == ["n1", "n2", "n3", "n4", "n5", "n5", "n7"]
+
+
+def test_graphml_roots(tmp_path):
+    """Test that edges to tracks outside the exported lineages are dropped."""
+    # track 4 merges track 1, from lineage 0, and track 3, from lineage 2
+    index = _index({1: [0], 3: [2], 4: [1, 3]}, n_tracks=5)
+    root = index.root_id(3)
+    filename = tmp_path / "forest.graphml"
+    forest.export_forest(filename, index, fmt="graphml", roots=[root])
+    ns = {"g": "http://graphml.graphdrawing.org/xmlns"}
+    graph = ET.parse(filename).getroot().find("g:graph", ns)  # noqa: S314
+    nodes = {n.get("id") for n in graph.findall("g:node", ns)}
+    for edge in graph.findall("g:edge", ns):
+        assert {edge.get("source"), edge.get("target")} <= nodes
+
+
+def test_phyloxml(tmp_path):
+    filename = tmp_path / "forest.xml"
+    forest.export_forest(filename, _index(), fmt="phyloxml")
+    ns = {"p": "http://www.phyloxml.org"}
+    phylogenies = ET.parse(filename).getroot().findall("p:phylogeny", ns)  # noqa: S314
+    assert len(phylogenies) == TEST_N_LINEAGES
+    # the merged track 5 is only written once
+    assert len(phylogenies[0].findall(".//p:clade", ns)) == TEST_FIRST_LINEAGE_SIZE
+
+
+def test_deep_lineage(tmp_path):
+    """Check that exporting does not hit the recursion limit."""
+    n_tracks = 5000
+    graph = {i: [i - 1] for i in range(1, n_tracks)}
+    filename = tmp_path / "forest.nwk"
+    forest.export_forest(filename, _index(graph, n_tracks), fmt="newick")
+    assert filename.read_text().count("(") == n_tracks - 1
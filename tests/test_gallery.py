@@ -0,0 +1,57 @@
+import numpy as np
+
+from napari_arboretum.gallery import LineageGallery, ThumbnailRenderer
+from napari_arboretum.plugin import Arboretum
+from napari_arboretum.sample.synthetic import make_forest
+
+
+def test_gallery(make_napari_viewer, qtbot):
+    """Test that thumbnails are drawn for visible tiles, and that clicking one
+    shows its lineage."""
+    viewer = make_napari_viewer()
+    data, properties, graph = make_forest(200, 40, seed=0)
+    layer = viewer.add_tracks(data, properties=properties, graph=graph)
+    arboretum = Arboretum(viewer)
+    gallery = LineageGallery(viewer, arboretum=arboretum)
+    qtbot.addWidget(gallery)
+    model = gallery.model
+    assert gallery.layer is layer
+    assert model.rowCount() == len(arboretum.graph_index(layer).roots)
+    # thumbnails are drawn from a copy of the layer colours
+    snapshot = gallery.renderer._snapshot
+    assert snapshot.track_colors is not layer.track_colors
+    assert np.array_equal(snapshot.track_colors, layer.track_colors)
+
+    rendered = []
+    gallery.renderer.rendered.connect(lambda *args: rendered.append(args[1]))
+    gallery.resize(300, 300)
+    gallery.show()
+    qtbot.waitUntil(lambda: len(model.cache) > 0)
+    qtbot.wait(200)
+    # only the tiles in view were drawn
+    assert 0 < len(rendered) < model.rowCount() / 4
+    assert len(model.cache) == len(rendered)
+
+    # the least recently shown thumbnails are evicted
+    model.cache_size = 2
+    image = np.zeros((4, 3, 4), dtype=np.uint8)
+    for root in model.roots[-3:]:
+        model.on_rendered(gallery.renderer.generation, int(root), image)
+    assert list(model.cache) == model.roots[-2:].tolist()
+
+    index = model.index(3)
+    with qtbot.waitSignal(gallery.lineage_selected):
+        gallery.view.clicked.emit(index)
+    assert arboretum.tracks is layer
+    assert arboretum.track_id == model.roots[3]
+    gallery.renderer.stop()
+
+
+def test_renderer_stopped_when_deleted(qtbot):
+    """Test that the background thread stops when the renderer is deleted,
+    e.g. with a gallery whose dock widget was removed."""
+    renderer = ThumbnailRenderer()
+    thread = renderer._thread
+    del renderer
+    thread.join(timeout=5)
+    assert not thread.is_alive()
@@ -23,6 +23,12 @@ def test_linearize_graph():
     assert linear == TEST_GRAPH_LINEAR
 
 
+def test_linearize_graph_cycle():
+    """Test that linearizing a graph with a cycle visits each node once."""
+    linear = graph.linearise_tree({0: [1], 1: [2], 2: [0, 3]}, 0)
+    assert linear == [0, 1, 2, 3]
+
+
 def test_build_subgraph():
     """Test building the subgraph using a `napari.layers.Tracks` layer as input."""
     data = np.random.random(size=(max(TEST_GRAPH_LINEAR) + 1, 4))
@@ -47,6 +53,27 @@ def test_get_root():
     assert root_id == TEST_GRAPH_ROOT
 
 
+def test_layer_index_cached(monkeypatch):
+    """Test that the graph index of a layer is built once, and rebuilt when
+    its graph changes."""
+    data = np.zeros((max(TEST_GRAPH_LINEAR) + 1, 4))
+    data[:, 0] = data[:, 1] = np.arange(data.shape[0])
+    tracks = Tracks(data, graph=TEST_GRAPH)
+    builds = []
+    build = graph.build_graph_index
+    monkeypatch.setattr(
+        graph, "build_graph_index", lambda *args: builds.append(1) or build(*args)
+    )
+
+    assert graph.get_root_id(tracks, 6) == TEST_GRAPH_ROOT
+    assert len(graph.build_subgraph(tracks, 3)) == len(TEST_GRAPH_LINEAR)
+    assert len(builds) == 1
+    # 6 is its own root once its link is removed
+    tracks.graph = {1: [0], 2: [0]}
+    assert graph.get_root_id(tracks, 6) != TEST_GRAPH_ROOT
+    assert builds == [1, 1]
+
+
 def test_node_is_root():
     """Test the `TreeNode` class."""
     node = graph.TreeNode(generation=1, ID=1, t=(1, 2))
@@ -74,3 +101,79 @@ def test_add_child():
 
     assert child.is_leaf
     assert_allclose(child.t, (2, 4))
+
+
+def test_graph_index():
+    """Test the graph index against the layer-based functions."""
+    data = np.random.random(size=(2 * (max(TEST_GRAPH_LINEAR) + 1), 4))
+    data[:, 0] = np.tile(np.arange(data.shape[0] // 2), 2)
+    data[:, 1] = np.arange(data.shape[0])
+
+    index = graph.build_graph_index(data, TEST_GRAPH)
+    assert index.roots == [TEST_GRAPH_ROOT]
+    assert index.root_id(6) == TEST_GRAPH_ROOT
+    assert_allclose(index.times(3), [3, 10])
+
+    subgraph = [node.ID for node in index.subgraph(TEST_GRAPH_ROOT)]
+    assert subgraph == TEST_GRAPH_LINEAR
+
+    rows = index.rows_of([5, 1, 100])
+    assert_allclose(np.sort(data[rows, 0]), [1, 1, 5, 5])
+    assert index.rows_of([]).size == 0
+
+
+def test_window_subgraphs():
+    """Test building the part of a lineage inside a time window."""
+    data = np.random.random(size=(2 * (max(TEST_GRAPH_LINEAR) + 1), 4))
+    data[:, 0] = np.repeat(np.arange(data.shape[0] // 2), 2)
+    # each generation starts where the previous one ends
+    generation = np.array([0, 1, 1, 2, 2, 2, 2])
+    data[:, 1] = np.repeat(generation * 10, 2) + np.tile([0, 10], 7)
+
+    index = graph.build_graph_index(data, TEST_GRAPH)
+    assert_allclose(index.t_start, generation * 10)
+    assert_allclose(index.t_end, index.t_start + 10)
+    assert_allclose(np.sort(index.time_index.overlapping(12, 15)), [1, 2])
+    assert_allclose(np.sort(index.time_index.overlapping(10, 10)), [0, 1, 2])
+
+    trees = index.window_subgraphs(TEST_GRAPH_ROOT, 12, 25)
+    assert [[node.ID for node in nodes] for nodes in trees] == [[1, 3, 4], [2, 5, 6]]
+    assert all(nodes[0].is_root for nodes in trees)
+    # times are clipped to the window
+    assert_allclose(trees[0][0].t, (12, 20))
+    assert_allclose(trees[0][1].t, (20, 25))
+    assert index.window_subgraphs(TEST_GRAPH_ROOT, 50, 60) == []
+
+
+def test_validate_graph():
+    """Test finding the links of a graph that can not be drawn as trees."""
+    # (ID, start, end) of each track
+    tracks = [(1, 0, 5), (2, 6, 9), (3, 0, 3), (4, 4, 6), (5, 0, 2), (6, 3, 5)]
+    tracks += [(7, 2, 4), (8, 7, 9)]
+    data = np.array([(i, t, 0, 0) for i, a, b in tracks for t in range(a, b + 1)])
+    # 3 and 4 are each other's parent, 5 is its own parent, 6 has a parent
+    # with no data, 7 starts before its parent ends and 8 descends from a cycle
+    bad_graph = {2: [1], 3: [4], 4: [3], 5: [5], 6: [99], 7: [1], 8: [4]}
+
+    problems = graph.build_graph_index(data, bad_graph).problems
+    assert problems
+    assert_allclose(problems.self_links, [5])
+    assert_allclose(problems.dangling, [99])
+    assert_allclose(problems.cycles, [3, 4])
+    assert_allclose(problems.time_inconsistent, [3, 7])
+    assert "2 cycles: 3, 4" in str(problems)
+
+    problems = graph.build_graph_index(data, {2: [1], 8: [6]}).problems
+    assert not problems
+
+
+def test_validate_graph_between_cycles():
+    """Test that tracks between two cycles are not reported as on a cycle."""
+    # 20 descends from the cycle of 10 and 11, and is a parent of the cycle of
+    # 12 and 13
+    edges = graph.edges_from_graph(
+        {10: [11], 11: [10], 20: [11], 12: [13, 20], 13: [12]}
+    )
+    no_tracks = np.array([], dtype=np.int64)
+    problems = graph.validate_graph(no_tracks, no_tracks, no_tracks, edges)
+    assert_allclose(problems.cycles, [10, 11, 12, 13])
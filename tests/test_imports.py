@@ -0,0 +1,48 @@
+import subprocess
+import sys
+
+import pytest
+
+# modules that should only be imported when they are first needed
+LAZY_MODULES = ["matplotlib", "napari_matplotlib", "pandas", "pooch"]
+
+
+def _imported_modules(statement: str) -> set[str]:
+    code = f"import sys; {statement}; print(' '.join(sys.modules))"
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return set(result.stdout.split())
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [
+        "import napari_arboretum._hookimpls",
+        "import napari_arboretum.cli",
+    ],
+)
+def test_lazy_imports(statement):
+    """Check that heavy optional backends are not imported eagerly."""
+    modules = _imported_modules(statement)
+    assert not modules.intersection(LAZY_MODULES)
+
+
+def test_no_napari_in_cli():
+    """The command line tools run without napari, Qt or VisPy."""
+    modules = _imported_modules("import napari_arboretum.cli")
+    assert not modules.intersection(["napari", "qtpy", "vispy"])
+
+
+def test_plugin_discovery_imports():
+    """Modules only needed once the widget is used are not imported when
+    napari discovers the plugin."""
+    modules = _imported_modules("import napari_arboretum._hookimpls")
+    assert not modules.intersection(
+        [
+            "superqt",
+            "napari_arboretum.diff",
+            "napari_arboretum.query",
+            "napari_arboretum.registry",
+        ]
+    )
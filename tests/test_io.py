@@ -0,0 +1,171 @@
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from napari_arboretum.graph import build_graph_index
+from napari_arboretum.io import cache, layout_cache, lineage_store, npy
+from napari_arboretum.tree import layout_tree
+
+TEST_GRAPH = {1: [0], 2: [0], 3: [1, 2]}
+
+
+def test_tracks_dir_roundtrip(tmp_path):
+    """Test writing and memory-mapping a tracks directory."""
+    data = np.random.random(size=(8, 4))
+    data[:, 0] = np.repeat(np.arange(4), 2)
+    properties = {"area": np.arange(8.0), "state": np.array(["a"] * 8, dtype=object)}
+
+    path = tmp_path / "experiment"
+    npy.write_tracks(path, data, properties, TEST_GRAPH)
+    assert npy.is_tracks_dir(path)
+
+    new_data, new_properties, new_graph = npy.read_tracks(path)
+    assert isinstance(new_data, np.memmap)
+    assert_array_equal(new_data, data)
+    assert_array_equal(new_properties["area"], properties["area"])
+    assert_array_equal(new_properties["state"], properties["state"])
+    assert new_graph == TEST_GRAPH
+
+
+def test_tracks_dir_graph_keys(tmp_path):
+    """Test that graph keys with no parents are kept in a tracks directory."""
+    data = np.zeros((3, 4))
+    data[:, 0] = np.arange(3)
+    graph = {1: [0], 2: []}
+
+    npy.write_tracks(tmp_path, data, graph=graph)
+    assert npy.read_tracks(tmp_path)[2] == graph
+
+
+def test_napari_reader(tmp_path):
+    """Test the napari reader only accepts tracks directories."""
+    path = tmp_path / "experiment"
+    npy.write_tracks(path, np.zeros((1, 4)))
+    assert npy.napari_get_reader(str(tmp_path)) is None
+
+    reader = npy.napari_get_reader(str(path))
+    [(_, kwargs, layer_type)] = reader(str(path))
+    assert layer_type == "tracks"
+    assert kwargs["name"] == "experiment"
+
+
+def test_lineage_store(tmp_path):
+    """Test that lineages are read back from a lineage store one at a time."""
+    graph = {1: [0], 2: [0], 4: [3]}
+    data = np.random.random(size=(10, 4))
+    data[:, 0] = [0, 3, 1, 4, 2, 0, 3, 1, 4, 2]
+    data[:, 1] = np.arange(10)
+
+    path = tmp_path / "store"
+    lineage_store.write_lineage_store(path, data, {"row": np.arange(10)}, graph)
+    store = lineage_store.LineageStore(path)
+
+    assert_array_equal(store.roots, [0, 3])
+    assert store.root_id(2) == 0
+    assert isinstance(store.edges, np.memmap)
+
+    lineage_data, lineage_properties, lineage_graph = store.lineage(3)
+    assert_array_equal(lineage_data, data[[1, 6, 3, 8]])
+    assert_array_equal(lineage_properties["row"], [1, 6, 3, 8])
+    assert lineage_graph == {4: [3]}
+
+    nodes = store.build_subgraph(2)
+    assert [n.ID for n in nodes] == [0, 1, 2]
+
+
+def test_lineage_store_merges(tmp_path):
+    """Test that trees keep the tracks of other lineages reached by merges."""
+    # track 4 merges track 1, from lineage 0, and track 3, from lineage 2
+    graph = {1: [0], 3: [2], 4: [1, 3], 5: [4]}
+    data = np.zeros((12, 4))
+    data[:, 0] = np.repeat([5, 4, 3, 2, 1, 0], 2)
+    data[:, 1] = np.tile([0, 1], 6)
+
+    path = tmp_path / "store"
+    lineage_store.write_lineage_store(path, data, graph=graph)
+    store = lineage_store.LineageStore(path)
+
+    index = build_graph_index(data, graph)
+    for root in index.roots:
+        expected = {n.ID: n for n in index.subgraph(root)}
+        nodes = {n.ID: n for n in store.build_subgraph(root)}
+        assert nodes.keys() == expected.keys()
+        for track_id, node in nodes.items():
+            assert_array_equal(node.t, expected[track_id].t)
+            assert node.generation == expected[track_id].generation
+            assert sorted(node.children) == sorted(expected[track_id].children)
+
+
+def test_parsed_data_cache(tmp_path):
+    """Test that parsed tracks are cached, and re-parsed when the files change."""
+    tracks_file = tmp_path / "tracks.csv"
+    tracks_file.write_text("ID,t,y,x\n0,0,1.0,2.0\n0,1,1.5,2.5\n")
+    cache_dir = tmp_path / "cache"
+
+    data, _, graph = cache.load_tracks_cached(tracks_file, cache_dir=cache_dir)
+    assert isinstance(data, np.memmap)
+    assert_array_equal(data, [[0, 0, 1.0, 2.0], [0, 1, 1.5, 2.5]])
+    assert graph == {}
+
+    def not_called():
+        raise AssertionError("Cached files should not be parsed again.")
+
+    hashes = [cache.pooch.file_hash(str(tracks_file)), "none", "none"]
+    cached, _, _ = cache.load_tracks_cached(
+        not_called, hashes=hashes, cache_dir=cache_dir
+    )
+    assert_array_equal(cached, data)
+
+    tracks_file.write_text("ID,t,y,x\n1,0,1.0,2.0\n")
+    data, _, _ = cache.load_tracks_cached(tracks_file, cache_dir=cache_dir)
+    assert_array_equal(data, [[1, 0, 1.0, 2.0]])
+    assert len(list(cache_dir.iterdir())) == 2  # noqa: PLR2004
+
+
+def test_layout_cache(tmp_path):
+    """Test that graph indexes and layouts are read back from the layout cache,
+    and that the least recently used entries are evicted."""
+    data = np.random.random(size=(8, 4))
+    data[:, 0] = np.repeat(np.arange(4), 2)
+    data[:, 1] = np.arange(8)
+    cache_dir = tmp_path / "layouts"
+
+    layouts = layout_cache.LayoutCache(data, TEST_GRAPH, cache_dir=cache_dir)
+    nodes = layouts.graph_index.subgraph(0)
+    edges, annotations = layouts.layout(nodes, layout="tree")
+
+    cached = layout_cache.LayoutCache(data, TEST_GRAPH, cache_dir=cache_dir)
+    index = build_graph_index(data, TEST_GRAPH)
+    assert isinstance(cached.graph_index.order, np.memmap)
+    assert cached.graph_index.roots == index.roots
+    assert_array_equal(cached.graph_index.track_roots, index.track_roots)
+
+    cached_edges, cached_annotations = cached.layout(nodes, layout="tree")
+    assert [(e.x, e.y, e.track_id) for e in cached_edges] == [
+        (e.x, e.y, e.track_id) for e in layout_tree(nodes)[0]
+    ]
+    assert [e.node for e in cached_edges] == [e.node for e in edges]
+    assert [(a.x, a.y, a.label) for a in cached_annotations] == [
+        (a.x, a.y, a.label) for a in annotations
+    ]
+
+    assert not cached.graph_index.problems
+
+    # a second dataset does not fit in the cache with the first one
+    data[:, 2] = 0
+    other = layout_cache.LayoutCache(data, TEST_GRAPH, cache_dir=cache_dir)
+    assert layout_cache.evict(cache_dir, max_size=1, keep=other.key) == [cached.path]
+    assert [p.name for p in cache_dir.iterdir()] == [other.key]
+
+
+def test_layout_cache_problems(tmp_path):
+    """Test that the problems found in a graph are read back from the cache."""
+    data = np.zeros((8, 4))
+    data[:, 0] = np.repeat(np.arange(4), 2)
+    # 1 and 2 are each other's parent, and 3 is its own parent
+    graph = {1: [2], 2: [1], 3: [3]}
+
+    layout_cache.LayoutCache(data, graph, cache_dir=tmp_path)
+    cached = layout_cache.LayoutCache(data, graph, cache_dir=tmp_path)
+    problems = cached.graph_index.problems
+    assert_array_equal(problems.cycles, [1, 2])
+    assert_array_equal(problems.self_links, [3])
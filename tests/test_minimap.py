@@ -0,0 +1,43 @@
+import numpy as np
+from napari.layers import Tracks
+from numpy.testing import assert_allclose
+
+from napari_arboretum.graph import TreeNode
+from napari_arboretum.sample.synthetic import make_binary_tree
+from napari_arboretum.tree import Edge
+from napari_arboretum.visualisation.minimap import edge_density
+from napari_arboretum.visualisation.vispy_plotter import VisPyPlotter
+
+
+def test_edge_density():
+    node = TreeNode(ID=0, t=(0, 1), generation=1)
+    edges = [
+        Edge(x=(0, 10), y=(0, 0), track_id=1, node=node),
+        Edge(x=(0, 10), y=(2, 2), track_id=2, node=node),
+        Edge(x=(10, 10), y=(0, 2)),
+    ]
+    density = edge_density(edges, shape=(11, 3))
+    assert density.image.shape == (11, 3)
+    assert density.image.max() == 1
+    assert_allclose(density.origin, [0, 0])
+    assert_allclose(density.pixel_size, [1, 1])
+
+    # the branches fill their columns, and the link crosses the last row
+    assert np.all(density.image[:, [0, 2]] > 0)
+    assert np.all(density.image[:-1, 1] == 0)
+    assert np.argmax(density.image.ravel()) == density.image.size - 3
+
+
+def test_minimap_viewport(qtbot):
+    """Check that the minimap shows the part of the tree in the main view."""
+    plotter = VisPyPlotter()
+    qtbot.addWidget(plotter.get_qwidget())
+    data, properties, graph = make_binary_tree(4)
+    plotter.tracks = Tracks(data, properties=properties, graph=graph)
+    plotter.track_id = 0
+    assert plotter.minimap.visible
+
+    plotter.view.camera.zoom(0.5)
+    rect = plotter.view.camera.rect
+    corners = [rect.pos, np.add(rect.pos, rect.size)]
+    assert_allclose(plotter._viewport.pos[[0, 2]], corners)
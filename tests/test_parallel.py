@@ -0,0 +1,42 @@
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from napari_arboretum import parallel
+from napari_arboretum.graph import build_graph_index
+from napari_arboretum.tree import LAYOUTS, layout_to_arrays
+
+# three lineages, where track 5 is a merge of tracks 3 and 4
+TEST_GRAPH = {1: [0], 2: [0], 3: [1], 4: [1], 5: [3, 4], 7: [6], 9: [8], 10: [8]}
+TEST_N_TRACKS = 11
+
+
+def _index():
+    ids = np.repeat(np.arange(TEST_N_TRACKS), 2)
+    data = np.column_stack([ids, np.arange(ids.size), np.zeros((ids.size, 2))])
+    return build_graph_index(data, TEST_GRAPH)
+
+
+def test_shared_graph_index():
+    """Test that a graph index in shared memory builds the same lineages."""
+    index = _index()
+    with parallel.share_graph_index(index) as specs:
+        shared = parallel.attach_graph_index(specs)
+        for root in index.roots:
+            expected = [(n.ID, n.children, n.t.tolist()) for n in index.subgraph(root)]
+            nodes = [(n.ID, n.children, n.t.tolist()) for n in shared.subgraph(root)]
+            assert nodes == expected
+
+
+def test_layout_forest_parallel():
+    """Test that lineages laid out by worker processes match a serial layout."""
+    index = _index()
+    serial = parallel.layout_forest_parallel(index, workers=1)
+    layout = parallel.layout_forest_parallel(index, workers=2, chunksize=1)
+
+    assert_array_equal(layout.roots, index.roots)
+    assert_array_equal(layout.edges, serial.edges)
+    assert_array_equal(layout.labels, serial.labels)
+    for root in index.roots:
+        edges, labels = layout_to_arrays(*LAYOUTS["auto"](index.subgraph(root)))
+        assert_array_equal(layout.lineage(root)[0], edges)
+        assert_array_equal(layout.lineage(root)[1], labels)
@@ -1,8 +1,13 @@
 import numpy as np
 import pytest
+from napari.layers import Tracks
+from numpy.testing import assert_array_equal
 
+from napari_arboretum.graph import build_graph_index
 from napari_arboretum.plugin import Arboretum
 from napari_arboretum.sample.sample_data import load_sample_data
+from napari_arboretum.sample.synthetic import make_binary_tree
+from napari_arboretum.visualisation.base_plotter import HIGHLIGHT_COLOR
 
 
 @pytest.fixture
@@ -76,3 +81,153 @@ def test_colorby_change(viewer_plugin):
     new_color = tree.get_branch_color(branch_id=track_id)
     # Slice to remove alpha, which is 1 both before and after
     assert np.all(new_color[:, :3] != old_color[:, :3])
+
+
+def test_pick_branch(viewer_plugin):
+    """
+    Check that clicking on a branch of the tree selects the track and time.
+    """
+    viewer, plugin = viewer_plugin
+    plugin.track_id = 140
+    plotter = plugin.plotter
+
+    index = plotter.branch_index
+    assert len(index)
+    i = len(index) - 1
+    t = (index.t_start[i] + index.t_end[i]) / 2
+    canvas_pos = plotter.view.scene.transform.map([index.y[i], t])[:2]
+    layer, track_id, time = plotter.pick(canvas_pos)
+    assert layer is plugin.tracks
+    assert track_id == index.track_ids[i]
+
+    plugin.on_branch_picked(layer, track_id, time)
+    assert plugin.track_id == track_id
+    assert viewer.dims.current_step[0] == time
+
+
+def test_show_lineages(viewer_plugin):
+    """
+    Check that several lineage trees can be drawn side by side, and that the
+    branches of each tree are coloured from its own layer.
+    """
+    viewer, plugin = viewer_plugin
+    tracks = viewer.layers[0]
+    lineages = [(tracks, 140), (tracks, 1)]
+    plugin.show_lineages(lineages)
+    assert {e.tree for e in plugin.plotter.edges} == {0, 1}
+    assert plugin.track_id == 1
+    assert plugin.title.text().startswith("Lineage Trees")
+
+    # selecting a track in a drawn tree keeps both trees
+    plugin.track_id = 140
+    assert len(plugin.lineages) == len(lineages)
+
+
+def test_highlight_changes(viewer_plugin):
+    """
+    Check that branches that differ from another tracking run are highlighted.
+    """
+    viewer, plugin = viewer_plugin
+    tracks = viewer.layers[0]
+    track_id = 140
+    plugin.track_id = track_id
+
+    # a copy of the tracks, without the last frame of the track
+    rows = tracks.data[:, 0] == track_id
+    last = rows & (tracks.data[:, 1] == tracks.data[rows, 1].max())
+    reference = Tracks(tracks.data[~last], graph=tracks.graph)
+    diff = plugin.highlight_changes(reference, time_tolerance=1)
+    assert diff.changed == [(track_id, track_id)]
+
+    tree = plugin.plotter.tree
+    assert_array_equal(tree.get_branch_color(branch_id=track_id), HIGHLIGHT_COLOR)
+
+
+def test_lineage_search(viewer_plugin):
+    """
+    Check that the search box steps through the lineages that match a query.
+    """
+    _, plugin = viewer_plugin
+    plugin.search.query.setText("n_tracks > 1")
+    plugin.search.search()
+
+    roots = plugin.lineage_table().select("n_tracks > 1")
+    assert plugin.search.status.text() == f"1 / {roots.size}"
+    assert plugin.track_id == roots[0]
+    plugin.search.step(1)
+    assert plugin.track_id == roots[1 % roots.size]
+
+
+def test_lineage_layer(viewer_plugin):
+    """
+    Check that the drawn lineage can be shown on its own, in a layer that is
+    updated in place when another lineage is drawn.
+    """
+    viewer, plugin = viewer_plugin
+    tracks = viewer.layers[0]
+    plugin.track_id = 140
+    plugin.lineage_view_checkbox.setChecked(True)
+
+    layer = viewer.layers[-1]
+    assert not tracks.visible
+    drawn = plugin.plotter.drawn_track_ids(tracks)
+    assert_array_equal(np.unique(layer.data[:, 0]), drawn)
+
+    plugin.track_id = 1
+    assert viewer.layers[-1] is layer
+    assert_array_equal(
+        np.unique(layer.data[:, 0]), plugin.plotter.drawn_track_ids(tracks)
+    )
+
+    plugin.lineage_view_checkbox.setChecked(False)
+    assert layer not in viewer.layers
+    assert tracks.visible
+
+
+def test_time_window(viewer_plugin):
+    """
+    Check that only the parts of the lineages inside the time window are drawn.
+    """
+    _, plugin = viewer_plugin
+    plugin.track_id = 140
+    t = plugin.graph_index().times(140)
+    window = (int(t.min()), int(t.min() + (t.max() - t.min()) // 2))
+    plugin.time_window_checkbox.setChecked(True)
+    plugin.time_window_slider.setValue(window)
+    assert plugin.plotter.time_window == window
+
+    times = np.concatenate([e.node.t for e in plugin.plotter.edges if e.node])
+    assert times.min() >= window[0]
+    assert times.max() <= window[1]
+
+    plugin.time_window_checkbox.setChecked(False)
+    assert plugin.plotter.time_window is None
+
+
+def test_graph_index_reused(make_napari_viewer, monkeypatch):
+    """
+    Check that selecting tracks and exporting reuse the graph index of the
+    layer, instead of building it again.
+    """
+    viewer = make_napari_viewer()
+    data, properties, graph = make_binary_tree(3)
+    tracks = viewer.add_tracks(data, properties=properties, graph=graph)
+    plugin = Arboretum(viewer)
+    plugin.tracks = tracks
+
+    calls = []
+
+    def build(data, graph):
+        calls.append(data)
+        return build_graph_index(data, graph)
+
+    monkeypatch.setattr("napari_arboretum.graph.build_graph_index", build)
+    monkeypatch.setattr("napari_arboretum.plugin.build_graph_index", build)
+    monkeypatch.setattr(
+        "napari_arboretum.plugin.QFileDialog.getSaveFileName",
+        lambda *args, **kwargs: ("", ""),
+    )
+    for track_id in (0, 3, 4):
+        plugin.track_id = track_id
+    plugin.export_tree()
+    assert len(calls) == 1
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+from napari_arboretum.graph import build_graph_index
+from napari_arboretum.query import QueryError, build_lineage_table
+from napari_arboretum.sample.synthetic import make_binary_tree, make_forest
+
+
+def test_lineage_attributes():
+    """Test the lineage attributes against the nodes of each lineage."""
+    data, _, graph = make_forest(10, 80, seed=0, p_divide=0.7, cycle_length_mean=10)
+    index = build_graph_index(data, graph)
+    table = build_lineage_table(data, graph, index=index)
+
+    assert_array_equal(table.roots, index.roots)
+    for i, root in enumerate(table.roots):
+        nodes = index.subgraph(int(root))
+        lineage = {k: v[i] for k, v in table.lineages.items()}
+        assert lineage["n_tracks"] == len(nodes)
+        assert lineage["depth"] == max(n.generation for n in nodes)
+        assert lineage["n_divisions"] == sum(len(n.children) > 1 for n in nodes)
+        assert lineage["n_leaves"] == sum(n.is_leaf for n in nodes)
+        assert lineage["min_length"] == min(n.t[-1] - n.t[0] for n in nodes)
+
+
+def test_merges():
+    """Test that merges are counted."""
+    data, _, graph = make_forest(10, 80, seed=0, p_merge=0.5, p_divide=0.5)
+    table = build_lineage_table(data, graph)
+    n_merges = sum(len(parents) > 1 for parents in graph.values())
+    assert n_merges
+    assert table.lineages["n_merges"].sum() == n_merges
+
+
+def test_select():
+    """Test queries of lineage and branch attributes."""
+    data, _, graph = make_binary_tree(4, cycle_length=3)
+    table = build_lineage_table(data, graph)
+
+    assert_array_equal(table.select("depth == 4"), [0])
+    assert table.select("depth > 4 or n_tracks != 15").size == 0
+    assert_array_equal(table.select("all(length == 2) and any(generation == 4)"), [0])
+    assert_array_equal(table.select("count(n_children == 2) == 7"), [0])
+    assert_array_equal(table.select("not 1 < depth < 4"), [0])
+
+
+@pytest.mark.parametrize(
+    "query",
+    ["depth >", "depth", "n_cells > 1", "any(depth > 1)", "depth.real > 1", "f(x)"],
+)
+def test_invalid_query(query):
+    """Test that invalid queries raise a QueryError."""
+    data, _, graph = make_binary_tree(3)
+    with pytest.raises(QueryError):
+        build_lineage_table(data, graph).select(query)
+
+
+def test_empty():
+    """Test a table without any tracks."""
+    table = build_lineage_table(np.zeros((0, 4)), {})
+    assert len(table) == 0
+    assert table.select("depth > 1").size == 0
@@ -0,0 +1,66 @@
+import struct
+import zlib
+
+import numpy as np
+from napari.layers import Tracks
+from numpy.testing import assert_array_equal
+
+from napari_arboretum.graph import TreeNode
+from napari_arboretum.io.png import encode_png
+from napari_arboretum.sample.synthetic import make_binary_tree
+from napari_arboretum.tree import Edge
+from napari_arboretum.visualisation.raster import MARGIN, rasterize
+from napari_arboretum.visualisation.raster_plotter import TIME_LINE_COLOR, RasterPlotter
+
+
+def _decode_png(png: bytes) -> np.ndarray:
+    """Decode an unfiltered RGBA PNG, as written by `encode_png`."""
+    width, height = struct.unpack(">II", png[16:24])
+    (length,) = struct.unpack(">I", png[33:37])
+    raw = zlib.decompress(png[41 : 41 + length])
+    rows = np.frombuffer(raw, dtype=np.uint8).reshape(height, -1)
+    assert not rows[:, 0].any()
+    return rows[:, 1:].reshape(height, width, 4)
+
+
+def test_rasterize():
+    """Test that edges are drawn with their colours interpolated."""
+    red, blue = [1.0, 0, 0, 1], [0, 0, 1.0, 1]
+    node = TreeNode(ID=1, t=[0, 10], generation=1)
+    edges = [
+        Edge(x=(0, 10), y=(0, 0), track_id=1, node=node, color=np.array([red, blue])),
+        Edge(x=(0, 10), y=(4, 4), color=np.array(blue)),
+        Edge(x=(10, 10), y=(0, 4)),
+    ]
+    shape = (11 + 2 * MARGIN, 5 + 2 * MARGIN)
+    raster = rasterize(edges, shape)
+    image = raster.image[MARGIN:-MARGIN, MARGIN:-MARGIN]
+    assert raster.image.shape == (*shape, 4)
+    assert raster.pixel(4, 10) == (10 + MARGIN, 4 + MARGIN)
+
+    # the branch fades from red to blue, the other one is blue
+    assert_array_equal(image[0, 0], [255, 0, 0, 255])
+    assert_array_equal(image[5, 0], [128, 0, 128, 255])
+    assert_array_equal(image[:-1, 4], [[0, 0, 255, 255]] * 10)
+    # the white link is drawn last, along the last row
+    assert_array_equal(image[-1], [[255] * 4] * 5)
+    assert not image[:-1, 1:4, :3].any()
+
+
+def test_raster_plotter(tmp_path):
+    """Test drawing a layer without OpenGL, and saving it as a PNG."""
+    data, properties, graph = make_binary_tree(4)
+    plotter = RasterPlotter((64, 32), line_width=2)
+    plotter.tracks = Tracks(data, properties=properties, graph=graph)
+    plotter.track_id = 0
+    assert plotter.image.shape == (64, 32, 4)
+    assert plotter.image[..., :3].any()
+
+    plotter.draw_current_time_line(0)
+    row, _ = plotter.raster.pixel(0, 0)
+    assert (plotter.image[row] == TIME_LINE_COLOR).all()
+
+    plotter.save(tmp_path / "tree.png")
+    png = (tmp_path / "tree.png").read_bytes()
+    assert png == encode_png(plotter.image)
+    assert_array_equal(_decode_png(png), plotter.image)
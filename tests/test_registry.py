@@ -0,0 +1,71 @@
+import gc
+
+import numpy as np
+from napari.layers import Tracks
+
+from napari_arboretum.graph import build_graph_index
+from napari_arboretum.registry import LayerRegistry, estimate_nbytes
+from napari_arboretum.sample.synthetic import make_forest
+
+
+def _layer(seed: int = 0) -> Tracks:
+    data, properties, graph = make_forest(5, 40, seed=seed)
+    return Tracks(data, properties=properties, graph=graph)
+
+
+def test_registry_rebuilds_on_new_data():
+    """Test that structures are built once, and rebuilt if the data or graph
+    changes."""
+    layer = _layer()
+    registry = LayerRegistry()
+    calls = []
+
+    def build():
+        calls.append(1)
+        return build_graph_index(layer.data, layer.graph)
+
+    index = registry.get(layer, "graph_index", build)
+    assert registry.get(layer, "graph_index", build) is index
+    assert len(calls) == 1
+    assert registry.nbytes == estimate_nbytes(index) > 0
+
+    layer.data = layer.data.copy()
+    assert (layer, "graph_index") not in registry
+    new_index = registry.get(layer, "graph_index", build)
+    assert new_index is not index
+    assert calls == [1, 1]
+    assert len(registry) == 1
+
+    layer.graph = {}
+    assert (layer, "graph_index") not in registry
+    assert registry.get(layer, "graph_index", build) is not new_index
+    assert calls == [1, 1, 1]
+
+    # structures of discarded layers are no longer updated by their events
+    registry.discard(layer)
+    layer.data = layer.data.copy()
+    assert len(registry) == 0
+
+
+def test_registry_eviction():
+    """Test that the least recently used structures are evicted under the
+    memory budget, and that structures are freed with their layer."""
+    layers = [_layer(seed) for seed in range(3)]
+    ones = np.ones(100)
+    # only two arrays fit in the budget
+    registry = LayerRegistry(max_bytes=2.5 * ones.nbytes)
+    registry.get(layers[0], "ones", ones.copy)
+    registry.get(layers[1], "ones", ones.copy)
+    registry.get(layers[0], "ones", lambda: None)
+    registry.get(layers[2], "ones", ones.copy)
+    assert (layers[1], "ones") not in registry
+    assert (layers[0], "ones") in registry
+    assert (layers[2], "ones") in registry
+    assert registry.nbytes == 2 * ones.nbytes
+
+    registry.discard(layers[2])
+    assert len(registry) == 1
+    del layers[0]
+    gc.collect()
+    assert len(registry) == 0
+    assert registry.nbytes == 0
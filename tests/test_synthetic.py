@@ -0,0 +1,55 @@
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from napari_arboretum.graph import build_graph_index
+from napari_arboretum.sample.synthetic import make_binary_tree, make_forest
+
+
+def test_binary_tree():
+    """Test that a perfect binary tree has the right number of nodes."""
+    max_depth = 5
+    data, properties, graph = make_binary_tree(max_depth)
+    index = build_graph_index(data, graph)
+
+    assert index.roots == [0]
+    nodes = index.subgraph(0)
+    assert len(nodes) == 2**max_depth - 1
+    assert max(n.generation for n in nodes) == max_depth
+    assert_array_equal(np.unique(properties["generation"]), np.arange(1, 6))
+
+
+def test_forest():
+    """Test the structure of a forest with merges and dropouts."""
+    n_roots, n_frames = 20, 80
+    data, properties, graph = make_forest(
+        n_roots, n_frames, p_merge=0.5, p_dropout=0.2, seed=0
+    )
+    index = build_graph_index(data, graph)
+
+    assert index.roots == list(range(n_roots))
+    assert data[:, 1].max() < n_frames
+    assert any(len(parents) > 1 for parents in graph.values())
+    for key in ("generation", "root", "area"):
+        assert properties[key].shape == (data.shape[0],)
+
+    # children start after their parents end
+    for child, parents in graph.items():
+        for parent in parents:
+            assert index.times(child).min() > index.times(parent).max()
+
+
+def test_forest_seed():
+    """Test that forests are reproducible."""
+    data1, _, graph1 = make_forest(5, 50, seed=1)
+    data2, _, graph2 = make_forest(5, 50, seed=1)
+    assert_array_equal(data1, data2)
+    assert graph1 == graph2
+
+
+def test_empty_forest():
+    """Test that a forest with no roots has no tracks."""
+    data, properties, graph = make_forest(0, 50, seed=0)
+    assert data.shape == (0, 4)
+    assert all(values.shape == (0,) for values in properties.values())
+    assert graph == {}
+    assert build_graph_index(data, graph).roots == []
@@ -0,0 +1,52 @@
+import threading
+
+from benchmarks.utils import NullPlotter
+from napari_arboretum import timing
+from napari_arboretum.graph import build_graph_index
+from napari_arboretum.sample.synthetic import make_binary_tree
+
+
+def _draw():
+    data, _, graph = make_binary_tree(3)
+    NullPlotter().draw_from_nodes(build_graph_index(data, graph).subgraph(0))
+
+
+def test_timing_disabled():
+    """Test that nothing is collected when timing is off."""
+    with timing.collect() as timings:
+        _draw()
+    assert timings == []
+
+
+def test_timing_stages():
+    """Test that each stage of drawing a tree is timed."""
+    timing.enable()
+    try:
+        with timing.collect() as timings, timing.timed("outer"):
+            _draw()
+    finally:
+        timing.disable()
+
+    paths = [t.path for t in timings]
+    assert paths == [
+        "outer/layout_tree",
+        "outer/add_branches",
+        "outer/draw_tree_visual",
+        "outer",
+    ]
+    assert all(t.elapsed >= 0 for t in timings)
+    assert "outer" not in timing.summary(timings)
+
+
+def test_timing_threads():
+    """Test that stages finished by other threads are not collected."""
+    thread = threading.Thread(target=_draw)
+    timing.enable()
+    try:
+        with timing.collect() as timings, timing.timed("outer"):
+            thread.start()
+            thread.join()
+    finally:
+        timing.disable()
+
+    assert [t.path for t in timings] == ["outer"]
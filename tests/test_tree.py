@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+
+from napari_arboretum.graph import TreeNode, build_graph_index
+from napari_arboretum.sample.synthetic import make_binary_tree
+from napari_arboretum.tree import (
+    TREE_GAP,
+    BranchIndex,
+    Edge,
+    has_merges,
+    layout_auto,
+    layout_dag,
+    layout_forest,
+    layout_tree,
+)
+
+
+def test_branch_index():
+    node = TreeNode(ID=0, t=(0, 1), generation=1)
+    edges = [
+        Edge(x=(0, 10), y=(2, 2), track_id=1, node=node),
+        Edge(x=(5, 10), y=(0, 0), track_id=2, node=node),
+        Edge(x=(10, 20), y=(1, 1), track_id=3, node=node),
+        # connecting edges, which are not branches
+        Edge(x=(10, 10), y=(0, 2)),
+    ]
+    branches = edges[:-1]
+    index = BranchIndex(edges)
+    assert len(index) == len(branches)
+    assert index.track_ids[index.query(1.9, 5, tolerance=0.5)] == branches[0].track_id
+    # closest branch that spans the query time
+    assert index.track_ids[index.query(0.6, 7, tolerance=1)] == branches[1].track_id
+    assert index.track_ids[index.query(0.6, 15, tolerance=1)] == branches[2].track_id
+    assert index.query(1.5, 15, tolerance=0.1) is None
+    assert index.query(0, 30, tolerance=5) is None
+    assert BranchIndex([]).query(0, 0, tolerance=1) is None
+
+
+def test_layout_forest():
+    data, _, graph = make_binary_tree(3)
+    nodes = build_graph_index(data, graph).subgraph(0)
+    single_edges, _ = layout_tree(nodes)
+    edges, _ = layout_forest([nodes, nodes])
+
+    # the first tree is laid out as a single tree, the second one to its right
+    assert len(edges) == 2 * len(single_edges)
+    first = [e for e in edges if e.tree == 0]
+    second = [e for e in edges if e.tree == 1]
+    assert [e.y for e in first] == [e.y for e in single_edges]
+    assert min(min(e.y) for e in second) == max(max(e.y) for e in first) + TREE_GAP
+    assert not np.array_equal(second[-1].color, first[-1].color)
+
+    # trees from the same lineage share its tint
+    edges, annotations = layout_forest([nodes, nodes], tints=[0, 0])
+    assert all(np.array_equal(a.color, annotations[0].color) for a in annotations)
+    edges, _ = layout_forest([nodes, nodes, nodes], tints=[0, 1, 0])
+    links = [
+        [e.color for e in edges if e.tree == i and e.track_id is None] for i in range(3)
+    ]
+    assert np.array_equal(links[0], links[2])
+    assert not np.array_equal(links[0], links[1])
+
+
+@pytest.fixture
+def multi_merge():
+    """The lineage of examples/show_multi_merge.py, which has two merges."""
+    graph = {2: [0], 1: [0], 3: [1], 4: [1], 5: [2], 6: [2], 7: [4, 6], 8: [3, 5]}
+    data = np.array([[i, t, 0, 0] for i in range(9) for t in (i, i + 1)], dtype=float)
+    return build_graph_index(data, graph).subgraph(0)
+
+
+def test_layout_dag(multi_merge):
+    nodes = multi_merge
+    assert has_merges(nodes)
+    edges, annotations = layout_dag(nodes)
+
+    branches = {e.track_id: e for e in edges if e.node is not None}
+    links = [e for e in edges if e.node is None]
+    assert sorted(branches) == list(range(9))
+    assert len(links) == sum(len(n.children) for n in nodes)
+    assert len(annotations) == len(nodes)
+
+    # merged tracks are placed between their parents
+    for merge, parents in ((7, (4, 6)), (8, (3, 5))):
+        parent_y = [branches[p].y[0] for p in parents]
+        assert branches[merge].y[0] == pytest.approx(np.mean(parent_y))
+
+    # tracks that are drawn at the same time do not overlap
+    for t in range(10):
+        ys = [e.y[0] for e in branches.values() if e.x[0] <= t <= e.x[1]]
+        assert len(ys) == len(set(ys))
+
+
+def test_layout_dag_ladder():
+    """Test a ladder of merges, where each merge descends from the last."""
+    n_rungs = 20
+    graph = {}
+    for rung in range(n_rungs):
+        top, left, right = 3 * rung, 3 * rung + 1, 3 * rung + 2
+        graph[left] = graph[right] = [top]
+        graph[top + 3] = [left, right]
+    data = np.array(
+        [[i, t, 0, 0] for i in range(3 * n_rungs + 1) for t in (i, i + 1)],
+        dtype=float,
+    )
+    nodes = build_graph_index(data, graph).subgraph(0)
+    branches = {e.track_id: e for e in layout_dag(nodes)[0] if e.node is not None}
+
+    for merge, parents in graph.items():
+        if len(parents) > 1:
+            parent_y = [branches[p].y[0] for p in parents]
+            assert branches[merge].y[0] == pytest.approx(np.mean(parent_y))
+
+
+def test_layout_auto(multi_merge):
+    data, _, graph = make_binary_tree(3)
+    tree = build_graph_index(data, graph).subgraph(0)
+    assert not has_merges(tree)
+
+    def positions(layout):
+        return [(e.x, e.y) for e in layout[0]]
+
+    assert positions(layout_auto(tree)) == positions(layout_tree(tree))
+    assert positions(layout_auto(multi_merge)) == positions(layout_dag(multi_merge))
@@ -0,0 +1,192 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from napari.layers import Tracks
+from numpy.testing import assert_allclose, assert_array_equal
+
+from napari_arboretum.sample.synthetic import make_forest
+from napari_arboretum.visualisation.vispy_plotter import (
+    TrackSubvisualProxy,
+    VisPyPlotter,
+    color_run_vertices,
+    pack_colors,
+    to_uint8,
+)
+
+# exit code of the render script when no OpenGL context can be created
+NO_CONTEXT_EXIT = 77
+# draws a red and a green line with BranchLinesVisual in an offscreen EGL
+# canvas, and prints the colours at their centres
+RENDER_LINES = f"""
+import sys
+
+import numpy as np
+from vispy import app, scene
+from vispy.scene.visuals import create_visual_node
+
+try:
+    app.use_app("egl")
+    canvas = scene.SceneCanvas(size=(64, 64), bgcolor="black", show=False)
+except Exception:
+    sys.exit({NO_CONTEXT_EXIT})
+
+from napari_arboretum.visualisation.vispy_plotter import BranchLinesVisual
+
+view = canvas.central_widget.add_view()
+view.camera = scene.PanZoomCamera(rect=(0, 0, 4, 4))
+lines = create_visual_node(BranchLinesVisual)(width=8, parent=view.scene)
+pos, color, connect = lines.allocate(4)
+pos[:] = [[0, 1], [4, 1], [0, 3], [4, 3]]
+color[:] = [[255, 0, 0, 255]] * 2 + [[0, 200, 100, 255]] * 2
+connect[:] = [True, False, True, False]
+lines.upload()
+image = canvas.render(alpha=False)
+print(*image[48, 32], *image[16, 32])
+"""
+
+
+def test_color_run_vertices():
+    """Test that runs of vertices of nearly the same colour are merged."""
+    color = np.zeros((10, 4))
+    color[:, 3] = 1
+    # a small change within the tolerance, and a step at the sixth vertex
+    color[2, 0] = 1e-4
+    color[5:, 1] = 0.5
+    assert_array_equal(color_run_vertices(color), [0, 4, 5, 9])
+    assert_array_equal(color_run_vertices(color, tolerance=1e-5), [0, 1, 2, 3, 4, 5, 9])
+    assert_array_equal(color_run_vertices(color[:1]), [0])
+    assert_array_equal(color_run_vertices(color[:0]), [])
+    # the ends of several lines are kept
+    assert_array_equal(color_run_vertices(color, breaks=[2]), [0, 1, 2, 4, 5, 9])
+
+    # the colours drawn between the kept vertices are within the tolerance
+    tolerance = 0.1
+    ramp = np.linspace(0, 1, 1000)[:, None].repeat(4, axis=1)
+    keep = color_run_vertices(ramp, tolerance=tolerance)
+    # at most two vertices for each run of colours within the tolerance
+    assert keep.size <= 2 * (1 / tolerance + 1)
+    drawn = np.interp(np.arange(1000), keep, ramp[keep, 0])
+    assert np.abs(drawn - ramp[:, 0]).max() <= tolerance
+
+
+def test_track_subvisual_proxy_color():
+    """Test that every branch gets its own white default colour."""
+    pos = np.zeros((3, 2))
+    first, second = TrackSubvisualProxy(pos), TrackSubvisualProxy(pos)
+    assert first.color is not second.color
+    assert_array_equal(first.safe_color, np.ones((3, 4)))
+
+
+def test_branch_vertices(qtbot):
+    """Test that a branch of a single colour is drawn with two vertices."""
+    plotter = VisPyPlotter()
+    qtbot.addWidget(plotter.get_qwidget())
+    data, properties, graph = make_forest(1, 60, seed=0, cycle_length_mean=20)
+    layer = Tracks(data, properties=properties, graph=graph, color_by="track_id")
+    plotter.tracks = layer
+    plotter.track_id = int(data[0, 0])
+
+    line = plotter.tree._subvisuals[0]
+    n_edges = len(plotter.edges)
+    assert len(line.pos) == 2 * n_edges
+    assert line.connect.sum() == n_edges
+
+    # colours that change along each branch need more vertices
+    layer.properties = {
+        **layer.properties,
+        "intensity": np.random.default_rng(0).random(len(data)),
+    }
+    layer.color_by = "intensity"
+    plotter.update_edge_colors()
+    assert len(line.pos) > 2 * n_edges
+    assert len(line.pos) == len(line.color) == len(line.connect)
+
+
+def test_pack_colors():
+    """Test that colours unpacked as in the vertex shader are exact."""
+    color = np.random.default_rng(0).integers(0, 256, (1000, 4), dtype=np.uint8)
+    color[:2] = [[0, 0, 0, 0], [255, 255, 255, 255]]
+    packed = pack_colors(color)
+    assert packed.dtype == np.float32
+    high = np.floor(packed / 256)
+    low = packed - 256 * high
+    assert_array_equal(
+        np.column_stack((low[:, 0], high[:, 0], low[:, 1], high[:, 1])), color
+    )
+
+
+def test_branch_lines_render():
+    """Test the colours drawn by the shader of BranchLinesVisual."""
+    env = {"EGL_PLATFORM": "surfaceless", "LIBGL_ALWAYS_SOFTWARE": "1", **os.environ}
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", RENDER_LINES],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=False,
+    )
+    if result.returncode == NO_CONTEXT_EXIT:
+        pytest.skip("no offscreen OpenGL context")
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["255", "0", "0", "0", "200", "100"]
+
+
+def test_time_window_colors(qtbot):
+    """Test that branches cut by the time window get the colours of their
+    time points, in compact vertex buffers."""
+    plotter = VisPyPlotter()
+    qtbot.addWidget(plotter.get_qwidget())
+    data, properties, graph = make_forest(1, 60, seed=0, cycle_length_mean=20)
+    plotter.time_window = (10, 30)
+    plotter.tracks = Tracks(data, properties=properties, graph=graph)
+    plotter.track_id = int(data[0, 0])
+
+    branches = plotter.tree.tracks.values()
+    assert all(len(b.color) == len(b.pos) for b in branches)
+    line = plotter.tree._subvisuals[0]
+    assert line.pos.dtype == np.float32
+    assert line.color.dtype == np.uint8
+    assert line.connect.dtype == bool
+    # every branch starts with the colour of its first time point
+    starts = np.flatnonzero(np.append(True, ~line.connect[:-1]))
+    first_colors = [to_uint8(b.color[0]) for b in branches]
+    assert {tuple(c) for c in line.color[starts]} >= {tuple(c) for c in first_colors}
+
+
+def test_time_window_tints(qtbot):
+    """Test that the pieces of a lineage cut by the time window share a tint."""
+    plotter = VisPyPlotter()
+    qtbot.addWidget(plotter.get_qwidget())
+    data, properties, graph = make_forest(1, 60, seed=0, cycle_length_mean=20)
+    plotter.time_window = (25, 45)
+    plotter.tracks = Tracks(data, properties=properties, graph=graph)
+    plotter.track_id = int(data[0, 0])
+
+    assert len({e.tree for e in plotter.edges}) > 1
+    colors = [a.color for a in plotter.annotations]
+    colors += [e.color for e in plotter.edges if e.track_id is None]
+    assert all(np.array_equal(c, colors[0]) for c in colors)
+
+
+def test_time_window_dropouts(qtbot):
+    """Test colouring branches cut by the time window when tracks have gaps,
+    so that the window edges fall between time points."""
+    plotter = VisPyPlotter()
+    qtbot.addWidget(plotter.get_qwidget())
+    data, properties, graph = make_forest(3, 60, seed=0, p_dropout=0.3)
+    layer = Tracks(data, properties=properties, graph=graph)
+    plotter.time_window = (10, 30)
+    plotter.tracks = layer
+    plotter.track_id = int(data[0, 0])
+
+    for (_, track_id), branch in plotter.tree.tracks.items():
+        assert len(branch.color) == len(branch.pos)
+        # vertices at time points of the track get the colour of that point
+        rows = np.flatnonzero(data[:, 0] == track_id)
+        t, vertex_t = data[rows, 1], branch.pos[:, 1]
+        shared = np.isin(vertex_t, t)
+        expected = layer.track_colors[rows[np.searchsorted(t, vertex_t[shared])]]
+        assert_allclose(branch.color[shared], expected, atol=1e-6)